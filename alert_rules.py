@@ -0,0 +1,243 @@
+"""
+Motor de reglas de alerta (búsquedas guardadas) con índices
+
+Cada regla combina palabras clave, exclusiones, rango de precio y
+ubicaciones. Las reglas se compilan en:
+
+- un índice invertido de palabras clave: cada regla se registra solo bajo su
+  palabra clave menos frecuente (la más selectiva), así un producto solo
+  revisa las reglas ancladas a palabras que contiene;
+- un árbol de intervalos de precio para las reglas sin palabras clave.
+
+Así un producto se compara contra miles de reglas revisando solo unas pocas
+candidatas, y una sola búsqueda sirve a todas las reglas que se traslapan.
+"""
+import os
+import json
+import logging
+from bisect import bisect_right
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Iterable, FrozenSet, Tuple
+
+from config import Config
+from utils import normalize_text
+from virtual_report import tokenize, MIN_TOKEN_LENGTH
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class AlertRule:
+    """Regla de alerta compilada"""
+    rule_id: str
+    keywords: FrozenSet[str] = frozenset()
+    exclude: FrozenSet[str] = frozenset()
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    locations: Tuple[str, ...] = ()
+    min_deal_score: Optional[float] = None
+    data: Dict[str, Any] = field(default_factory=dict, compare=False, hash=False)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'AlertRule':
+        """
+        Crea una regla desde su forma guardada
+
+        Args:
+            data: Diccionario con 'id' y opcionalmente 'keywords', 'exclude',
+                'min_price', 'max_price', 'locations' y 'min_deal_score'
+                (puntaje mínimo de oferta, ver deal_scoring.py). Una palabra
+                clave con varias palabras ("iphone 14") exige todas.
+
+        Raises:
+            ValueError: Sin 'id', o con una palabra clave o exclusión que no
+                deja ningún token (ej: "x", más corta que MIN_TOKEN_LENGTH);
+                ignorarla haría que la regla coincida con todo
+        """
+        if 'id' not in data:
+            raise ValueError(f"Regla sin 'id': {data}")
+        for key in ('keywords', 'exclude'):
+            empty = [k for k in data.get(key, []) if not tokenize(k)]
+            if empty:
+                raise ValueError(f"Regla {data['id']}: {key} sin tokens válidos "
+                                 f"(mínimo {MIN_TOKEN_LENGTH} caracteres alfanuméricos): {empty}")
+        keywords = frozenset(t for k in data.get('keywords', []) for t in tokenize(k))
+        exclude = frozenset(t for k in data.get('exclude', []) for t in tokenize(k))
+        locations = tuple(normalize_text(l).strip() for l in data.get('locations', []) if l.strip())
+        return cls(str(data['id']), keywords, exclude, data.get('min_price'), data.get('max_price'),
+                   locations, data.get('min_deal_score'), data)
+
+    def matches(self, tokens: FrozenSet[str], price: Optional[float], location: str,
+                deal_score: Optional[float] = None) -> bool:
+        """Verificación completa de la regla contra un producto ya tokenizado"""
+        if not self.keywords <= tokens:
+            return False
+        if self.exclude and not self.exclude.isdisjoint(tokens):
+            return False
+        if self.min_price is not None or self.max_price is not None:
+            if price is None:
+                return False
+            if self.min_price is not None and price < self.min_price:
+                return False
+            if self.max_price is not None and price > self.max_price:
+                return False
+        if self.locations and not any(l in location for l in self.locations):
+            return False
+        if self.min_deal_score is not None and (deal_score is None or deal_score < self.min_deal_score):
+            return False
+        return True
+
+
+class IntervalTree:
+    """
+    Árbol de intervalos centrado (estático) para consultas por punto
+
+    Cada nodo guarda los intervalos que contienen su punto central, ordenados
+    por inicio y por fin; una consulta recorre una sola rama y solo revisa
+    los intervalos que efectivamente contienen el punto.
+    """
+
+    def __init__(self, intervals: List[Tuple[float, float, Any]]):
+        """
+        Args:
+            intervals: Lista de (inicio, fin, dato) cerrados
+        """
+        self.root = self._build(intervals)
+
+    def _build(self, intervals):
+        if not intervals:
+            return None
+        points = sorted(p for start, end, _ in intervals for p in (start, end))
+        center = points[len(points) // 2]
+        left = [iv for iv in intervals if iv[1] < center]
+        right = [iv for iv in intervals if iv[0] > center]
+        here = [iv for iv in intervals if iv[0] <= center <= iv[1]]
+        by_start = sorted(here, key=lambda iv: iv[0])
+        by_end = sorted(here, key=lambda iv: iv[1], reverse=True)
+        return {
+            'center': center,
+            'starts': [iv[0] for iv in by_start],
+            'by_start': by_start,
+            'neg_ends': [-iv[1] for iv in by_end],
+            'by_end': by_end,
+            'left': self._build(left),
+            'right': self._build(right),
+        }
+
+    def query(self, point: float) -> List[Any]:
+        """Datos de los intervalos que contienen el punto"""
+        found = []
+        node = self.root
+        while node is not None:
+            if point < node['center']:
+                # Intervalos del nodo con inicio <= punto
+                count = bisect_right(node['starts'], point)
+                found.extend(iv[2] for iv in node['by_start'][:count])
+                node = node['left']
+            elif point > node['center']:
+                # Intervalos del nodo con fin >= punto
+                count = bisect_right(node['neg_ends'], -point)
+                found.extend(iv[2] for iv in node['by_end'][:count])
+                node = node['right']
+            else:
+                found.extend(iv[2] for iv in node['by_start'])
+                break
+        return found
+
+
+class RuleEngine:
+    """Conjunto de reglas compilado para evaluar productos rápidamente"""
+
+    def __init__(self, rules: Iterable[Dict[str, Any]]):
+        """
+        Compila las reglas
+
+        Args:
+            rules: Reglas en su forma guardada (ver AlertRule.from_dict)
+        """
+        self.rules: List[AlertRule] = [AlertRule.from_dict(r) for r in rules]
+
+        # Frecuencia de cada palabra clave entre las reglas: el ancla de cada
+        # regla es su palabra menos frecuente
+        frequency = Counter(k for rule in self.rules for k in rule.keywords)
+        self.keyword_index: Dict[str, List[AlertRule]] = {}
+        price_only = []
+        for rule in self.rules:
+            if rule.keywords:
+                anchor = min(rule.keywords, key=lambda k: (frequency[k], k))
+                self.keyword_index.setdefault(anchor, []).append(rule)
+            else:
+                price_only.append(rule)
+
+        # Reglas sin palabras clave: por rango de precio; sin precio ni palabras, siempre candidatas
+        self.unbounded = [r for r in price_only if r.min_price is None and r.max_price is None]
+        self.price_tree = IntervalTree([
+            (r.min_price if r.min_price is not None else float('-inf'),
+             r.max_price if r.max_price is not None else float('inf'), r)
+            for r in price_only if r.min_price is not None or r.max_price is not None
+        ])
+
+        logger.info(f"🔔 Reglas compiladas: {len(self.rules)} "
+                    f"({len(self.keyword_index)} palabras ancla, {len(price_only)} solo por precio)")
+
+    def __len__(self):
+        return len(self.rules)
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> Optional['RuleEngine']:
+        """
+        Carga las reglas desde JSON (lista de reglas)
+
+        Args:
+            path: Archivo de reglas (usa Config.ALERT_RULES_PATH por defecto)
+
+        Returns:
+            Motor compilado, o None si no hay archivo de reglas
+        """
+        path = path or Config.ALERT_RULES_PATH
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def match(self, product: Dict[str, Any]) -> List[str]:
+        """
+        Reglas que cumple un producto
+
+        Args:
+            product: Producto con 'title', 'description', 'price_value', 'location'
+                y opcionalmente 'deal_score'
+
+        Returns:
+            IDs de las reglas que coinciden
+        """
+        tokens = frozenset(tokenize(f"{product.get('title', '')} {product.get('description', '')}"))
+        price = product.get('price_value')
+        location = normalize_text(product.get('location') or '')
+
+        candidates = list(self.unbounded)
+        for token in tokens:
+            candidates.extend(self.keyword_index.get(token, ()))
+        if price is not None:
+            candidates.extend(self.price_tree.query(price))
+
+        deal_score = product.get('deal_score')
+        return [rule.rule_id for rule in candidates if rule.matches(tokens, price, location, deal_score)]
+
+    def apply(self, products: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Agrega 'matched_rules' a cada producto
+
+        Args:
+            products: Productos a evaluar (se modifican en sitio)
+
+        Returns:
+            Conteo de productos por regla
+        """
+        counts = Counter()
+        for product in products:
+            matched = self.match(product)
+            product['matched_rules'] = matched
+            counts.update(matched)
+        return dict(counts)
@@ -0,0 +1,239 @@
+"""
+Filtro de Bloom escalable en disco (memory-mapped)
+
+Responde "¿ya vi este ID?" con unos pocos bits por elemento: si dice que no,
+es seguro que no; si dice que sí, puede ser un falso positivo (con la
+probabilidad configurada) y hay que confirmar con la consulta exacta. Cuando
+una capa se llena se agrega otra más grande con una tasa de error más
+estricta, así la tasa total se mantiene acotada sin conocer de antemano el
+número de elementos. Cada capa es un archivo mapeado en memoria: el sistema
+operativo carga solo las páginas que se tocan.
+
+Varios procesos e hilos (regiones en paralelo, daemon, vigilancia) abren el
+mismo directorio: los bits se comparten a través del mapeo; las capas que
+agrega otra instancia se detectan en cada consulta, y las escrituras se hacen
+bajo un lock de archivo (bloom.lock) releyendo el contador del encabezado.
+"""
+import os
+import math
+import mmap
+import struct
+import hashlib
+import logging
+import threading
+from typing import Iterable, List
+
+from file_lock import file_lock
+
+logger = logging.getLogger(__name__)
+
+
+_MAGIC = b"BLM1"
+# magic, bits, funciones hash, capacidad, elementos agregados
+_HEADER = struct.Struct("<4sQIQQ")
+_HEADER_SIZE = 64
+
+
+def _hash_pair(key: str):
+    """Dos hashes de 64 bits independientes (doble hashing de Kirsch-Mitzenmacher)"""
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+    h1, h2 = struct.unpack("<QQ", digest)
+    return h1, h2 | 1
+
+
+class BloomFilter:
+    """Capa individual de tamaño fijo respaldada por un archivo mapeado"""
+
+    def __init__(self, path: str, capacity: int = 1_000_000, error_rate: float = 0.001):
+        """
+        Abre la capa (o la crea con el tamaño óptimo para capacity y error_rate)
+
+        Args:
+            path: Archivo de la capa
+            capacity: Elementos esperados
+            error_rate: Probabilidad de falso positivo al llegar a capacity
+        """
+        self.path = path
+        if not os.path.exists(path):
+            num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+            num_bits = (num_bits + 7) // 8 * 8
+            num_hashes = max(1, int(round(num_bits / capacity * math.log(2))))
+            # Se crea con otro nombre y se renombra: otra instancia nunca ve una capa a medias
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(_HEADER.pack(_MAGIC, num_bits, num_hashes, capacity, 0).ljust(_HEADER_SIZE, b'\0'))
+                f.truncate(_HEADER_SIZE + num_bits // 8)
+            os.replace(tmp_path, path)
+
+        self._file = open(path, 'r+b')
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        magic, self.num_bits, self.num_hashes, self.capacity, self.count = _HEADER.unpack_from(self._map, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"Archivo de filtro de Bloom inválido: {path}")
+
+    def _positions(self, key: str):
+        h1, h2 = _hash_pair(key)
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def __contains__(self, key: str) -> bool:
+        data = self._map
+        for pos in self._positions(key):
+            if not data[_HEADER_SIZE + (pos >> 3)] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def add(self, key: str) -> bool:
+        """
+        Agrega un elemento
+
+        Returns:
+            True si el elemento no estaba (ningún bit encendido de antemano)
+        """
+        data = self._map
+        added = False
+        for pos in self._positions(key):
+            offset = _HEADER_SIZE + (pos >> 3)
+            mask = 1 << (pos & 7)
+            byte = data[offset]
+            if not byte & mask:
+                data[offset] = byte | mask
+                added = True
+        if added:
+            self.count += 1
+            self._write_header()
+        return added
+
+    def _write_header(self):
+        _HEADER.pack_into(self._map, 0, _MAGIC, self.num_bits, self.num_hashes, self.capacity, self.count)
+
+    def reload_count(self):
+        """Relee el contador del encabezado (otra instancia pudo agregar elementos)"""
+        self.count = _HEADER.unpack_from(self._map, 0)[4]
+
+    @property
+    def full(self) -> bool:
+        return self.count >= self.capacity
+
+    def flush(self):
+        """Escribe los bits modificados a disco (el contador ya está en el encabezado)"""
+        self._map.flush()
+
+    def close(self):
+        self.flush()
+        self._map.close()
+        self._file.close()
+
+
+class ScalableBloomFilter:
+    """Filtro de Bloom que crece por capas (cada capa en su archivo)"""
+
+    def __init__(self, directory: str, initial_capacity: int = 1_000_000, error_rate: float = 0.001,
+                 growth: int = 2, tightening: float = 0.8):
+        """
+        Abre (o crea) el filtro en un directorio
+
+        Args:
+            directory: Directorio de las capas (layer_000.bloom, layer_001.bloom...)
+            initial_capacity: Capacidad de la primera capa
+            error_rate: Tasa de falsos positivos objetivo del filtro completo
+            growth: Factor de crecimiento de capacidad entre capas
+            tightening: Factor de reducción de la tasa de error entre capas
+        """
+        self.directory = directory
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        self.growth = growth
+        self.tightening = tightening
+        self._lock = threading.RLock()
+        os.makedirs(directory, exist_ok=True)
+        self.lock_path = os.path.join(directory, "bloom.lock")
+
+        self.layers: List[BloomFilter] = []
+        with file_lock(self.lock_path):
+            self._sync_layers()
+            if not self.layers:
+                self._add_layer()
+
+    def _layer_path(self, index: int) -> str:
+        return os.path.join(self.directory, f"layer_{index:03d}.bloom")
+
+    def _sync_layers(self):
+        """Abre las capas que agregó otra instancia (un stat por consulta si no hay nuevas)"""
+        while os.path.exists(self._layer_path(len(self.layers))):
+            self.layers.append(BloomFilter(self._layer_path(len(self.layers))))
+
+    @property
+    def is_new(self) -> bool:
+        """True si el filtro está vacío (recién creado)"""
+        return len(self.layers) == 1 and self.layers[0].count == 0
+
+    def _add_layer(self):
+        """Agrega una capa más grande y más estricta"""
+        index = len(self.layers)
+        # La suma de las tasas de error de las capas converge a error_rate
+        capacity = self.initial_capacity * (self.growth ** index)
+        error = self.error_rate * (1 - self.tightening) * (self.tightening ** index)
+        self.layers.append(BloomFilter(self._layer_path(index), capacity, error))
+        if index:
+            logger.info(f"Filtro de Bloom: nueva capa {index} (capacidad {capacity:,})")
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            self._sync_layers()
+            layers = list(self.layers)
+        return any(key in layer for layer in layers)
+
+    def __len__(self) -> int:
+        """Elementos agregados (aproximado: no cuenta falsos positivos al agregar)"""
+        with self._lock:
+            self._sync_layers()
+            for layer in self.layers:
+                layer.reload_count()
+            return sum(layer.count for layer in self.layers)
+
+    def add(self, key: str) -> bool:
+        """
+        Agrega un elemento
+
+        Returns:
+            True si no estaba en el filtro
+        """
+        return self.update([key]) == 1
+
+    def update(self, keys: Iterable[str]) -> int:
+        """
+        Agrega varios elementos y escribe a disco
+
+        Returns:
+            Cuántos no estaban en el filtro
+        """
+        with self._lock, file_lock(self.lock_path):
+            self._sync_layers()
+            # El contador de la capa actual pudo crecer en otra instancia
+            self.layers[-1].reload_count()
+            added = 0
+            for key in keys:
+                if any(key in layer for layer in self.layers):
+                    continue
+                if self.layers[-1].full:
+                    self._add_layer()
+                if self.layers[-1].add(key):
+                    added += 1
+            for layer in self.layers:
+                layer.flush()
+        return added
+
+    def size_bytes(self) -> int:
+        """Tamaño total de las capas en disco"""
+        return sum(_HEADER_SIZE + layer.num_bits // 8 for layer in self.layers)
+
+    def flush(self):
+        with self._lock:
+            for layer in self.layers:
+                layer.flush()
+
+    def close(self):
+        with self._lock:
+            for layer in self.layers:
+                layer.close()
+            self.layers = []
@@ -2,13 +2,16 @@
 Scraper para imágenes de ropa de sitios web
 """
 import os
+import json
 import time
+import hashlib
 import logging
-import requests
 from datetime import datetime
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from scraper import WebScraper
+from image_downloader import ImageDownloader
+from concurrency import log_metrics
 from utils import save_to_json, clean_text
 from config import Config
 
@@ -22,12 +25,21 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Avance de un trabajo de descarga (se borra al terminar; si existe, el trabajo se reanuda)
+JOB_STATE_FILE = '.download_state.json'
+
+
+def url_key(url: str) -> str:
+    """Nombre de archivo estable para una URL"""
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+
 
 class ClothingScraper:
     """Scraper especializado para imágenes de ropa"""
     
     def __init__(self, headless=False):
         self.scraper = WebScraper(headless=headless, timeout=15)
+        self.downloader = ImageDownloader()
         # URLs de sitios populares de ropa (puedes modificar estas URLs)
         self.sites = {
             '1': {
@@ -59,21 +71,7 @@ class ClothingScraper:
             url: URL de la imagen
             save_path: Ruta donde guardar la imagen
         """
-        try:
-            response = requests.get(url, timeout=10, headers={
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            })
-            if response.status_code == 200:
-                with open(save_path, 'wb') as f:
-                    f.write(response.content)
-                logger.info(f"Imagen descargada: {save_path}")
-                return True
-            else:
-                logger.warning(f"Error descargando imagen: {response.status_code}")
-                return False
-        except Exception as e:
-            logger.error(f"Error descargando imagen: {e}")
-            return False
+        return self.downloader.download(url, save_path)
     
     def scrape_clothing_images(self, site_key: str = '1', search_term: str = 'fashion', max_images: int = 20):
         """
@@ -95,125 +93,74 @@ class ClothingScraper:
         scraped_data = []
         start_time = time.time()
         
-        # Crear directorio para imágenes
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_dir = os.path.join(Config.OUTPUT_DIR, f"clothing_{timestamp}")
+        # Reanudar el último trabajo sin terminar de la misma búsqueda, o crear uno nuevo
+        job = self._find_unfinished_job(site_key, search_term)
+        if job:
+            output_dir = job['dir']
+            scraped_data = [r for r in job['records'] if os.path.exists(r['path'])]
+            logger.info(f"♻️  Reanudando {output_dir}: {len(scraped_data)} imágenes ya descargadas")
+        else:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            output_dir = os.path.join(Config.OUTPUT_DIR, f"clothing_{timestamp}")
         images_dir = os.path.join(output_dir, "images")
         os.makedirs(images_dir, exist_ok=True)
+        state_path = os.path.join(output_dir, JOB_STATE_FILE)
         
         try:
-            self.scraper.setup_driver()
-            
-            # Construir URL de búsqueda según el sitio
-            if site_key == '1':  # Zara
-                # Para Zara, usar categorías específicas o búsqueda
-                if search_term.lower() in ['woman', 'mujer', 'women']:
-                    search_url = "https://www.zara.com/us/en/woman-l1050.html"
-                elif search_term.lower() in ['man', 'hombre', 'men']:
-                    search_url = "https://www.zara.com/us/en/man-l1040.html"
-                elif search_term.lower() in ['kids', 'niños', 'children']:
-                    search_url = "https://www.zara.com/us/en/kids-l1176.html"
-                else:
-                    # Usar página principal y búsqueda
-                    search_url = f"https://www.zara.com/us/en/search?searchTerm={search_term}"
-            elif site_key == '2':  # Unsplash
-                search_url = f"https://unsplash.com/s/photos/{search_term}"
-            elif site_key == '3':  # Pexels
-                search_url = f"https://www.pexels.com/search/{search_term}/"
-            else:
-                search_url = site['url']
-            
-            logger.info(f"Buscando imágenes en: {site['name']}")
-            logger.info(f"URL: {search_url}")
-            
-            if not self.scraper.get_page(search_url):
-                logger.error("No se pudo cargar la página")
-                return scraped_data
-            
-            # Esperar a que carguen las imágenes
-            time.sleep(5)
+            candidates = job['candidates'] if job else None
+            if candidates is None:
+                candidates = self._collect_candidates(site_key, site, search_term)
+                if candidates is None:
+                    return scraped_data
+            self._save_job_state(state_path, site_key, search_term, candidates, scraped_data)
             
-            # Hacer scroll para cargar más imágenes
-            logger.info("Haciendo scroll para cargar más imágenes...")
-            scroll_count = 5 if site_key == '1' else 3  # Más scroll para Zara
-            for i in range(scroll_count):
-                self.scraper.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                time.sleep(2)
-            
-            # Encontrar todas las imágenes
-            images = self.scraper.find_elements_safe(By.TAG_NAME, "img")
-            logger.info(f"Se encontraron {len(images)} imágenes en total")
-            
-            # Procesar imágenes
-            downloaded_count = 0
-            for idx, img in enumerate(images):
-                if downloaded_count >= max_images:
-                    break
+            # Descargar en paralelo, por tandas de las que faltan (las fallidas
+            # se reemplazan con las siguientes candidatas)
+            done_urls = {record['url'] for record in scraped_data}
+            pending = [c for c in candidates if c['url'] not in done_urls]
+            downloaded_count = len(scraped_data)
+            # Los registros cuyo archivo se borró se descartan: numerar después
+            # del mayor id que queda para no pisar un archivo ni repetir ids
+            next_id = max((record['id'] for record in scraped_data), default=0) + 1
+            next_candidate = 0
+            while downloaded_count < max_images and next_candidate < len(pending):
+                wave = pending[next_candidate:next_candidate + max_images - downloaded_count]
+                next_candidate += len(wave)
+                # Nombre temporal fijo por URL: una descarga cortada se reanuda en la
+                # siguiente ejecución y una ya completa se omite
+                jobs = [(c['url'], os.path.join(images_dir, f".{url_key(c['url'])}.{c['extension']}"))
+                        for c in wave]
+                results = self.downloader.download_many(jobs)
                 
-                try:
-                    # Obtener URL de la imagen
-                    img_url = img.get_attribute('src')
-                    if not img_url or img_url.startswith('data:'):
-                        # Intentar obtener de srcset
-                        srcset = img.get_attribute('srcset')
-                        if srcset:
-                            # Tomar la primera URL del srcset
-                            img_url = srcset.split(',')[0].split(' ')[0]
-                        else:
-                            continue
-                    
-                    # Convertir URLs relativas a absolutas (importante para Zara)
-                    if img_url.startswith('//'):
-                        img_url = 'https:' + img_url
-                    elif img_url.startswith('/') and site_key == '1':
-                        img_url = site['base_url'] + img_url
-                    
-                    # Filtrar imágenes pequeñas o irrelevantes
-                    if any(skip in img_url.lower() for skip in ['logo', 'icon', 'avatar', 'badge', 'sprite']):
-                        continue
-                    
-                    # Para Zara, filtrar solo imágenes de productos
-                    if site_key == '1' and not any(x in img_url for x in ['.jpg', '.jpeg', '.png', '.webp']):
+                # Numeración consecutiva: las exitosas se renombran en orden
+                for candidate, (img_url, temp_path), ok in zip(wave, jobs, results):
+                    if not ok:
                         continue
-                    
-                    # Obtener alt text como descripción
-                    alt_text = img.get_attribute('alt') or f"clothing_image_{idx}"
-                    
-                    # Nombre de archivo
-                    file_extension = 'jpg'
-                    if '.png' in img_url.lower():
-                        file_extension = 'png'
-                    elif '.webp' in img_url.lower():
-                        file_extension = 'webp'
-                    
-                    filename = f"{search_term}_{downloaded_count + 1}.{file_extension}"
+                    filename = f"{search_term}_{next_id}.{candidate['extension']}"
                     save_path = os.path.join(images_dir, filename)
-                    
-                    # Descargar imagen
-                    if self.download_image(img_url, save_path):
-                        image_info = {
-                            'id': downloaded_count + 1,
-                            'filename': filename,
-                            'path': save_path,
-                            'url': img_url,
-                            'description': clean_text(alt_text),
-                            'search_term': search_term,
-                            'source': site['name'],
-                            'timestamp': datetime.now().isoformat()
-                        }
-                        scraped_data.append(image_info)
-                        downloaded_count += 1
-                        logger.info(f"Imagen {downloaded_count}/{max_images}: {filename}")
-                    
-                    time.sleep(0.5)  # Pequeña pausa entre descargas
-                    
-                except Exception as e:
-                    logger.warning(f"Error procesando imagen {idx}: {e}")
-                    continue
+                    os.replace(temp_path, save_path)
+                    downloaded_count += 1
+                    scraped_data.append({
+                        'id': next_id,
+                        'filename': filename,
+                        'path': save_path,
+                        'url': img_url,
+                        'description': clean_text(candidate['alt_text']),
+                        'search_term': search_term,
+                        'source': site['name'],
+                        'timestamp': datetime.now().isoformat()
+                    })
+                    next_id += 1
+                self._save_job_state(state_path, site_key, search_term, candidates, scraped_data)
             
-            # Guardar información en JSON
+            # Guardar información en JSON (el trabajo queda terminado)
             json_file = os.path.join(output_dir, f"clothing_{search_term}_info.json")
             save_to_json(scraped_data, json_file)
+            os.remove(state_path)
+            # Descargas parciales de candidatas que ya no hicieron falta
+            for name in os.listdir(images_dir):
+                if name.startswith('.'):
+                    os.remove(os.path.join(images_dir, name))
             
             # Log de estadísticas
             elapsed_time = time.time() - start_time
@@ -226,14 +173,158 @@ class ClothingScraper:
             logger.info(f"Directorio: {images_dir}")
             logger.info(f"Tiempo total: {elapsed_time:.2f} segundos")
             logger.info(f"{'='*50}\n")
+            log_metrics()
             
         except Exception as e:
             logger.error(f"Error durante el scraping: {e}")
         finally:
-            self.scraper.quit()
+            self.scraper.close()
         
         return scraped_data
     
+    def _collect_candidates(self, site_key: str, site: dict, search_term: str):
+        """
+        Abre la búsqueda en el navegador y reúne las imágenes candidatas
+        
+        Returns:
+            Lista de candidatas (url, alt_text, extension), o None si no cargó la página
+        """
+        self.scraper.setup_driver()
+        
+        # Construir URL de búsqueda según el sitio
+        if site_key == '1':  # Zara
+            # Para Zara, usar categorías específicas o búsqueda
+            if search_term.lower() in ['woman', 'mujer', 'women']:
+                search_url = "https://www.zara.com/us/en/woman-l1050.html"
+            elif search_term.lower() in ['man', 'hombre', 'men']:
+                search_url = "https://www.zara.com/us/en/man-l1040.html"
+            elif search_term.lower() in ['kids', 'niños', 'children']:
+                search_url = "https://www.zara.com/us/en/kids-l1176.html"
+            else:
+                # Usar página principal y búsqueda
+                search_url = f"https://www.zara.com/us/en/search?searchTerm={search_term}"
+        elif site_key == '2':  # Unsplash
+            search_url = f"https://unsplash.com/s/photos/{search_term}"
+        elif site_key == '3':  # Pexels
+            search_url = f"https://www.pexels.com/search/{search_term}/"
+        else:
+            search_url = site['url']
+        
+        logger.info(f"Buscando imágenes en: {site['name']}")
+        logger.info(f"URL: {search_url}")
+        
+        if not self.scraper.get_page(search_url):
+            logger.error("No se pudo cargar la página")
+            return None
+        
+        # Esperar a que carguen las imágenes
+        time.sleep(5)
+        
+        # Hacer scroll para cargar más imágenes
+        logger.info("Haciendo scroll para cargar más imágenes...")
+        scroll_count = 5 if site_key == '1' else 3  # Más scroll para Zara
+        for i in range(scroll_count):
+            self.scraper.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            time.sleep(2)
+        self.scraper.archive_page('clothing', search_url)
+        
+        # Encontrar todas las imágenes
+        images = self.scraper.find_elements_safe(By.TAG_NAME, "img")
+        logger.info(f"Se encontraron {len(images)} imágenes en total")
+        
+        # Reunir las imágenes candidatas (lectura de atributos en el navegador).
+        # Sin repetidos por URL: la misma imagen en dos lugares de la página
+        # compartiría el archivo temporal de descarga
+        candidates = {}
+        for idx, img in enumerate(images):
+            try:
+                candidate = self._image_candidate(img, idx, site_key, site)
+                if candidate:
+                    candidates.setdefault(candidate['url'], candidate)
+            except Exception as e:
+                logger.warning(f"Error procesando imagen {idx}: {e}")
+        logger.info(f"Imágenes candidatas: {len(candidates)}")
+        return list(candidates.values())
+    
+    @staticmethod
+    def _find_unfinished_job(site_key: str, search_term: str):
+        """
+        Último trabajo sin terminar (con archivo de estado) de la misma búsqueda
+        
+        Returns:
+            Estado guardado con 'dir', o None
+        """
+        if not os.path.isdir(Config.OUTPUT_DIR):
+            return None
+        for name in sorted(os.listdir(Config.OUTPUT_DIR), reverse=True):
+            state_path = os.path.join(Config.OUTPUT_DIR, name, JOB_STATE_FILE)
+            if not name.startswith('clothing_') or not os.path.exists(state_path):
+                continue
+            try:
+                with open(state_path, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if state.get('site_key') == site_key and state.get('search_term') == search_term:
+                state['dir'] = os.path.join(Config.OUTPUT_DIR, name)
+                return state
+        return None
+    
+    @staticmethod
+    def _save_job_state(state_path: str, site_key: str, search_term: str, candidates, records):
+        """Guarda el avance del trabajo (escritura atómica)"""
+        tmp_path = state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'site_key': site_key, 'search_term': search_term,
+                       'candidates': candidates, 'records': records}, f, ensure_ascii=False)
+        os.replace(tmp_path, state_path)
+    
+    @staticmethod
+    def _image_candidate(img, idx: int, site_key: str, site: dict):
+        """
+        URL, descripción y extensión de una imagen de la página
+        
+        Returns:
+            Diccionario con url, alt_text y extension, o None si se descarta
+        """
+        # Obtener URL de la imagen
+        img_url = img.get_attribute('src')
+        if not img_url or img_url.startswith('data:'):
+            # Intentar obtener de srcset
+            srcset = img.get_attribute('srcset')
+            if not srcset:
+                return None
+            # Tomar la primera URL del srcset
+            img_url = srcset.split(',')[0].split(' ')[0]
+        
+        # Convertir URLs relativas a absolutas (importante para Zara)
+        if img_url.startswith('//'):
+            img_url = 'https:' + img_url
+        elif img_url.startswith('/') and site_key == '1':
+            img_url = site['base_url'] + img_url
+        
+        # Filtrar imágenes pequeñas o irrelevantes
+        if any(skip in img_url.lower() for skip in ['logo', 'icon', 'avatar', 'badge', 'sprite']):
+            return None
+        
+        # Para Zara, filtrar solo imágenes de productos
+        if site_key == '1' and not any(x in img_url for x in ['.jpg', '.jpeg', '.png', '.webp']):
+            return None
+        
+        # Nombre de archivo
+        file_extension = 'jpg'
+        if '.png' in img_url.lower():
+            file_extension = 'png'
+        elif '.webp' in img_url.lower():
+            file_extension = 'webp'
+        
+        return {
+            'url': img_url,
+            # Obtener alt text como descripción
+            'alt_text': img.get_attribute('alt') or f"clothing_image_{idx}",
+            'extension': file_extension,
+        }
+    
     def list_available_sites(self):
         """Muestra los sitios disponibles para scrapear"""
         print("\nSitios disponibles:")
@@ -0,0 +1,282 @@
+"""
+Control adaptativo de concurrencia (AIMD)
+
+Un número fijo de workers es demasiado tímido o provoca bloqueos y 429. Cada
+controlador limita cuántas operaciones de un tipo corren a la vez y ajusta
+ese límite como el control de congestión de TCP:
+
+- Aumento aditivo: cada operación exitosa suma increase/límite (≈ +1 por
+  cada "ventana" completa de operaciones exitosas).
+- Disminución multiplicativa: un bloqueo (429/403, página de bloqueo,
+  circuito abierto), un error o una latencia muy por encima de la base
+  (el menor promedio móvil observado) multiplica el límite por decrease (como mucho una vez por
+  latencia promedio, para que una ráfaga de fallos simultáneos cuente una vez).
+
+Así el rendimiento se acomoda cerca del máximo real del sitio sin ajustar a
+mano. Los límites actuales se publican en Config.CONCURRENCY_METRICS_PATH.
+
+La latencia de una operación se mide desde que se envía su última petición
+(request_sent(), que llaman fetch y WebScraper.navigate después del límite de
+velocidad): la espera del token bucket y el backoff de los reintentos no son
+congestión del sitio, y medirlos haría que el límite se quedara en la cota
+del limitador.
+
+Uso:
+    controller = get_controller('image_download', maximum=8)
+    with controller.slot() as slot:
+        response = fetch(url)
+        if response.status_code in (403, 429):
+            slot.mark('throttled')
+"""
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+# Resultados de una operación
+OK, THROTTLED, ERROR, SKIP = 'ok', 'throttled', 'error', 'skip'
+# Estados HTTP que indican que el sitio nos está frenando
+THROTTLE_STATUS = frozenset({403, 429, 503})
+# Muestras antes de usar la latencia como señal (la base necesita algo de historia)
+MIN_LATENCY_SAMPLES = 5
+# Peso de la última muestra en el promedio móvil de latencia
+EWMA_ALPHA = 0.2
+# Segundos mínimos entre escrituras del archivo de métricas
+METRICS_INTERVAL = 5.0
+
+
+def classify_exception(error: BaseException) -> str:
+    """Bloqueo (circuito abierto, 429/5xx) o error genérico"""
+    from resilience import CircuitOpenError, RetryableHTTPError
+    if isinstance(error, CircuitOpenError):
+        return THROTTLED
+    if isinstance(error, RetryableHTTPError) and error.response.status_code in THROTTLE_STATUS:
+        return THROTTLED
+    return ERROR
+
+
+class Slot:
+    """Turno tomado en un controlador"""
+
+    def __init__(self, controller: 'AIMDController'):
+        self.controller = controller
+        # Se reinicia al enviar cada petición (ver request_sent)
+        self.started = time.monotonic()
+        self.result: Optional[str] = None
+        self.released = False
+
+    def mark(self, result: str):
+        """Resultado de la operación: 'ok', 'throttled', 'error' o 'skip' (no cuenta)"""
+        self.result = result
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            if getattr(_active, 'slot', None) is self:
+                _active.slot = None
+            self.controller._release(time.monotonic() - self.started, self.result or OK)
+
+
+# Turno tomado por el hilo actual (para request_sent)
+_active = threading.local()
+
+
+def request_sent():
+    """
+    Marca que el hilo actual acaba de enviar una petición (ya pasó el límite de
+    velocidad): la latencia de su turno se mide desde aquí. Sin turno activo no hace nada.
+    """
+    slot = getattr(_active, 'slot', None)
+    if slot is not None:
+        slot.started = time.monotonic()
+
+
+class AIMDController:
+    """Límite de concurrencia con aumento aditivo y disminución multiplicativa"""
+
+    def __init__(self, name: str, maximum: int, minimum: int = 1, initial: Optional[float] = None,
+                 increase: Optional[float] = None, decrease: Optional[float] = None,
+                 latency_factor: Optional[float] = None):
+        """
+        Args:
+            name: Nombre (para logs y métricas)
+            maximum: Límite máximo (workers disponibles)
+            minimum: Límite mínimo
+            initial: Límite inicial (default: Config.AIMD_INITIAL, acotado a [minimum, maximum])
+            increase: Aumento por ventana exitosa (default: Config.AIMD_INCREASE)
+            decrease: Factor de disminución (default: Config.AIMD_DECREASE)
+            latency_factor: Latencia que cuenta como congestión, en múltiplos de
+                la latencia base (default: Config.AIMD_LATENCY_FACTOR; 0 = no usar latencia)
+        """
+        self.name = name
+        self.maximum = max(1, maximum)
+        self.minimum = max(1, min(minimum, self.maximum))
+        initial = Config.AIMD_INITIAL if initial is None else initial
+        self.limit = float(min(self.maximum, max(self.minimum, initial)))
+        self.increase = Config.AIMD_INCREASE if increase is None else increase
+        self.decrease = Config.AIMD_DECREASE if decrease is None else decrease
+        self.latency_factor = Config.AIMD_LATENCY_FACTOR if latency_factor is None else latency_factor
+
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.counts = {OK: 0, THROTTLED: 0, ERROR: 0, SKIP: 0}
+        self.decreases = 0
+        self.ewma_latency: Optional[float] = None
+        # Menor promedio móvil observado (una sola respuesta rápida no mueve la base)
+        self.base_latency: Optional[float] = None
+        self.samples = 0
+        self.last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    @property
+    def current_limit(self) -> int:
+        """Operaciones simultáneas permitidas ahora"""
+        return max(self.minimum, int(self.limit))
+
+    def acquire(self, timeout: Optional[float] = None) -> Slot:
+        """
+        Espera un turno libre
+
+        Returns:
+            Slot (hay que llamar release(); o usar slot())
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.in_flight < self.current_limit, timeout):
+                raise TimeoutError(f"Sin turno libre en {self.name}")
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        slot = Slot(self)
+        _active.slot = slot
+        return slot
+
+    @contextmanager
+    def slot(self):
+        """Turno como context manager (una excepción cuenta como error o bloqueo)"""
+        slot = self.acquire()
+        try:
+            yield slot
+        except BaseException as e:
+            if slot.result is None:
+                slot.mark(classify_exception(e))
+            raise
+        finally:
+            slot.release()
+
+    def _release(self, latency: float, result: str):
+        with self._cond:
+            # Solo se sube si el límite estaba en uso (con menos trabajo no hay información)
+            saturated = self.in_flight >= self.current_limit
+            self.in_flight -= 1
+            self.counts[result] = self.counts.get(result, 0) + 1
+            previous = self.current_limit
+            if result == OK:
+                self._observe_latency(latency)
+                congested = (self.latency_factor and self.base_latency is not None
+                             and latency > self.base_latency * self.latency_factor)
+                if congested:
+                    self._decrease("latencia alta")
+                elif saturated:
+                    self.limit = min(float(self.maximum), self.limit + self.increase / max(self.limit, 1.0))
+            elif result in (THROTTLED, ERROR):
+                self._decrease("bloqueo" if result == THROTTLED else "error")
+            if self.current_limit != previous:
+                logger.debug(f"⚙️  {self.name}: concurrencia {previous} → {self.current_limit}")
+            self._cond.notify_all()
+        publish_metrics()
+
+    def _observe_latency(self, latency: float):
+        self.samples += 1
+        self.ewma_latency = latency if self.ewma_latency is None else (
+            EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.ewma_latency)
+        if self.samples >= MIN_LATENCY_SAMPLES:
+            self.base_latency = (self.ewma_latency if self.base_latency is None
+                                 else min(self.base_latency, self.ewma_latency))
+
+    def _decrease(self, reason: str):
+        now = time.monotonic()
+        # Una sola disminución por "ida y vuelta": los fallos de las operaciones
+        # que ya estaban en curso reflejan la misma congestión
+        if now - self.last_decrease < (self.ewma_latency or 0.0):
+            return
+        self.last_decrease = now
+        self.decreases += 1
+        self.limit = max(float(self.minimum), self.limit * self.decrease)
+        logger.debug(f"{self.name}: disminución por {reason}")
+
+    def metrics(self) -> Dict[str, object]:
+        with self._cond:
+            return {
+                'limit': self.current_limit,
+                'limit_exact': round(self.limit, 2),
+                'maximum': self.maximum,
+                'in_flight': self.in_flight,
+                'peak_in_flight': self.peak_in_flight,
+                'ok': self.counts[OK],
+                'throttled': self.counts[THROTTLED],
+                'errors': self.counts[ERROR],
+                'decreases': self.decreases,
+                'avg_latency': round(self.ewma_latency, 3) if self.ewma_latency is not None else None,
+                'base_latency': round(self.base_latency, 3) if self.base_latency is not None else None,
+            }
+
+
+_controllers: Dict[str, AIMDController] = {}
+_controllers_lock = threading.Lock()
+_last_publish = 0.0
+
+
+def get_controller(name: str, maximum: int, **kwargs) -> AIMDController:
+    """
+    Controlador compartido del proceso (se crea la primera vez)
+
+    Args:
+        name: Nombre del tipo de operación (ej: 'offerup_detail')
+        maximum: Límite máximo si se crea
+        **kwargs: Otros argumentos de AIMDController si se crea
+    """
+    with _controllers_lock:
+        if name not in _controllers:
+            _controllers[name] = AIMDController(name, maximum, **kwargs)
+        return _controllers[name]
+
+
+def all_metrics() -> Dict[str, Dict[str, object]]:
+    """Métricas de todos los controladores"""
+    with _controllers_lock:
+        controllers = list(_controllers.values())
+    return {c.name: c.metrics() for c in controllers}
+
+
+def publish_metrics(force: bool = False):
+    """Escribe las métricas en Config.CONCURRENCY_METRICS_PATH (como mucho cada METRICS_INTERVAL s)"""
+    global _last_publish
+    path = Config.CONCURRENCY_METRICS_PATH
+    now = time.monotonic()
+    if not path or (not force and now - _last_publish < METRICS_INTERVAL):
+        return
+    _last_publish = now
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'updated': time.strftime("%Y-%m-%d %H:%M:%S"), 'controllers': all_metrics()}, f, indent=2)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"No se pudieron publicar las métricas de concurrencia: {e}")
+
+
+def log_metrics():
+    """Muestra los límites actuales y publica las métricas"""
+    for name, m in sorted(all_metrics().items()):
+        logger.info(f"⚙️  {name}: límite {m['limit']}/{m['maximum']} (máx. simultáneas {m['peak_in_flight']}), "
+                    f"{m['ok']} ok, {m['throttled']} bloqueos, {m['errors']} errores, "
+                    f"latencia media {m['avg_latency']}s")
+    publish_metrics(force=True)
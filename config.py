@@ -21,11 +21,133 @@ class Config:
     # Directorios
     OUTPUT_DIR = os.getenv("OUTPUT_DIR", "data")
     LOG_DIR = "logs"
+    PRICE_HISTORY_DIR = os.getenv("PRICE_HISTORY_DIR", os.path.join(OUTPUT_DIR, "price_history"))
+    # Archivos por partición del historial antes de fusionarlos en uno (0 = solo a mano)
+    PRICE_HISTORY_COMPACT_FILES = int(os.getenv("PRICE_HISTORY_COMPACT_FILES", "8"))
+    DEDUPE_INDEX_PATH = os.getenv("DEDUPE_INDEX_PATH", os.path.join(OUTPUT_DIR, "dedupe_index.json"))
+    SEEN_LISTINGS_PATH = os.getenv("SEEN_LISTINGS_PATH", os.path.join(OUTPUT_DIR, "seen_listings.db"))
+    # Filtro de Bloom delante del registro de vistas (vacío = desactivado)
+    SEEN_BLOOM_DIR = os.getenv("SEEN_BLOOM_DIR", os.path.join(OUTPUT_DIR, "seen_bloom"))
+    SEEN_BLOOM_ERROR_RATE = float(os.getenv("SEEN_BLOOM_ERROR_RATE", "0.001"))
+    SEEN_BLOOM_CAPACITY = int(os.getenv("SEEN_BLOOM_CAPACITY", "1000000"))
+    IMAGE_INDEX_PATH = os.getenv("IMAGE_INDEX_PATH", os.path.join(OUTPUT_DIR, "image_index.json"))
+    # Distancia de Hamming máxima entre dHash para considerar la misma foto
+    # (hasta 3 se resuelve con una sola cubeta por bloque)
+    IMAGE_MATCH_DISTANCE = int(os.getenv("IMAGE_MATCH_DISTANCE", "3"))
+    
+    # Caché en disco de páginas de detalle (SQLite compartido entre ejecuciones)
+    CACHE_PATH = os.getenv("CACHE_PATH", os.path.join(OUTPUT_DIR, "cache.db"))
+    DETAIL_CACHE_TTL_HOURS = float(os.getenv("DETAIL_CACHE_TTL_HOURS", "12"))
+    DETAIL_CACHE_MAX_ENTRIES = int(os.getenv("DETAIL_CACHE_MAX_ENTRIES", "20000"))
+    
+    # Caché de páginas de resultados (enlaces por búsqueda, ZIP, precios y página)
+    PAGE_CACHE_TTL_MINUTES = float(os.getenv("PAGE_CACHE_TTL_MINUTES", "30"))
+    PAGE_CACHE_MAX_ENTRIES = int(os.getenv("PAGE_CACHE_MAX_ENTRIES", "2000"))
+    
+    # Archivo de páginas HTML descargadas (zstd con diccionario) para volver a extraer datos
+    PAGE_ARCHIVE_ENABLED = os.getenv("PAGE_ARCHIVE_ENABLED", "True").lower() == "true"
+    PAGE_ARCHIVE_DIR = os.getenv("PAGE_ARCHIVE_DIR", os.path.join(OUTPUT_DIR, "page_archive"))
+    
+    # Paginación en paralelo: una segunda sesión cosecha la página siguiente
+    # mientras se extraen los detalles de la actual
+    PIPELINE_PAGINATION = os.getenv("PIPELINE_PAGINATION", "False").lower() == "true"
+    PIPELINE_PREFETCH_PAGES = int(os.getenv("PIPELINE_PREFETCH_PAGES", "1"))
+    
+    # Búsqueda multi-región: sesiones de navegador simultáneas
+    FANOUT_MAX_WORKERS = int(os.getenv("FANOUT_MAX_WORKERS", "3"))
+    # Radio de búsqueda de OfferUp por ZIP (millas), usado para calcular la cobertura de un área
+    SEARCH_RADIUS_MILES = float(os.getenv("SEARCH_RADIUS_MILES", "30"))
+    
+    # Modo vigilancia: búsquedas guardadas, minutos entre rondas y variación aleatoria
+    WATCH_SEARCHES_PATH = os.getenv("WATCH_SEARCHES_PATH", "watch_searches.json")
+    WATCH_INTERVAL_MINUTES = float(os.getenv("WATCH_INTERVAL_MINUTES", "1"))
+    WATCH_JITTER = float(os.getenv("WATCH_JITTER", "0.25"))
+    
+    # Reglas de alerta (búsquedas guardadas) evaluadas sobre cada resultado
+    ALERT_RULES_PATH = os.getenv("ALERT_RULES_PATH", "alert_rules.json")
+    
+    # Reporte HTML: "cards" (tarjetas completas), "virtual" (JSON + ventana virtual)
+    # o "auto" (virtual a partir de VIRTUAL_REPORT_THRESHOLD productos)
+    REPORT_MODE = os.getenv("REPORT_MODE", "auto").lower()
+    VIRTUAL_REPORT_THRESHOLD = int(os.getenv("VIRTUAL_REPORT_THRESHOLD", "300"))
+    
+    # Modo superficial: reglas para visitar la página de detalle
+    # ("new" = publicación nueva, "below_price" = precio bajo el umbral,
+    # "incomplete" = tarjeta sin título o sin precio, "all" = todas)
+    ENRICH_RULES = tuple(r.strip() for r in os.getenv("ENRICH_RULES", "new,below_price").split(",") if r.strip())
+    
+    # Modo con presupuesto: minutos máximos de la ejecución (0 = sin límite)
+    # y prioridad de visita ("cheapest", "newest" o "price_drop")
+    DETAIL_BUDGET_MINUTES = float(os.getenv("DETAIL_BUDGET_MINUTES", "0"))
+    DETAIL_PRIORITY = os.getenv("DETAIL_PRIORITY", "cheapest").lower()
+    
+    # Puntaje de ofertas: comparables por las primeras palabras del título
+    DEAL_TITLE_TOKENS = int(os.getenv("DEAL_TITLE_TOKENS", "3"))
+    DEAL_MIN_COMPARABLES = int(os.getenv("DEAL_MIN_COMPARABLES", "5"))
+    DEAL_HISTORY_DAYS = int(os.getenv("DEAL_HISTORY_DAYS", "90"))
+    
+    # Daemon de tareas programadas (scheduler_daemon.py)
+    SCHEDULE_JOBS_PATH = os.getenv("SCHEDULE_JOBS_PATH", "schedule_jobs.json")
+    SCHEDULER_STATE_PATH = os.getenv("SCHEDULER_STATE_PATH", os.path.join("data", "scheduler_state.json"))
+    SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", "2"))
+    # Ejecuciones simultáneas por dominio: "offerup.com=1,otro.com=2"
+    SCHEDULER_DOMAIN_LIMITS = {
+        domain.strip(): int(limit)
+        for domain, _, limit in (item.partition("=") for item in os.getenv("SCHEDULER_DOMAIN_LIMITS", "offerup.com=1").split(","))
+        if domain.strip() and limit.strip()
+    }
+    SCHEDULER_DEFAULT_DOMAIN_LIMIT = int(os.getenv("SCHEDULER_DEFAULT_DOMAIN_LIMIT", "1"))
+    SCHEDULER_JITTER_SECONDS = float(os.getenv("SCHEDULER_JITTER_SECONDS", "120"))
+    # Recuperar al arrancar las ejecuciones perdidas de las últimas N horas
+    SCHEDULER_CATCH_UP = os.getenv("SCHEDULER_CATCH_UP", "true").lower() == "true"
+    SCHEDULER_CATCH_UP_HOURS = float(os.getenv("SCHEDULER_CATCH_UP_HOURS", "24"))
+    SCHEDULER_HEADLESS = os.getenv("SCHEDULER_HEADLESS", "true").lower() == "true"
+    # Tareas por navegador antes de reciclarlo (acota fugas de memoria de Chrome)
+    SCHEDULER_BROWSER_MAX_JOBS = int(os.getenv("SCHEDULER_BROWSER_MAX_JOBS", "20"))
     
     # Gmail configuration
     GMAIL_USER = os.getenv("GMAIL_USER", "")
     GMAIL_APP_PASSWORD = os.getenv("GMAIL_APP_PASSWORD", "")
     
+    # Servidor SMTP (cambiar a un servidor local para pruebas; 465 = SSL directo)
+    SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+    SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+    SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() == "true"
+    SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+    
+    # Modo vigilancia: minutos que se acumulan alertas antes de enviar el resumen (0 = cada ronda)
+    DIGEST_WINDOW_MINUTES = float(os.getenv("DIGEST_WINDOW_MINUTES", "0"))
+    
+    # Límite de velocidad por dominio (token bucket, ver rate_limiter.py):
+    # peticiones por segundo y ráfaga por defecto, y reglas "dominio=ritmo:ráfaga"
+    RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", "1"))
+    RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "3"))
+    RATE_LIMITS = os.getenv("RATE_LIMITS", "offerup.com=0.5:2,images.offerup.com=8:16,google.com=0.2:1,static.zara.net=10:20,images.unsplash.com=10:20,images.pexels.com=10:20")
+    
+    # Reintentos con backoff exponencial y circuit breaker por dominio (ver resilience.py)
+    RETRY_ATTEMPTS = int(os.getenv("RETRY_ATTEMPTS", "3"))
+    RETRY_BASE_SECONDS = float(os.getenv("RETRY_BASE_SECONDS", "1"))
+    RETRY_MAX_SECONDS = float(os.getenv("RETRY_MAX_SECONDS", "30"))
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+    CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "60"))
+    CIRCUIT_MAX_RESET_SECONDS = float(os.getenv("CIRCUIT_MAX_RESET_SECONDS", "900"))
+    REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", "10"))
+    PAGE_LOAD_TIMEOUT = float(os.getenv("PAGE_LOAD_TIMEOUT", "30"))
+    
+    # Concurrencia adaptativa AIMD (ver concurrency.py): límite inicial, aumento
+    # por ventana exitosa, factor de disminución y latencia de congestión
+    # (múltiplos de la mínima observada; 0 = no usar la latencia como señal)
+    AIMD_INITIAL = float(os.getenv("AIMD_INITIAL", "2"))
+    AIMD_INCREASE = float(os.getenv("AIMD_INCREASE", "1"))
+    AIMD_DECREASE = float(os.getenv("AIMD_DECREASE", "0.5"))
+    AIMD_LATENCY_FACTOR = float(os.getenv("AIMD_LATENCY_FACTOR", "4"))
+    IMAGE_DOWNLOAD_MAX_WORKERS = int(os.getenv("IMAGE_DOWNLOAD_MAX_WORKERS", "8"))
+    IMAGE_DOWNLOAD_PER_HOST = int(os.getenv("IMAGE_DOWNLOAD_PER_HOST", "6"))
+    # Tamaño máximo de una imagen descargada (bytes)
+    IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(20 * 1024 * 1024)))
+    COMPANY_FETCH_MAX_WORKERS = int(os.getenv("COMPANY_FETCH_MAX_WORKERS", "8"))
+    CONCURRENCY_METRICS_PATH = os.getenv("CONCURRENCY_METRICS_PATH", "data/concurrency_metrics.json")
+    
     # Delays (en segundos)
     MIN_DELAY = 1
     MAX_DELAY = 3
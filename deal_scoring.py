@@ -0,0 +1,236 @@
+"""
+Puntaje de ofertas por comparables (vectorizado con pandas)
+
+Cada publicación se compara contra publicaciones de títulos similares (mismas
+primeras palabras del título) del historial de precios y de la ejecución
+actual:
+
+- price_zscore: z-score robusto del precio, (precio - mediana) / (1.4826 * MAD);
+  negativo = más barato que sus comparables. Si el grupo de títulos tiene
+  pocos comparables se usa todo el término de búsqueda.
+- price_drop_pct: baja respecto al precio más alto que tuvo la misma
+  publicación en el historial (0.2 = 20% más barata).
+- deal_score: -price_zscore + DROP_WEIGHT * price_drop_pct (mayor = mejor oferta).
+
+Todo se calcula con operaciones por grupo sobre la tabla completa, sin ciclos
+de Python por producto; el texto de los títulos se procesa una vez por título
+distinto.
+"""
+import re
+import logging
+from itertools import islice
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+from price_history import PriceHistoryStore
+from utils import extract_listing_id, normalize_text, slugify
+from virtual_report import MIN_TOKEN_LENGTH
+
+logger = logging.getLogger(__name__)
+
+
+# Factor que convierte la MAD en desviación estándar equivalente (distribución normal)
+MAD_SCALE = 1.4826
+# Una baja de 20% suma 1 punto (lo mismo que estar una desviación por debajo del mercado)
+DROP_WEIGHT = 5.0
+# Escala mínima relativa a la mediana: evita z-scores enormes en grupos con precios idénticos
+MIN_RELATIVE_SCALE = 0.05
+# Límite del z-score para que un precio absurdo (ej: $1) no domine el orden
+Z_CLIP = 10.0
+
+_TOKEN_RE = re.compile(rf"[a-z0-9]{{{MIN_TOKEN_LENGTH},}}")
+
+
+def _title_key(title: str, n_tokens: int) -> str:
+    """Primeros n tokens de un título (mismos tokens que virtual_report.tokenize)"""
+    text = title.lower() if title.isascii() else normalize_text(title)
+    return ' '.join(match.group() for match in islice(_TOKEN_RE.finditer(text), n_tokens))
+
+
+def title_keys(titles: pd.Series, n_tokens: int) -> pd.Series:
+    """
+    Clave de comparables de cada título: sus primeras n palabras normalizadas
+
+    Args:
+        titles: Títulos
+        n_tokens: Palabras que forman la clave
+
+    Returns:
+        Serie de claves (mismo índice)
+    """
+    codes, uniques = pd.factorize(titles.fillna(''))
+    keys = np.array([_title_key(title, n_tokens) for title in uniques] + [''], dtype=object)
+    return pd.Series(keys[codes], index=titles.index)
+
+
+def _robust_stats(prices: pd.Series, groups: pd.Series):
+    """Mediana, MAD y tamaño de grupo de cada fila (transform por grupo)"""
+    grouped = prices.groupby(groups)
+    median = grouped.transform('median')
+    mad = (prices - median).abs().groupby(groups).transform('median')
+    count = grouped.transform('size')
+    return median, mad, count
+
+
+def score_frame(df: pd.DataFrame, min_comparables: Optional[int] = None,
+                n_tokens: Optional[int] = None) -> pd.DataFrame:
+    """
+    Calcula los puntajes de una tabla de observaciones
+
+    Args:
+        df: Columnas 'price_value', 'title', 'search_term' y opcionalmente
+            'reference_price' (precio máximo previo de la misma publicación)
+        min_comparables: Tamaño mínimo del grupo de títulos (default: Config.DEAL_MIN_COMPARABLES)
+        n_tokens: Palabras del título que definen los comparables (default: Config.DEAL_TITLE_TOKENS)
+
+    Returns:
+        Copia de df con 'comparable_key', 'comparables', 'price_zscore',
+        'price_drop_pct' y 'deal_score' (NaN donde no hay precio)
+    """
+    min_comparables = Config.DEAL_MIN_COMPARABLES if min_comparables is None else min_comparables
+    n_tokens = Config.DEAL_TITLE_TOKENS if n_tokens is None else n_tokens
+
+    df = df.copy()
+    df['price_value'] = pd.to_numeric(df['price_value'], errors='coerce')
+    prices = df['price_value'].where(df['price_value'] > 0)
+    valid = prices.notna()
+
+    # Grupos como enteros (término, clave de título): agrupar por códigos es
+    # mucho más rápido que por cadenas
+    df['comparable_key'] = title_keys(df['title'], n_tokens)
+    term_codes = pd.Series(pd.factorize(df['search_term'].astype(str))[0], index=df.index)
+    key_codes, key_uniques = pd.factorize(df['comparable_key'])
+    groups = term_codes * (len(key_uniques) + 1) + key_codes
+
+    median, mad, count = _robust_stats(prices[valid], groups[valid])
+    term_median, term_mad, term_count = _robust_stats(prices[valid], term_codes[valid])
+
+    # Grupos de títulos pequeños: comparables de todo el término de búsqueda
+    small = count < min_comparables
+    median = median.mask(small, term_median)
+    mad = mad.mask(small, term_mad)
+    count = count.mask(small, term_count)
+
+    scale = np.maximum(MAD_SCALE * mad, MIN_RELATIVE_SCALE * median.abs())
+    scale = scale.where(scale > 0, 1.0)
+    zscore = ((prices[valid] - median) / scale).clip(-Z_CLIP, Z_CLIP)
+
+    df['comparables'] = count.reindex(df.index)
+    df['price_zscore'] = zscore.reindex(df.index)
+
+    if 'reference_price' in df:
+        reference = pd.to_numeric(df['reference_price'], errors='coerce')
+        reference = reference.where(reference > 0)
+        df['price_drop_pct'] = ((reference - prices) / reference).clip(lower=0).fillna(0.0)
+    else:
+        df['price_drop_pct'] = 0.0
+    df.loc[~valid, 'price_drop_pct'] = np.nan
+
+    df['deal_score'] = -df['price_zscore'] + DROP_WEIGHT * df['price_drop_pct']
+    return df
+
+
+class DealScorer:
+    """Puntúa productos contra el historial de precios"""
+
+    def __init__(self, history: Optional[pd.DataFrame] = None):
+        """
+        Args:
+            history: Historial con 'listing_id', 'price_value', 'title',
+                'scraped_at' y 'search_term' (vacío si None)
+        """
+        if history is None or history.empty:
+            history = pd.DataFrame(columns=['listing_id', 'price_value', 'title', 'scraped_at', 'search_term'])
+        history = history[history['price_value'].notna()]
+
+        # Precio más alto de cada publicación (referencia para la baja)
+        self.peak_prices = history.groupby('listing_id')['price_value'].max()
+        # Último precio de cada publicación: una publicación vista en muchas
+        # ejecuciones cuenta una sola vez entre los comparables
+        self.latest = history.sort_values('scraped_at').drop_duplicates('listing_id', keep='last')
+
+    @classmethod
+    def from_store(cls, search_term: Optional[str] = None, days: Optional[int] = None,
+                   store: Optional[PriceHistoryStore] = None) -> 'DealScorer':
+        """
+        Carga el historial de precios
+
+        Args:
+            search_term: Limitar a un término de búsqueda
+            days: Días de historial (default: Config.DEAL_HISTORY_DAYS; 0 = todo)
+            store: Almacén de historial (PriceHistoryStore por defecto)
+        """
+        days = Config.DEAL_HISTORY_DAYS if days is None else days
+        since = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d") if days else None
+        store = store or PriceHistoryStore()
+        table = store.load_table(columns=['listing_id', 'price_value', 'title', 'scraped_at', 'search_term'],
+                                 search_term=search_term, since=since)
+        return cls(table.to_pandas())
+
+    def score(self, products: List[Dict[str, Any]], search_term: str) -> List[Dict[str, Any]]:
+        """
+        Agrega 'deal_score', 'price_zscore', 'price_drop_pct' y 'comparables' a cada producto
+
+        Args:
+            products: Productos de la ejecución (se modifican en sitio)
+            search_term: Término de búsqueda de la ejecución
+
+        Returns:
+            Los mismos productos
+        """
+        if not products:
+            return products
+
+        current = pd.DataFrame({
+            'listing_id': [extract_listing_id(p.get('url', '')) for p in products],
+            'price_value': pd.to_numeric(pd.Series([p.get('price_value') for p in products], dtype=object),
+                                         errors='coerce'),
+            'title': [p.get('title') or '' for p in products],
+        })
+        current['search_term'] = slugify(search_term)
+        current['reference_price'] = current['listing_id'].map(self.peak_prices)
+
+        others = self.latest[~self.latest['listing_id'].isin(current['listing_id'])]
+        combined = pd.concat([current, others[['listing_id', 'price_value', 'title', 'search_term']]],
+                             ignore_index=True)
+        scored = score_frame(combined).iloc[:len(current)]
+
+        columns = ['deal_score', 'price_zscore', 'price_drop_pct', 'comparables']
+        for product, row in zip(products, scored[columns].itertuples(index=False)):
+            if pd.isna(row.deal_score):
+                continue
+            product['deal_score'] = round(float(row.deal_score), 2)
+            product['price_zscore'] = round(float(row.price_zscore), 2)
+            product['price_drop_pct'] = round(float(row.price_drop_pct), 3)
+            product['comparables'] = int(row.comparables)
+        return products
+
+
+def deal_sort_key(product: Dict[str, Any]):
+    """Orden de reporte: mejor puntaje primero; sin puntaje al final, por precio"""
+    score = product.get('deal_score')
+    price = product.get('price_value')
+    return (score is None, -(score or 0), price if price is not None else float('inf'))
+
+
+def score_products(products: List[Dict[str, Any]], search_term: str) -> List[Dict[str, Any]]:
+    """
+    Atajo: puntúa productos con el historial del término de búsqueda
+
+    Args:
+        products: Productos (se modifican en sitio)
+        search_term: Término de búsqueda
+
+    Returns:
+        Los mismos productos
+    """
+    scorer = DealScorer.from_store(search_term)
+    scorer.score(products, search_term)
+    best = sorted((p for p in products if p.get('deal_score') is not None), key=deal_sort_key)[:3]
+    for product in best:
+        logger.info(f"💎 Oferta {product['deal_score']:+.2f}: {product.get('price', '')} {product.get('title', '')}")
+    return products
@@ -0,0 +1,440 @@
+"""
+Detección de publicaciones casi duplicadas con MinHash + LSH
+
+Los vendedores vuelven a publicar el mismo artículo con otra URL. Cada
+publicación se resume en una firma MinHash sobre shingles de su título y
+descripción normalizados; las firmas se dividen en bandas (LSH) para
+encontrar candidatos sin comparar todos contra todos. Los casi duplicados
+se agrupan en clusters (union-find) y el índice se conserva entre ejecuciones.
+
+Las firmas no cambian una vez calculadas: se guardan en un archivo binario
+aparte (<índice>.sigs) al que cada ejecución solo agrega las nuevas; el JSON
+queda con los clusters y las huellas de tarjetas. El archivo de firmas se
+reescribe completo solo al migrar un índice anterior o cuando acumula
+registros repetidos o un final cortado.
+"""
+import os
+import re
+import json
+import struct
+import base64
+import hashlib
+import logging
+import threading
+import zlib
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from config import Config
+from file_lock import file_lock
+from utils import normalize_text, extract_listing_id
+
+logger = logging.getLogger(__name__)
+
+
+# Primo de Mersenne para las permutaciones universales (a*x + b) mod p
+_MERSENNE_PRIME = (1 << 31) - 1
+_SEED = 42
+# Registro del archivo de firmas: largo del ID (uint16), ID (utf-8) y la firma
+_RECORD_HEADER = struct.Struct('<H')
+# Registros repetidos (varios procesos agregando la misma publicación) tolerados antes de compactar
+_MAX_DUPLICATE_RATIO = 0.25
+
+
+def normalize_for_shingles(text: str) -> str:
+    """
+    Normaliza texto para shingles: sin acentos, sin puntuación, espacios simples
+
+    Args:
+        text: Texto original
+
+    Returns:
+        Texto normalizado
+    """
+    return " ".join(re.split(r'[^a-z0-9]+', normalize_text(text))).strip()
+
+
+def make_shingles(text: str, size: int = 5) -> set:
+    """
+    Genera shingles de caracteres (k-gramas) de un texto normalizado
+
+    Args:
+        text: Texto normalizado
+        size: Longitud de cada shingle
+
+    Returns:
+        Conjunto de shingles (el texto completo si es más corto que size)
+    """
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class NearDuplicateIndex:
+    """Índice MinHash/LSH persistente de publicaciones casi duplicadas"""
+
+    def __init__(self, path: Optional[str] = None, num_perm: int = 128, bands: int = 16,
+                 threshold: float = 0.7, shingle_size: int = 5):
+        """
+        Inicializa el índice (carga el estado previo si existe)
+
+        Args:
+            path: Archivo JSON del índice (usa Config.DEDUPE_INDEX_PATH por defecto)
+            num_perm: Número de permutaciones de la firma MinHash
+            bands: Número de bandas LSH (num_perm debe ser múltiplo)
+            threshold: Similitud Jaccard estimada mínima para considerar duplicado
+            shingle_size: Longitud de los shingles de caracteres
+        """
+        if num_perm % bands != 0:
+            raise ValueError("num_perm debe ser múltiplo de bands")
+
+        self.path = path or Config.DEDUPE_INDEX_PATH
+        self.signatures_path = f"{self.path}.sigs" if self.path else None
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+
+        rng = np.random.RandomState(_SEED)
+        self._perm_a = rng.randint(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._perm_b = rng.randint(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+        self.signatures: Dict[str, np.ndarray] = {}
+        self.parent: Dict[str, str] = {}
+        # Orden de llegada de cada publicación (el representante de un cluster es la más antigua)
+        self.order: Dict[str, int] = {}
+        self.card_digests: Dict[str, str] = {}
+        self.buckets: List[Dict[bytes, List[str]]] = [{} for _ in range(bands)]
+        # Firmas que aún no están en el archivo de firmas
+        self._unsaved: List[str] = []
+        # Reescribir el archivo de firmas completo en el próximo save
+        self._compact = False
+        # El archivo de firmas en disco corresponde a este índice (se puede releer al compactar)
+        self._signatures_valid = False
+        # Varias sesiones (una por región) pueden compartir el índice
+        self._lock = threading.RLock()
+
+        self.load()
+
+    # ------------------------------------------------------------------
+    # Firmas y LSH
+    # ------------------------------------------------------------------
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """
+        Calcula la firma MinHash de un texto
+
+        Args:
+            text: Texto (título + descripción)
+
+        Returns:
+            Arreglo uint32 de num_perm valores, o None si el texto está vacío
+        """
+        shingles = make_shingles(normalize_for_shingles(text), self.shingle_size)
+        if not shingles:
+            return None
+        hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles),
+                             dtype=np.uint64, count=len(shingles))
+        permuted = (np.outer(hashes, self._perm_a) + self._perm_b) % _MERSENNE_PRIME
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        """Divide la firma en bandas y devuelve la clave de cada una"""
+        raw = signature.tobytes()
+        step = self.rows_per_band * 4
+        return [raw[i * step:(i + 1) * step] for i in range(self.bands)]
+
+    def similarity(self, sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+        """Similitud Jaccard estimada entre dos firmas"""
+        return float(np.count_nonzero(sig_a == sig_b)) / self.num_perm
+
+    # ------------------------------------------------------------------
+    # Union-find de clusters
+    # ------------------------------------------------------------------
+    def find(self, listing_id: str) -> str:
+        """Devuelve el representante (cluster_id) de una publicación"""
+        root = listing_id
+        while self.parent.get(root, root) != root:
+            root = self.parent[root]
+        # Compresión de caminos
+        while listing_id != root:
+            next_id = self.parent.get(listing_id, listing_id)
+            self.parent[listing_id] = root
+            listing_id = next_id
+        return root
+
+    def _register(self, listing_id: str):
+        """Agrega una publicación como su propio cluster (si no estaba)"""
+        if listing_id not in self.order:
+            self.order[listing_id] = len(self.order)
+        self.parent.setdefault(listing_id, listing_id)
+
+    def _union(self, a: str, b: str) -> str:
+        """Une dos clusters; el representante es el ID más antiguo en el índice"""
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return root_a
+        rank = lambda lid: (self.order.get(lid, len(self.order)), lid)
+        if rank(root_b) < rank(root_a):
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        return root_a
+
+    def resolve_clusters(self, products: List[Dict[str, Any]]):
+        """
+        Actualiza el 'cluster_id' de productos ya marcados
+
+        Un producto posterior puede unir dos clusters y cambiar el
+        representante de uno de ellos; hay que resolverlo antes de guardar o
+        colapsar (ver collapse_duplicates).
+        """
+        with self._lock:
+            for product in products:
+                listing_id = extract_listing_id(product.get('url', ''))
+                if listing_id and listing_id in self.parent:
+                    product['cluster_id'] = self.find(listing_id)
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+    def add(self, listing_id: str, title: str, description: str = "") -> str:
+        """
+        Agrega (o actualiza) una publicación y la asigna a un cluster
+
+        Args:
+            listing_id: ID de la publicación
+            title: Título
+            description: Descripción
+
+        Returns:
+            cluster_id (ID representante del cluster)
+        """
+        signature = self.signature(f"{title} {description}")
+        with self._lock:
+            self._register(listing_id)
+            if signature is None:
+                return self.find(listing_id)
+
+            if listing_id not in self.signatures:
+                candidates = set()
+                for band, key in enumerate(self._band_keys(signature)):
+                    candidates.update(self.buckets[band].get(key, ()))
+                for candidate in candidates:
+                    if self.similarity(signature, self.signatures[candidate]) >= self.threshold:
+                        self._union(candidate, listing_id)
+
+                self._index_signature(listing_id, signature)
+                self._unsaved.append(listing_id)
+
+            return self.find(listing_id)
+
+    def _index_signature(self, listing_id: str, signature: np.ndarray):
+        """Registra la firma y la agrega a sus bandas LSH"""
+        self.signatures[listing_id] = signature
+        for band, key in enumerate(self._band_keys(signature)):
+            self.buckets[band].setdefault(key, []).append(listing_id)
+
+    @staticmethod
+    def _card_digest(card_text: str) -> str:
+        """Huella del texto normalizado de la tarjeta de resultados"""
+        normalized = normalize_for_shingles(card_text)
+        return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:16] if normalized else ""
+
+    def remember_card(self, card_text: str, listing_id: str):
+        """
+        Guarda el texto de la tarjeta de resultados de una publicación ya visitada
+
+        Args:
+            card_text: Texto visible de la tarjeta (título, precio, ubicación)
+            listing_id: ID de la publicación
+        """
+        digest = self._card_digest(card_text)
+        if digest:
+            with self._lock:
+                self.card_digests.setdefault(digest, listing_id)
+
+    def match_card(self, card_text: str, listing_id: str) -> Optional[str]:
+        """
+        Indica si la tarjeta coincide con la de otra publicación ya conocida
+
+        Args:
+            card_text: Texto visible de la tarjeta
+            listing_id: ID de la publicación de la tarjeta
+
+        Returns:
+            cluster_id de la publicación coincidente, o None si no hay coincidencia
+        """
+        digest = self._card_digest(card_text)
+        with self._lock:
+            known = self.card_digests.get(digest) if digest else None
+            if known and known != listing_id:
+                return self.find(known)
+        return None
+
+    # ------------------------------------------------------------------
+    # Persistencia
+    # ------------------------------------------------------------------
+    def load(self):
+        """Carga el índice desde disco y reconstruye las bandas LSH"""
+        if not self.path or not os.path.exists(self.path):
+            # Firmas de un índice borrado: se reemplazan en el próximo save
+            self._compact = bool(self.signatures_path and os.path.exists(self.signatures_path))
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('num_perm') != self.num_perm:
+                logger.warning("Índice de duplicados con parámetros distintos, se ignora")
+                self._compact = True
+                return
+            self._signatures_valid = True
+            self._read_signatures(self._index_signature)
+            # Índice anterior con las firmas en el JSON: pasan al archivo de firmas
+            legacy = data.get('signatures', {})
+            for listing_id, encoded in legacy.items():
+                if listing_id not in self.signatures:
+                    signature = np.frombuffer(base64.b64decode(encoded), dtype=np.uint32).copy()
+                    self._index_signature(listing_id, signature)
+            if legacy:
+                self._compact = True
+            self.parent = data.get('parent', {})
+            # El JSON conserva el orden de llegada de 'parent'
+            self.order = {listing_id: i for i, listing_id in enumerate(self.parent)}
+            for listing_id in self.signatures:
+                self._register(listing_id)
+            self.card_digests = data.get('cards', {})
+            logger.info(f"Índice de duplicados cargado: {len(self.signatures)} publicaciones")
+        except Exception as e:
+            logger.error(f"Error cargando índice de duplicados: {e}")
+
+    def _read_signatures(self, callback) -> int:
+        """
+        Lee el archivo de firmas llamando callback(listing_id, firma) por cada ID nuevo
+
+        Marca la compactación si encuentra un final cortado o muchos repetidos.
+
+        Returns:
+            Registros leídos
+        """
+        if not self.signatures_path or not os.path.exists(self.signatures_path):
+            return 0
+        with open(self.signatures_path, 'rb') as f:
+            raw = f.read()
+        signature_size = self.num_perm * 4
+        offset = records = duplicates = 0
+        seen = set()
+        while offset + _RECORD_HEADER.size <= len(raw):
+            (id_length,) = _RECORD_HEADER.unpack_from(raw, offset)
+            end = offset + _RECORD_HEADER.size + id_length + signature_size
+            if end > len(raw):
+                break
+            listing_id = raw[offset + _RECORD_HEADER.size:end - signature_size].decode('utf-8')
+            offset = end
+            records += 1
+            if listing_id in seen or listing_id in self.signatures:
+                duplicates += 1
+                continue
+            seen.add(listing_id)
+            callback(listing_id, np.frombuffer(raw, dtype=np.uint32, count=self.num_perm,
+                                               offset=end - signature_size).copy())
+        if offset != len(raw):
+            logger.warning("Archivo de firmas con un final cortado, se compactará")
+            self._compact = True
+        if duplicates > records * _MAX_DUPLICATE_RATIO:
+            self._compact = True
+        return records
+
+    @staticmethod
+    def _encode_record(listing_id: str, signature: np.ndarray) -> bytes:
+        encoded_id = listing_id.encode('utf-8')
+        return _RECORD_HEADER.pack(len(encoded_id)) + encoded_id + signature.astype(np.uint32).tobytes()
+
+    def _save_signatures(self) -> int:
+        """
+        Agrega las firmas nuevas al archivo de firmas (o lo reescribe si toca compactar)
+
+        Returns:
+            Firmas escritas
+        """
+        with file_lock(f"{self.path}.lock"):
+            if self._compact:
+                # Conservar lo que otros procesos agregaron desde que se cargó
+                if self._signatures_valid:
+                    self._read_signatures(self._index_signature)
+                ids = list(self.signatures)
+                tmp_path = self.signatures_path + '.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(b''.join(self._encode_record(lid, self.signatures[lid]) for lid in ids))
+                os.replace(tmp_path, self.signatures_path)
+                logger.info(f"Archivo de firmas compactado: {len(ids)} firmas")
+            else:
+                ids = self._unsaved
+                if ids:
+                    with open(self.signatures_path, 'ab') as f:
+                        f.write(b''.join(self._encode_record(lid, self.signatures[lid]) for lid in ids))
+        written = len(ids)
+        self._unsaved = []
+        self._compact = False
+        self._signatures_valid = True
+        return written
+
+    def save(self):
+        """Guarda el índice en disco (firmas nuevas al final del archivo de firmas, JSON atómico)"""
+        if not self.path:
+            return
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with self._lock:
+                written = self._save_signatures()
+                data = {
+                    'num_perm': self.num_perm,
+                    'parent': dict(self.parent),
+                    'cards': dict(self.card_digests),
+                }
+                tmp_path = self.path + '.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, separators=(',', ':'))
+                os.replace(tmp_path, self.path)
+            logger.info(f"Índice de duplicados guardado: {self.path} ({written} firmas escritas)")
+        except Exception as e:
+            logger.error(f"Error guardando índice de duplicados: {e}")
+
+
+def collapse_duplicates(products: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Colapsa cada cluster de casi duplicados en una sola tarjeta
+
+    El representante es la publicación más barata del cluster; se le agregan
+    'duplicate_count' y 'duplicate_urls' con las demás publicaciones.
+
+    Args:
+        products: Productos con 'cluster_id' ya resuelto con
+            NearDuplicateIndex.resolve_clusters (los que no lo tienen se conservan)
+
+    Returns:
+        Nueva lista de productos, uno por cluster, en el orden original
+    """
+    clusters: Dict[str, List[Dict[str, Any]]] = {}
+    order = []
+    for product in products:
+        key = product.get('cluster_id') or extract_listing_id(product.get('url', '')) or id(product)
+        if key not in clusters:
+            clusters[key] = []
+            order.append(key)
+        clusters[key].append(product)
+
+    collapsed = []
+    for key in order:
+        members = clusters[key]
+        if len(members) == 1:
+            collapsed.append(members[0])
+            continue
+        best = min(members, key=lambda p: p.get('price_value') if p.get('price_value') is not None else float('inf'))
+        representative = dict(best)
+        representative['duplicate_count'] = len(members)
+        representative['duplicate_urls'] = [p.get('url') for p in members if p is not best]
+        collapsed.append(representative)
+    return collapsed
@@ -0,0 +1,172 @@
+"""
+Planificador de visitas a páginas de detalle con presupuesto de tiempo
+
+Las tarjetas de resultados se recolectan primero (rápido) y forman la
+"frontera" de publicaciones por visitar. El planificador las ordena con una
+función de prioridad (más baratas, más nuevas o mayor baja de precio) y
+entrega la siguiente solo si cabe dentro del presupuesto de tiempo, estimando
+la duración de cada visita con las anteriores. Así las publicaciones más
+valiosas siempre se visitan primero y la ejecución termina a tiempo.
+"""
+import heapq
+import logging
+import time
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Callable, Tuple
+
+from utils import extract_listing_id
+
+logger = logging.getLogger(__name__)
+
+
+# Duración estimada de una visita antes de tener mediciones (segundos)
+DEFAULT_ITEM_SECONDS = 6.0
+# Peso de la última medición en el promedio móvil exponencial
+_EWMA_ALPHA = 0.3
+
+
+def _first_seen_ts(record: Optional[Dict[str, Any]]) -> float:
+    """Convierte la fecha first_seen de SeenListings en timestamp (0 si no existe)"""
+    if not record or not record.get('first_seen'):
+        return 0.0
+    try:
+        return datetime.strptime(record['first_seen'], "%Y-%m-%d %H:%M:%S").timestamp()
+    except ValueError:
+        return 0.0
+
+
+def cheapest_first(product: Dict[str, Any], record: Optional[Dict[str, Any]]) -> Tuple:
+    """Prioridad: menor precio primero (sin precio al final)"""
+    price = product.get('price_value')
+    return (price is None, price if price is not None else 0)
+
+
+def newest_first(product: Dict[str, Any], record: Optional[Dict[str, Any]]) -> Tuple:
+    """Prioridad: publicaciones nunca vistas primero, luego las vistas más recientemente por primera vez"""
+    return (record is not None, -_first_seen_ts(record))
+
+
+def biggest_drop_first(product: Dict[str, Any], record: Optional[Dict[str, Any]]) -> Tuple:
+    """Prioridad: mayor baja de precio (relativa) respecto a la última ejecución"""
+    price = product.get('price_value')
+    last_price = record.get('last_price') if record else None
+    if price is None or not last_price:
+        return (1, 0.0)
+    drop = (last_price - price) / last_price
+    return (0 if drop > 0 else 1, -drop)
+
+
+PRIORITIES: Dict[str, Callable[[Dict[str, Any], Optional[Dict[str, Any]]], Tuple]] = {
+    'cheapest': cheapest_first,
+    'newest': newest_first,
+    'price_drop': biggest_drop_first,
+}
+
+
+class DetailScheduler:
+    """Frontera priorizada de publicaciones con fecha límite"""
+
+    def __init__(self, budget_seconds: Optional[float] = None, priority: str = 'cheapest',
+                 history: Optional[Dict[str, Dict[str, Any]]] = None,
+                 item_seconds: float = DEFAULT_ITEM_SECONDS):
+        """
+        Inicializa el planificador y arranca el reloj del presupuesto
+
+        Args:
+            budget_seconds: Tiempo total disponible (None = sin límite)
+            priority: Nombre de la prioridad ('cheapest', 'newest', 'price_drop')
+            history: Registros de SeenListings.get_many (listing_id -> datos previos)
+            item_seconds: Duración estimada inicial de cada visita
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Prioridad desconocida: {priority} (opciones: {', '.join(PRIORITIES)})")
+
+        self.priority = priority
+        self.priority_fn = PRIORITIES[priority]
+        self.history = history or {}
+        self.started_at = time.perf_counter()
+        self.deadline = self.started_at + budget_seconds if budget_seconds else None
+        self.item_seconds = item_seconds
+
+        self._heap: List[Tuple] = []
+        self._counter = 0
+        self.visited = 0
+        self.skipped: List[Dict[str, Any]] = []
+        self.deadline_hit = False
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, product: Dict[str, Any]):
+        """
+        Agrega una publicación a la frontera
+
+        Args:
+            product: Producto (de tarjeta) con 'url' y 'price_value'
+        """
+        record = self.history.get(extract_listing_id(product.get('url', '')))
+        key = self.priority_fn(product, record)
+        # El contador desempata conservando el orden de la página
+        heapq.heappush(self._heap, (key, self._counter, product))
+        self._counter += 1
+
+    def time_left(self) -> Optional[float]:
+        """Segundos restantes del presupuesto (None = sin límite)"""
+        if self.deadline is None:
+            return None
+        return self.deadline - time.perf_counter()
+
+    def has_time(self, seconds: Optional[float] = None) -> bool:
+        """
+        Indica si cabe una operación más antes de la fecha límite
+
+        Args:
+            seconds: Duración de la operación (por defecto, la estimada por visita)
+        """
+        remaining = self.time_left()
+        if remaining is None:
+            return True
+        return remaining >= (self.item_seconds if seconds is None else seconds)
+
+    def next(self) -> Optional[Dict[str, Any]]:
+        """
+        Devuelve la publicación de mayor prioridad si cabe en el presupuesto
+
+        Returns:
+            Producto a visitar, o None si la frontera está vacía o no queda tiempo
+        """
+        if not self._heap:
+            return None
+        if not self.has_time():
+            self.deadline_hit = True
+            return None
+        return heapq.heappop(self._heap)[2]
+
+    def record(self, duration: float):
+        """
+        Registra la duración de una visita para ajustar la estimación
+
+        Args:
+            duration: Segundos que tomó la visita
+        """
+        self.visited += 1
+        self.item_seconds = (1 - _EWMA_ALPHA) * self.item_seconds + _EWMA_ALPHA * duration
+
+    def finish(self) -> Dict[str, Any]:
+        """
+        Cierra la frontera: lo que queda pendiente se reporta como omitido
+
+        Returns:
+            Estadísticas de la ejecución ('visited', 'skipped', 'deadline_hit', ...)
+        """
+        while self._heap:
+            self.skipped.append(heapq.heappop(self._heap)[2])
+        return {
+            'priority': self.priority,
+            'elapsed': time.perf_counter() - self.started_at,
+            'visited': self.visited,
+            'deadline_hit': self.deadline_hit,
+            'avg_item_seconds': self.item_seconds,
+            'skipped': [{'url': p.get('url'), 'title': p.get('title'), 'price_value': p.get('price_value')}
+                        for p in self.skipped],
+        }
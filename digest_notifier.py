@@ -0,0 +1,286 @@
+"""
+Resumen de notificaciones por email (digest)
+
+En lugar de un correo por búsqueda, las búsquedas de una ejecución (o de una
+ventana del modo vigilancia) se acumulan y se envía un solo resumen por
+destinatario:
+
+- Solo publicaciones nuevas o con cambio de precio respecto a la última vez
+  que se vieron (SeenListings).
+- Cuerpo compacto (una fila por publicación, sin CSS pesado ni JavaScript);
+  el reporte completo va adjunto comprimido con gzip (.html.gz) en lugar de
+  repetir el mismo HTML en el cuerpo y en base64.
+- Una sola conexión SMTP autenticada para todos los destinatarios.
+
+El servidor se configura con SMTP_HOST / SMTP_PORT / SMTP_STARTTLS, así se
+puede probar contra un servidor SMTP local (sin contraseña no se hace login).
+"""
+import os
+import gzip
+import html
+import getpass
+import smtplib
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from email.message import EmailMessage
+from typing import List, Dict, Any, Optional, Tuple
+
+from config import Config
+from deal_scoring import deal_sort_key
+from utils import extract_listing_id
+
+logger = logging.getLogger(__name__)
+
+
+# Filas por búsqueda en el cuerpo del correo (el resto va en el adjunto;
+# los clientes de correo no ejecutan el JavaScript del reporte virtualizado)
+INLINE_MAX_PER_JOB = 50
+# Un cambio de precio menor a esto (en dólares) no se notifica
+MIN_PRICE_CHANGE = 1.0
+
+_CHANGE_LABELS = {'new': '🆕 Nueva', 'price_drop': '📉 Bajó', 'price_up': '📈 Subió'}
+
+
+def classify_changes(products: List[Dict[str, Any]],
+                     previous: Optional[Dict[str, Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """
+    Marca y devuelve las publicaciones nuevas o con cambio de precio
+
+    Args:
+        products: Productos de la ejecución
+        previous: Estado anterior de SeenListings.get_many (listing_id ->
+            {'last_price': ...}); None = ya vienen filtradas (sin 'change' = nueva)
+
+    Returns:
+        Productos que cambiaron, con 'change' ('new', 'price_drop' o
+        'price_up') y 'previous_price' en los cambios de precio
+    """
+    changed = []
+    for product in products:
+        if previous is None:
+            product.setdefault('change', 'new')
+            changed.append(product)
+            continue
+        state = previous.get(extract_listing_id(product.get('url', '')))
+        if state is None:
+            product['change'] = 'new'
+        else:
+            old, new = state.get('last_price'), product.get('price_value')
+            if old is None or new is None or abs(new - old) < MIN_PRICE_CHANGE:
+                continue
+            product['change'] = 'price_drop' if new < old else 'price_up'
+            product['previous_price'] = old
+        changed.append(product)
+    return changed
+
+
+def resolve_credentials(sender_email: Optional[str] = None, sender_password: Optional[str] = None,
+                        interactive: bool = False) -> Tuple[str, Optional[str]]:
+    """
+    Remitente y contraseña: argumentos, luego .env y (si interactive) se piden por consola
+
+    Returns:
+        (remitente, contraseña o None)
+    """
+    sender_email = sender_email or Config.GMAIL_USER
+    sender_password = sender_password or Config.GMAIL_APP_PASSWORD or None
+    if interactive:
+        if not sender_email:
+            sender_email = input("\n📧 Email de Gmail (remitente): ").strip()
+        if not sender_password:
+            print("\n🔑 Contraseña de aplicación de Gmail")
+            print("   (Crear en: https://myaccount.google.com/apppasswords)")
+            sender_password = getpass.getpass("   Password: ")
+    return sender_email, sender_password
+
+
+@contextmanager
+def smtp_session(sender_email: str, sender_password: Optional[str] = None, host: Optional[str] = None,
+                 port: Optional[int] = None, starttls: Optional[bool] = None):
+    """
+    Conexión SMTP autenticada (se cierra al salir del bloque)
+
+    Args:
+        sender_email: Usuario de login
+        sender_password: Contraseña (None = sin login, ej: servidor local de pruebas)
+        host: Servidor (default: Config.SMTP_HOST)
+        port: Puerto (default: Config.SMTP_PORT; 465 = SSL directo)
+        starttls: Cifrar con STARTTLS (default: Config.SMTP_STARTTLS)
+    """
+    host = host or Config.SMTP_HOST
+    port = port or Config.SMTP_PORT
+    starttls = Config.SMTP_STARTTLS if starttls is None else starttls
+
+    logger.info(f"📤 Conectando con {host}:{port}...")
+    if port == 465:
+        server = smtplib.SMTP_SSL(host, port, timeout=Config.SMTP_TIMEOUT)
+    else:
+        server = smtplib.SMTP(host, port, timeout=Config.SMTP_TIMEOUT)
+        if starttls:
+            server.starttls()
+    try:
+        if sender_password:
+            server.login(sender_email, sender_password)
+        yield server
+    finally:
+        try:
+            server.quit()
+        except smtplib.SMTPException:
+            server.close()
+
+
+def gzip_attachment(content: str) -> bytes:
+    """HTML comprimido con gzip (mtime fijo: mismo contenido, mismos bytes)"""
+    return gzip.compress(content.encode('utf-8'), compresslevel=9, mtime=0)
+
+
+def _format_price(value) -> str:
+    return f"${value:,.0f}" if value is not None else ""
+
+
+def _render_row(product: Dict[str, Any]) -> str:
+    change = product.get('change', 'new')
+    label = _CHANGE_LABELS.get(change, '')
+    if change in ('price_drop', 'price_up'):
+        label += f" (antes {_format_price(product.get('previous_price'))})"
+    score = product.get('deal_score')
+    badge = f" 💎 {score:+.1f}" if score is not None and score >= 1 else ""
+    images = product.get('images') or ()
+    thumb = (f'<img src="{html.escape(images[0])}" width="64" height="64" style="object-fit:cover;border-radius:4px">'
+             if images else "")
+    return (f'<tr><td style="padding:4px">{thumb}</td>'
+            f'<td style="padding:4px"><a href="{html.escape(product.get("url", ""))}">'
+            f'{html.escape(product.get("title") or "Sin título")}</a><br>'
+            f'<b>{html.escape(product.get("price") or "")}</b>{badge} · {label}<br>'
+            f'<small>{html.escape(product.get("location") or "")}</small></td></tr>')
+
+
+class DigestNotifier:
+    """Acumula búsquedas y envía un resumen por destinatario con una sola conexión SMTP"""
+
+    def __init__(self, sender_email: Optional[str] = None, sender_password: Optional[str] = None,
+                 interactive: bool = False, host: Optional[str] = None, port: Optional[int] = None,
+                 starttls: Optional[bool] = None):
+        """
+        Args:
+            sender_email: Remitente (default: Config.GMAIL_USER)
+            sender_password: Contraseña de aplicación (default: Config.GMAIL_APP_PASSWORD)
+            interactive: Pedir por consola las credenciales que falten
+            host, port, starttls: Servidor SMTP (default: Config.SMTP_*)
+        """
+        self.sender_email = sender_email
+        self.sender_password = sender_password
+        self.interactive = interactive
+        self.host = host
+        self.port = port
+        self.starttls = starttls
+        self.jobs: Dict[str, List[Dict[str, Any]]] = {}
+
+    @property
+    def pending(self) -> int:
+        """Publicaciones acumuladas sin enviar"""
+        return sum(len(job['products']) for jobs in self.jobs.values() for job in jobs)
+
+    def add_job(self, recipient: str, search_term: str, products: List[Dict[str, Any]],
+                zip_code: str = "", min_price: float = 0, max_price: float = 999999,
+                report_path: Optional[str] = None,
+                previous: Optional[Dict[str, Dict[str, Any]]] = None) -> int:
+        """
+        Agrega al resumen las publicaciones nuevas o con cambio de precio de una búsqueda
+
+        Args:
+            recipient: Email destino
+            search_term: Término de búsqueda
+            products: Productos de la búsqueda
+            zip_code, min_price, max_price: Parámetros de la búsqueda (para el reporte)
+            report_path: Reporte HTML completo a adjuntar (si None se adjunta el
+                reporte de las publicaciones que cambiaron)
+            previous: Estado anterior (SeenListings.get_many, leído ANTES de
+                mark_seen); None = los productos ya vienen filtrados
+
+        Returns:
+            Número de publicaciones agregadas al resumen
+        """
+        changed = classify_changes(products, previous)
+        if changed:
+            self.jobs.setdefault(recipient, []).append({
+                'search_term': search_term, 'zip_code': zip_code, 'min_price': min_price,
+                'max_price': max_price, 'products': changed, 'report_path': report_path,
+            })
+        return len(changed)
+
+    def build_message(self, recipient: str, jobs: List[Dict[str, Any]]) -> EmailMessage:
+        """Arma el correo de resumen de un destinatario"""
+        from offerup_detailed_scraper import generate_mobile_html
+
+        new = sum(1 for job in jobs for p in job['products'] if p.get('change') == 'new')
+        changes = sum(len(job['products']) for job in jobs) - new
+        terms = ", ".join(dict.fromkeys(job['search_term'] for job in jobs))
+        summary = f"{new} nueva{'s' if new != 1 else ''}"
+        if changes:
+            summary += f", {changes} cambio{'s' if changes != 1 else ''} de precio"
+
+        msg = EmailMessage()
+        msg['From'] = self.sender_email
+        msg['To'] = recipient
+        msg['Subject'] = f"📬 OfferUp - {terms}: {summary}"
+
+        sections = []
+        attachments = []
+        for job in jobs:
+            products = sorted(job['products'], key=deal_sort_key)
+            rows = "".join(_render_row(p) for p in products[:INLINE_MAX_PER_JOB])
+            more = len(products) - INLINE_MAX_PER_JOB
+            sections.append(
+                f'<h3 style="margin:16px 0 4px">{html.escape(job["search_term"])}'
+                f' <small>({html.escape(str(job["zip_code"]))}) · {len(products)}</small></h3>'
+                f'<table style="border-collapse:collapse">{rows}</table>'
+                + (f'<p><small>+{more} más en el adjunto</small></p>' if more > 0 else ''))
+
+            report_path = job['report_path']
+            if report_path and os.path.exists(report_path):
+                with open(report_path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+                name = os.path.basename(report_path)
+            else:
+                content = generate_mobile_html(products, job['search_term'], job['zip_code'],
+                                               job['min_price'], job['max_price'])
+                name = f"offerup_{job['search_term'].replace(' ', '_')}_cambios.html"
+            attachments.append((f"{name}.gz", gzip_attachment(content)))
+
+        body = (f'<!DOCTYPE html><html><body style="font-family:Arial,sans-serif;font-size:14px">'
+                f'<p>{summary} · {datetime.now().strftime("%Y-%m-%d %H:%M")}</p>'
+                f'{"".join(sections)}</body></html>')
+        msg.set_content(f"OfferUp: {summary} ({terms}). Abre el correo en modo HTML o el adjunto.")
+        msg.add_alternative(body, subtype='html')
+        for filename, data in attachments:
+            msg.add_attachment(data, maintype='application', subtype='gzip', filename=filename)
+        return msg
+
+    def flush(self) -> int:
+        """
+        Envía un resumen por destinatario usando una sola conexión SMTP
+
+        Returns:
+            Número de correos enviados (los que fallan se conservan para el siguiente envío)
+        """
+        if not self.jobs:
+            return 0
+        self.sender_email, self.sender_password = resolve_credentials(
+            self.sender_email, self.sender_password, self.interactive)
+        self.interactive = False
+
+        sent = 0
+        try:
+            with smtp_session(self.sender_email, self.sender_password, self.host, self.port,
+                              self.starttls) as server:
+                for recipient in list(self.jobs):
+                    msg = self.build_message(recipient, self.jobs[recipient])
+                    server.send_message(msg)
+                    del self.jobs[recipient]
+                    sent += 1
+                    logger.info(f"✅ Resumen enviado a {recipient} ({len(msg.as_bytes()) / 1024:.1f} KB)")
+        except Exception as e:
+            logger.error(f"❌ Error al enviar resumen: {e}")
+        return sent
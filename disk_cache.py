@@ -0,0 +1,181 @@
+"""
+Caché en disco con expiración (TTL) y límite de tamaño (LRU)
+
+Guarda valores JSON en SQLite (modo WAL) bajo una clave de texto. Cada
+entrada expira después de ttl_seconds y, al superar max_entries, se eliminan
+por lotes las menos usadas recientemente (hasta EVICT_TO de max_entries), así
+una escritura normal no recorre la tabla. Varios hilos pueden compartir una
+instancia y varios procesos pueden abrir el mismo archivo. Cada caché vive en
+su propia tabla, así que un mismo archivo puede alojar varias (detalles,
+páginas...).
+"""
+import os
+import re
+import json
+import time
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# Fracción de max_entries que queda después de una eliminación por lote
+EVICT_TO = 0.9
+
+
+class DiskCache:
+    """Caché clave -> valor JSON con TTL, tope LRU y contadores de aciertos"""
+
+    def __init__(self, path: str, table: str = "cache", ttl_seconds: float = 3600,
+                 max_entries: int = 10000):
+        """
+        Abre (o crea) la caché
+
+        Args:
+            path: Archivo SQLite
+            table: Nombre de la tabla (una por tipo de dato)
+            ttl_seconds: Segundos de vigencia de cada entrada (0 = no expiran)
+            max_entries: Máximo de entradas antes de eliminar las menos usadas
+        """
+        if not re.fullmatch(r'[A-Za-z_][A-Za-z0-9_]*', table):
+            raise ValueError(f"Nombre de tabla inválido: {table}")
+
+        self.path = path
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                stored_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self.conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_last_access ON {table} (last_access)")
+        self.conn.commit()
+        # Entradas estimadas (otros procesos también escriben: se recuenta antes de eliminar)
+        self._count = self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Obtiene un valor vigente y lo marca como usado recientemente
+
+        Args:
+            key: Clave
+
+        Returns:
+            Valor guardado, o None si no existe o ya expiró
+        """
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                f"SELECT value, stored_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, stored_at = row
+            if self.ttl_seconds and now - stored_at > self.ttl_seconds:
+                self.conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self.conn.commit()
+                self._count -= 1
+                self.misses += 1
+                self.expired += 1
+                return None
+            self.conn.execute(f"UPDATE {self.table} SET last_access = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+            self.hits += 1
+        return json.loads(value)
+
+    def set(self, key: str, value: Any):
+        """
+        Guarda un valor (reemplaza el anterior y reinicia su TTL)
+
+        Args:
+            key: Clave
+            value: Valor serializable a JSON
+        """
+        now = time.time()
+        payload = json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+        with self._lock:
+            exists = self.conn.execute(f"SELECT 1 FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            self.conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, stored_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, payload, now, now))
+            if exists is None:
+                self._count += 1
+            if self.max_entries and self._count > self.max_entries:
+                self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        """Elimina las menos usadas hasta EVICT_TO de max_entries (con el lock tomado)"""
+        self._count = self.conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        if self._count <= self.max_entries:
+            return
+        excess = self._count - int(self.max_entries * EVICT_TO)
+        # Recorre el índice de last_access desde la más antigua: no ordena la tabla
+        cursor = self.conn.execute(
+            f"DELETE FROM {self.table} WHERE key IN ("
+            f"SELECT key FROM {self.table} ORDER BY last_access ASC LIMIT ?)", (excess,))
+        removed = max(cursor.rowcount, 0)
+        self._count -= removed
+        self.evicted += removed
+
+    def delete(self, key: str):
+        """Elimina una entrada"""
+        with self._lock:
+            cursor = self.conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self.conn.commit()
+            self._count -= max(cursor.rowcount, 0)
+
+    def purge_expired(self) -> int:
+        """
+        Elimina todas las entradas expiradas
+
+        Returns:
+            Número de entradas eliminadas
+        """
+        if not self.ttl_seconds:
+            return 0
+        with self._lock:
+            cursor = self.conn.execute(f"DELETE FROM {self.table} WHERE stored_at < ?",
+                                       (time.time() - self.ttl_seconds,))
+            self.conn.commit()
+            self._count -= max(cursor.rowcount, 0)
+        return max(cursor.rowcount, 0)
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de uso de la caché en esta instancia"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'expired': self.expired,
+            'evicted': self.evicted,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        """Cierra la conexión"""
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,51 @@
+"""
+Lock exclusivo entre procesos sobre un archivo
+
+El daemon, el modo vigilancia y las ejecuciones manuales escriben en los
+mismos archivos de data/ (archivo de páginas, filtro de vistos). Un lock de
+hilos no alcanza: hace falta un lock del sistema operativo (fcntl.flock en
+Linux/macOS, msvcrt.locking en Windows).
+
+Uso:
+    with file_lock(os.path.join(directory, "archive.lock")):
+        ...
+"""
+import os
+import time
+from contextlib import contextmanager
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+
+@contextmanager
+def file_lock(path: str):
+    """
+    Retiene el lock exclusivo de path (el archivo se crea si no existe)
+
+    Cada llamada abre su propio descriptor, así también excluye a otros
+    hilos del mismo proceso.
+    """
+    with open(path, 'a+b') as f:
+        if os.name == 'nt':
+            f.seek(0)
+            while True:
+                try:
+                    # LK_LOCK reintenta 10 veces (1 s) antes de fallar
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.05)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
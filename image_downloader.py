@@ -0,0 +1,290 @@
+"""
+Descarga concurrente de imágenes
+
+Antes cada imagen se bajaba con su propia conexión (requests.get sin sesión),
+una detrás de otra. ImageDownloader:
+
+- Usa una sesión HTTP con pool de conexiones (keep-alive; compresión
+  gzip/deflate si el servidor la ofrece), así las imágenes del mismo CDN
+  reutilizan la conexión TLS.
+- Descarga en paralelo con un pool acotado de hilos (IMAGE_DOWNLOAD_MAX_WORKERS).
+- Limita las descargas simultáneas por host con un controlador adaptativo
+  (concurrency.py, máximo IMAGE_DOWNLOAD_PER_HOST), además del límite de
+  velocidad por dominio.
+- Reporta el progreso (imágenes, MB e imágenes/s).
+- Escribe por partes a un archivo temporal (.part) que se renombra al
+  terminar (un archivo con el nombre final siempre está completo y se omite).
+  Un .part de una descarga cortada se reanuda con un Range (If-Range con el
+  ETag/Last-Modified guardado, así un archivo que cambió se baja de nuevo).
+- Rechaza por los headers, antes de bajar el cuerpo, lo que no es una imagen
+  o pasa de IMAGE_MAX_BYTES (y corta si el cuerpo pasa del límite).
+
+Uso:
+    with ImageDownloader() as downloader:
+        results = downloader.download_many([(url, path), ...])
+"""
+import os
+import re
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import Config
+from concurrency import get_controller, THROTTLE_STATUS, THROTTLED, SKIP
+from rate_limiter import domain_of
+from resilience import fetch, CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Accept': 'image/avif,image/webp,image/apng,image/*,*/*;q=0.8',
+    'Accept-Encoding': 'gzip, deflate',
+}
+PART_SUFFIX = '.part'
+# Validador (ETag o Last-Modified) de la respuesta que generó el .part
+VALIDATOR_SUFFIX = '.part.meta'
+CHUNK_SIZE = 64 * 1024
+# Cortes a mitad del cuerpo (se reanuda desde lo ya escrito)
+STREAM_ERRORS = (requests.exceptions.ChunkedEncodingError, requests.ConnectionError, requests.Timeout)
+CONTENT_RANGE_PATTERN = re.compile(r'bytes (\d+)-(\d+)/(\d+|\*)')
+
+
+class RejectedDownload(Exception):
+    """La respuesta no es una imagen aceptable (tipo o tamaño)"""
+
+
+class RestartDownload(Exception):
+    """El .part no corresponde al archivo actual (se descartó; hay que empezar de cero)"""
+
+
+class ImageDownloader:
+    """Descargas de imágenes con sesión compartida, pool de hilos y límite por host"""
+
+    def __init__(self, max_workers: Optional[int] = None, per_host: Optional[int] = None,
+                 headers: Optional[dict] = None):
+        """
+        Args:
+            max_workers: Descargas simultáneas en total (default: Config.IMAGE_DOWNLOAD_MAX_WORKERS)
+            per_host: Máximo de descargas simultáneas por host (default: Config.IMAGE_DOWNLOAD_PER_HOST)
+            headers: Headers extra de la sesión
+        """
+        self.max_workers = max_workers or Config.IMAGE_DOWNLOAD_MAX_WORKERS
+        self.per_host = per_host or Config.IMAGE_DOWNLOAD_PER_HOST
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update(DEFAULT_HEADERS)
+        if headers:
+            self.session.headers.update(headers)
+        self.downloaded = 0
+        self.skipped = 0
+        self.failed = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    def download(self, url: str, save_path: str) -> bool:
+        """
+        Descarga una imagen (se omite si save_path ya existe; reanuda un .part)
+
+        Args:
+            url: URL de la imagen
+            save_path: Ruta donde guardarla
+
+        Returns:
+            True si la imagen quedó guardada
+        """
+        if os.path.exists(save_path) and os.path.getsize(save_path) > 0:
+            with self._lock:
+                self.skipped += 1
+            return True
+        part_path = save_path + PART_SUFFIX
+        try:
+            for attempt in range(1, Config.RETRY_ATTEMPTS + 1):
+                try:
+                    size = self._stream(url, part_path)
+                    break
+                except (STREAM_ERRORS + (RestartDownload,)) as e:
+                    if attempt == Config.RETRY_ATTEMPTS:
+                        raise
+                    if isinstance(e, RestartDownload):
+                        logger.info(f"🔁 {e}, se descarga de nuevo: {url}")
+                    else:
+                        logger.warning(f"🔁 Descarga cortada ({type(e).__name__}), se reanuda: {url}")
+            os.replace(part_path, save_path)
+            self._discard(part_path, keep_part=True)
+            self._count(True, size)
+            logger.debug(f"Imagen descargada: {save_path}")
+            return True
+        except RejectedDownload as e:
+            logger.warning(f"🚫 Imagen rechazada ({e}): {url}")
+            self._discard(part_path)
+        except CircuitOpenError as e:
+            # Servidor de imágenes caído: se omite sin esperar el timeout
+            logger.warning(f"⏭️  Imagen omitida: {e}")
+        except Exception as e:
+            logger.error(f"Error descargando imagen: {e}")
+        self._count(False)
+        return False
+
+    def _stream(self, url: str, part_path: str) -> int:
+        """
+        Escribe el cuerpo en part_path, continuando lo que ya tenga
+
+        Returns:
+            Tamaño final del archivo
+
+        Raises:
+            RejectedDownload, RestartDownload, errores HTTP/red (STREAM_ERRORS si
+            se corta el cuerpo)
+        """
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {}
+        if offset:
+            headers['Range'] = f"bytes={offset}-"
+            # Rangos sobre bytes sin comprimir
+            headers['Accept-Encoding'] = 'identity'
+            validator = self._read_validator(part_path)
+            if validator:
+                headers['If-Range'] = validator
+
+        # Límite adaptativo de descargas simultáneas al host
+        controller = get_controller(f"image_download:{domain_of(url)}", self.per_host)
+        with controller.slot() as slot:
+            response = fetch(url, session=self.session, headers=headers, stream=True)
+            with response:
+                status = response.status_code
+                if status in THROTTLE_STATUS:
+                    slot.mark(THROTTLED)
+                try:
+                    if status == 416 or (status == 206 and self._range_start(response) != offset):
+                        self._discard(part_path)
+                        raise RestartDownload(f"Rango no válido (HTTP {status})")
+                    if status not in (200, 206):
+                        raise RejectedDownload(f"HTTP {status}")
+                    self._check_headers(response)
+                except (RejectedDownload, RestartDownload):
+                    # Un 404 o un archivo cambiado no dicen nada de la congestión del host
+                    slot.mark(slot.result or SKIP)
+                    raise
+                if status == 200:
+                    offset = 0
+                    self._write_validator(part_path, response)
+                with open(part_path, 'ab' if offset else 'wb') as f:
+                    written = offset
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        written += len(chunk)
+                        if written > Config.IMAGE_MAX_BYTES:
+                            slot.mark(SKIP)
+                            raise RejectedDownload(f"más de {Config.IMAGE_MAX_BYTES} bytes")
+                        f.write(chunk)
+        return written
+
+    @staticmethod
+    def _range_start(response: requests.Response) -> int:
+        match = CONTENT_RANGE_PATTERN.match(response.headers.get('Content-Range', ''))
+        return int(match.group(1)) if match else -1
+
+    @staticmethod
+    def _check_headers(response: requests.Response):
+        """Rechaza antes de bajar el cuerpo lo que no es imagen o es demasiado grande"""
+        content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type and not content_type.startswith('image/'):
+            raise RejectedDownload(f"tipo {content_type}")
+        total = response.headers.get('Content-Length')
+        match = CONTENT_RANGE_PATTERN.match(response.headers.get('Content-Range', ''))
+        if match and match.group(3) != '*':
+            total = match.group(3)
+        if total and total.isdigit() and int(total) > Config.IMAGE_MAX_BYTES:
+            raise RejectedDownload(f"{int(total)} bytes")
+
+    @staticmethod
+    def _write_validator(part_path: str, response: requests.Response):
+        validator = response.headers.get('ETag') or response.headers.get('Last-Modified')
+        meta_path = part_path[:-len(PART_SUFFIX)] + VALIDATOR_SUFFIX
+        if validator and not validator.startswith('W/'):
+            with open(meta_path, 'w', encoding='utf-8') as f:
+                f.write(validator)
+        elif os.path.exists(meta_path):
+            os.remove(meta_path)
+
+    @staticmethod
+    def _read_validator(part_path: str) -> Optional[str]:
+        meta_path = part_path[:-len(PART_SUFFIX)] + VALIDATOR_SUFFIX
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+
+    @staticmethod
+    def _discard(part_path: str, keep_part: bool = False):
+        """Borra el .part (salvo keep_part) y su validador"""
+        paths = [part_path[:-len(PART_SUFFIX)] + VALIDATOR_SUFFIX]
+        if not keep_part:
+            paths.append(part_path)
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _count(self, ok: bool, size: int = 0):
+        with self._lock:
+            if ok:
+                self.downloaded += 1
+                self.bytes += size
+            else:
+                self.failed += 1
+
+    def download_many(self, jobs: Sequence[Tuple[str, str]],
+                      progress: Optional[Callable[[int, int], None]] = None) -> List[bool]:
+        """
+        Descarga varias imágenes en paralelo
+
+        Args:
+            jobs: Lista de (url, ruta destino)
+            progress: Función (terminadas, total) llamada tras cada descarga
+                (default: log cada 10% y al final)
+
+        Returns:
+            Lista de resultados (True si se guardó), en el orden de jobs
+        """
+        total = len(jobs)
+        if not total:
+            return []
+        start = time.perf_counter()
+        done = 0
+        step = max(1, total // 10)
+        done_lock = threading.Lock()
+
+        def run(job):
+            nonlocal done
+            ok = self.download(*job)
+            with done_lock:
+                done += 1
+                finished = done
+            if progress:
+                progress(finished, total)
+            elif finished % step == 0 or finished == total:
+                elapsed = max(time.perf_counter() - start, 1e-6)
+                logger.info(f"📥 {finished}/{total} imágenes ({self.bytes / 1e6:.1f} MB, "
+                            f"{finished / elapsed:.1f} img/s)")
+            return ok
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, total),
+                                thread_name_prefix="image") as pool:
+            return list(pool.map(run, jobs))
@@ -0,0 +1,297 @@
+"""
+Índice de hashes perceptuales (dHash) de imágenes para detectar reposts
+
+Los reposts suelen reutilizar las mismas fotos con otro texto. Cada imagen se
+resume en un dHash de 64 bits (calculado en un pool de procesos) y los hashes
+se guardan en un índice multi-bloque (multi-index hashing) que encuentra las
+imágenes a poca distancia de Hamming consultando solo unas decenas de
+cubetas, sin recorrer todo el índice. El índice se persiste en disco entre
+ejecuciones.
+"""
+import io
+import os
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+
+import requests
+from PIL import Image
+
+from config import Config
+from rate_limiter import throttle, set_process_share
+from utils import extract_listing_id
+
+logger = logging.getLogger(__name__)
+
+
+HASH_SIZE = 8
+DOWNLOAD_TIMEOUT = 10
+DOWNLOAD_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Distancia de Hamming entre dos hashes"""
+    return bin(a ^ b).count('1')
+
+
+def dhash(image_bytes: bytes, hash_size: int = HASH_SIZE) -> int:
+    """
+    Calcula el hash de diferencia (dHash) de una imagen
+
+    Args:
+        image_bytes: Contenido de la imagen
+        hash_size: Lado de la cuadrícula (8 -> hash de 64 bits)
+
+    Returns:
+        Hash como entero
+    """
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        small = image.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS)
+        pixels = list(small.getdata())
+
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hash_image_url(url: str) -> Tuple[str, Optional[int]]:
+    """
+    Descarga una imagen y calcula su dHash (se ejecuta en procesos del pool)
+
+    Args:
+        url: URL de la imagen
+
+    Returns:
+        Tupla (url, hash) con hash None si la descarga o decodificación falla
+    """
+    try:
+        throttle(url)
+        response = requests.get(url, timeout=DOWNLOAD_TIMEOUT, headers=DOWNLOAD_HEADERS)
+        if response.status_code != 200:
+            return url, None
+        return url, dhash(response.content)
+    except Exception:
+        return url, None
+
+
+def compute_hashes(urls: List[str], max_workers: Optional[int] = None) -> Dict[str, int]:
+    """
+    Calcula el dHash de varias imágenes en paralelo con un pool de procesos
+
+    Args:
+        urls: URLs de imágenes (se eliminan repetidas)
+        max_workers: Procesos del pool (por defecto, núcleos disponibles)
+
+    Returns:
+        Diccionario url -> hash (solo las imágenes procesadas con éxito)
+    """
+    unique_urls = list(dict.fromkeys(u for u in urls if u))
+    if not unique_urls:
+        return {}
+
+    hashes = {}
+    # Cada proceso usa su parte del límite de velocidad: el total respeta el límite del dominio
+    max_workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=set_process_share,
+                             initargs=(1 / max_workers,)) as pool:
+        for url, value in pool.map(hash_image_url, unique_urls, chunksize=4):
+            if value is not None:
+                hashes[url] = value
+
+    logger.info(f"🖼️  Hashes calculados: {len(hashes)}/{len(unique_urls)} imágenes")
+    return hashes
+
+
+class MultiIndexHash:
+    """
+    Índice de hashes de 64 bits para búsqueda por distancia de Hamming
+
+    Usa multi-index hashing: el hash se divide en bloques de 16 bits y cada
+    bloque tiene su propia tabla. Si dos hashes están a distancia <= r, por el
+    principio del palomar al menos un bloque difiere en <= r // bloques bits,
+    así que basta con consultar las variantes cercanas de cada bloque y
+    verificar solo esos candidatos.
+    """
+
+    def __init__(self, num_chunks: int = 4):
+        self.num_chunks = num_chunks
+        self.chunk_bits = 64 // num_chunks
+        self.chunk_mask = (1 << self.chunk_bits) - 1
+        self.hashes: List[int] = []
+        self.payloads: List[str] = []
+        self.tables: List[Dict[int, List[int]]] = [{} for _ in range(num_chunks)]
+        self._entries = set()
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def _chunks(self, value: int) -> List[int]:
+        """Divide el hash en bloques"""
+        return [(value >> (i * self.chunk_bits)) & self.chunk_mask for i in range(self.num_chunks)]
+
+    def _variants(self, chunk: int, radius: int) -> List[int]:
+        """Todos los valores del bloque a distancia <= radius"""
+        variants = [chunk]
+        frontier = [(chunk, -1)]
+        for _ in range(radius):
+            next_frontier = []
+            for value, last_bit in frontier:
+                for bit in range(last_bit + 1, self.chunk_bits):
+                    flipped = value ^ (1 << bit)
+                    variants.append(flipped)
+                    next_frontier.append((flipped, bit))
+            frontier = next_frontier
+        return variants
+
+    def add(self, value: int, payload: str):
+        """
+        Inserta un hash con su dato asociado (ej: listing_id)
+
+        Args:
+            value: Hash perceptual
+            payload: Dato asociado al hash
+        """
+        if (value, payload) in self._entries:
+            return
+        self._entries.add((value, payload))
+        position = len(self.hashes)
+        self.hashes.append(value)
+        self.payloads.append(payload)
+        for table, chunk in zip(self.tables, self._chunks(value)):
+            table.setdefault(chunk, []).append(position)
+
+    def search(self, value: int, max_distance: int) -> List[Tuple[str, int]]:
+        """
+        Busca los hashes a distancia de Hamming <= max_distance
+
+        Args:
+            value: Hash a buscar
+            max_distance: Distancia máxima permitida
+
+        Returns:
+            Lista de (payload, distancia)
+        """
+        radius = max_distance // self.num_chunks
+        seen = set()
+        results = []
+        for table, chunk in zip(self.tables, self._chunks(value)):
+            for variant in self._variants(chunk, radius):
+                for position in table.get(variant, ()):
+                    if position in seen:
+                        continue
+                    seen.add(position)
+                    distance = hamming_distance(value, self.hashes[position])
+                    if distance <= max_distance:
+                        results.append((self.payloads[position], distance))
+        return results
+
+    def to_dict(self) -> Dict[str, list]:
+        """Serializa los hashes (las tablas se reconstruyen al cargar)"""
+        return {
+            'num_chunks': self.num_chunks,
+            'hashes': [format(h, 'x') for h in self.hashes],
+            'payloads': self.payloads,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, list]) -> 'MultiIndexHash':
+        """Reconstruye el índice desde su forma serializada"""
+        index = cls(num_chunks=data.get('num_chunks', 4))
+        for value, payload in zip(data['hashes'], data['payloads']):
+            index.add(int(value, 16), payload)
+        return index
+
+
+class ImageRepostIndex:
+    """Índice persistente de imágenes de publicaciones para detectar reposts"""
+
+    def __init__(self, path: Optional[str] = None, max_distance: Optional[int] = None):
+        """
+        Inicializa el índice (carga el estado previo si existe)
+
+        Args:
+            path: Archivo JSON del índice (usa Config.IMAGE_INDEX_PATH por defecto)
+            max_distance: Distancia de Hamming máxima para considerar misma foto
+        """
+        self.path = path or Config.IMAGE_INDEX_PATH
+        self.max_distance = Config.IMAGE_MATCH_DISTANCE if max_distance is None else max_distance
+        self.hash_index = MultiIndexHash()
+        self.load()
+
+    def flag_products(self, products: List[Dict[str, Any]], max_images_per_product: int = 3,
+                      max_workers: Optional[int] = None) -> int:
+        """
+        Marca los productos cuyas fotos ya aparecen en otra publicación
+
+        Compara contra el historial y contra los productos de la misma
+        ejecución. Agrega 'image_repost_of' (lista de listing_id) a cada
+        producto con coincidencias.
+
+        Args:
+            products: Productos con 'url' e 'images'
+            max_images_per_product: Imágenes por producto a indexar
+            max_workers: Procesos del pool para calcular hashes
+
+        Returns:
+            Número de productos marcados
+        """
+        urls = []
+        for product in products:
+            urls.extend(list(product.get('images') or [])[:max_images_per_product])
+        hashes = compute_hashes(urls, max_workers=max_workers)
+
+        flagged = 0
+        for product in products:
+            listing_id = extract_listing_id(product.get('url', ''))
+            if not listing_id:
+                continue
+            product_hashes = [hashes[u] for u in list(product.get('images') or [])[:max_images_per_product]
+                              if u in hashes]
+
+            matches = set()
+            for value in product_hashes:
+                for other_id, _ in self.hash_index.search(value, self.max_distance):
+                    if other_id != listing_id:
+                        matches.add(other_id)
+            for value in product_hashes:
+                self.hash_index.add(value, listing_id)
+
+            if matches:
+                product['image_repost_of'] = sorted(matches)
+                flagged += 1
+
+        logger.info(f"🖼️  Productos con fotos repetidas: {flagged}")
+        return flagged
+
+    def load(self):
+        """Carga el índice desde disco"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.hash_index = MultiIndexHash.from_dict(json.load(f))
+            logger.info(f"Índice de imágenes cargado: {len(self.hash_index)} hashes")
+        except Exception as e:
+            logger.error(f"Error cargando índice de imágenes: {e}")
+
+    def save(self):
+        """Guarda el índice en disco (escritura atómica)"""
+        if not self.path:
+            return
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.hash_index.to_dict(), f, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+            logger.info(f"Índice de imágenes guardado: {self.path}")
+        except Exception as e:
+            logger.error(f"Error guardando índice de imágenes: {e}")
@@ -7,22 +7,36 @@ import logging
 import os
 import signal
 import sys
-import smtplib
-import getpass
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.mime.base import MIMEBase
-from email import encoders
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from time import perf_counter
+from urllib.parse import urljoin
+from bs4 import BeautifulSoup
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from scraper import WebScraper
-from utils import save_to_json, save_to_csv, clean_text
+from utils import save_to_json, save_to_csv, clean_text, extract_listing_id, normalize_item_url, normalize_text
 from config import Config
+from virtual_report import generate_virtual_html
+from price_history import PriceHistoryStore
+from dedupe import NearDuplicateIndex, collapse_duplicates
+from image_index import ImageRepostIndex
+from seen_listings import SeenListings
+from detail_scheduler import DetailScheduler, PRIORITIES
+from disk_cache import DiskCache
+from zip_index import ZipIndex
+from alert_rules import RuleEngine
+from product_record import ProductRecord
+from deal_scoring import score_products, deal_sort_key
+from digest_notifier import DigestNotifier
+from rate_limiter import throttle, get_rate_limiter
+from resilience import CircuitOpenError
+from concurrency import get_controller, log_metrics, THROTTLED, ERROR
 
 logging.basicConfig(
     level=logging.INFO,
@@ -40,6 +54,28 @@ timing_stats = {}
 # Variable global para manejar interrupción
 interrupted = False
 
+# Tarjetas a recolectar por cada producto a visitar en el modo con presupuesto
+FRONTIER_FACTOR = 3
+
+# Selectores y patrones de la página de detalle (compartidos por la extracción
+# en vivo y la re-extracción desde el archivo de páginas)
+TITLE_SELECTORS = ["h1", "h2", "[data-testid='item-title']"]
+DESCRIPTION_SELECTORS = [
+    "[data-testid='item-description']",
+    "div[class*='description']",
+    "p[class*='description']",
+    "pre"
+]
+# Enlaces de las tarjetas de resultados (se usa el primer selector que encuentre
+# algo; compartidos por el navegador y el parser de HTML sin navegador)
+RESULT_LINK_SELECTORS = ["a[href*='/item/']", "a[href*='/detail/']"]
+PRICE_PATTERN = r'\$[\d,]+(?:\.\d{2})?'
+LOCATION_PATTERN = r'([A-Z][a-z]+(?:\s[A-Z][a-z]+)*,\s*[A-Z]{2})'
+MAX_DETAIL_IMAGES = 5
+# Textos de las páginas de bloqueo o verificación (señal para bajar la concurrencia)
+BLOCK_MARKERS = ("access denied", "too many requests", "are you a robot", "verify you are human",
+                 "unusual traffic")
+
 def signal_handler(sig, frame):
     """Manejador para Ctrl+C - guarda datos antes de salir"""
     global interrupted
@@ -47,15 +83,16 @@ def signal_handler(sig, frame):
     logger.warning("\n\n⚠️  Interrupción detectada (Ctrl+C)")
     logger.info("Finalizando de forma segura y guardando datos recolectados...")
 
-def log_timing(step_name, start_time):
-    """Helper para logear tiempo de ejecución de cada paso"""
+def log_timing(step_name, start_time, stats=None):
+    """Helper para logear tiempo de ejecución de cada paso (en stats o en timing_stats)"""
     elapsed = time.perf_counter() - start_time
-    timing_stats[step_name] = elapsed
+    (timing_stats if stats is None else stats)[step_name] = elapsed
     logger.info(f"⏱️  {step_name}: {elapsed:.2f}s")
     return elapsed
 
-def print_timing_summary():
-    """Imprime un resumen organizado de todos los tiempos"""
+def print_timing_summary(stats=None):
+    """Imprime un resumen organizado de todos los tiempos (de stats o de timing_stats)"""
+    stats = timing_stats if stats is None else stats
     logger.info("\n" + "="*70)
     logger.info("📊 RESUMEN DETALLADO DE TIEMPOS POR OPERACIÓN")
     logger.info("="*70)
@@ -68,16 +105,19 @@ def print_timing_summary():
         "Obtención de Enlaces": [],
         "Extracción de Productos": [],
         "Navegación de Páginas": [],
+        "Pipeline de Páginas": [],
         "Total": []
     }
     
-    for key, value in sorted(timing_stats.items(), key=lambda x: x[1], reverse=True):
+    for key, value in sorted(stats.items(), key=lambda x: x[1], reverse=True):
         if "Navegación inicial" in key:
             categories["Setup Inicial"].append((key, value))
         elif "Configuración de ubicación" in key:
             categories["Configuración"].append((key, value))
         elif "Búsqueda" in key or "filtros" in key:
             categories["Búsqueda y Filtros"].append((key, value))
+        elif "Pipeline" in key:
+            categories["Pipeline de Páginas"].append((key, value))
         elif "enlaces" in key:
             categories["Obtención de Enlaces"].append((key, value))
         elif "Producto" in key or "└─" in key:
@@ -96,13 +136,243 @@ def print_timing_summary():
     logger.info("\n" + "="*70 + "\n")
 
 
+def new_product(product_url: str, index: int) -> ProductRecord:
+    """
+    Crea el registro base de un producto con todos sus campos vacíos
+    
+    Args:
+        product_url: URL del producto
+        index: Índice del producto
+        
+    Returns:
+        ProductRecord (se usa como diccionario)
+    """
+    return ProductRecord(product_url, index)
+
+
+def parse_card_text(text: str) -> dict:
+    """
+    Extrae título, precio y ubicación del texto de una tarjeta de resultados
+    
+    Las tarjetas de OfferUp muestran una línea por dato, por ejemplo
+    "$450\niPhone 14 Pro\nSan Diego, CA".
+    
+    Args:
+        text: Texto visible de la tarjeta
+        
+    Returns:
+        Diccionario con 'title', 'price', 'price_value' y 'location' (vacíos si no se encuentran)
+    """
+    data = {"title": "", "price": "", "price_value": None, "location": ""}
+    for line in (text or '').split('\n'):
+        line = clean_text(line)
+        if not line:
+            continue
+        price_match = re.fullmatch(r'\$[\d,]+(?:\.\d{2})?', line)
+        if price_match and not data["price"]:
+            data["price"] = line
+            data["price_value"] = int(float(line.replace('$', '').replace(',', '')))
+        elif re.fullmatch(r'[A-Z][A-Za-z.\s]+,\s*[A-Z]{2}', line) and not data["location"]:
+            data["location"] = line
+        elif not data["title"] and not line.startswith('$'):
+            data["title"] = line
+    return data
+
+
+def parse_detail_price(page_text: str) -> dict:
+    """
+    Primer precio del texto de una página de detalle
+    
+    Returns:
+        Diccionario con 'price' y 'price_value' (vacío si no hay precio)
+    """
+    prices_found = re.findall(PRICE_PATTERN, page_text)
+    if not prices_found:
+        return {}
+    data = {"price": prices_found[0]}
+    price_match = re.search(r'[\d,]+', prices_found[0].replace('$', ''))
+    if price_match:
+        data["price_value"] = int(price_match.group().replace(',', ''))
+    return data
+
+
+def is_block_page(title: str, page_text: str) -> bool:
+    """Indica si la página es de bloqueo o verificación en lugar de la publicación"""
+    head = f"{title or ''} {(page_text or '')[:500]}".lower()
+    return any(marker in head for marker in BLOCK_MARKERS)
+
+
+def parse_detail_location(page_text: str) -> str:
+    """Ubicación ("Ciudad, ST") del texto de una página de detalle"""
+    if "San Diego" in page_text or "CA" in page_text:
+        location_match = re.search(LOCATION_PATTERN, page_text)
+        if location_match:
+            return location_match.group(1)
+    return ""
+
+
+def is_listing_image(src) -> bool:
+    """Indica si una URL de imagen es una foto de la publicación"""
+    return bool(src) and ('offerup' in src or 'cloudfront' in src) and src.startswith('http')
+
+
+def parse_product_html(html: str, product_url: str, index: int = 0) -> ProductRecord:
+    """
+    Extrae los datos de una página de detalle desde su HTML (sin navegador)
+    
+    Usa los mismos selectores y patrones que extract_product_details; sirve
+    para volver a extraer páginas del archivo después de corregir un selector.
+    
+    Args:
+        html: HTML de la página de detalle
+        product_url: URL del producto
+        index: Índice del producto
+        
+    Returns:
+        ProductRecord con los datos encontrados
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    for element in soup(['script', 'style', 'noscript']):
+        element.decompose()
+    product_data = new_product(product_url, index)
+    page_text = soup.body.get_text('\n', strip=True) if soup.body else soup.get_text('\n', strip=True)
+    
+    page_title = soup.title.get_text(strip=True) if soup.title else ''
+    if page_title and page_title != "OfferUp":
+        product_data["title"] = clean_text(page_title.split('-')[0].strip())
+    for selector in TITLE_SELECTORS:
+        title_elem = soup.select_one(selector)
+        if title_elem is not None and len(title_elem.get_text(strip=True)) > 3:
+            product_data["title"] = clean_text(title_elem.get_text(' ', strip=True))
+            break
+    
+    product_data.update(parse_detail_price(page_text))
+    
+    for selector in DESCRIPTION_SELECTORS:
+        desc_elem = soup.select_one(selector)
+        if desc_elem is not None and len(desc_elem.get_text(strip=True)) > 20:
+            product_data["description"] = clean_text(desc_elem.get_text('\n', strip=True))[:500]
+            break
+    
+    product_data["location"] = parse_detail_location(page_text)
+    product_data["images"] = [img.get('src') for img in soup.find_all('img', limit=MAX_DETAIL_IMAGES)
+                              if is_listing_image(img.get('src'))]
+    return product_data
+
+
+def parse_results_html(html: str, base_url: str = "https://offerup.com/") -> list:
+    """
+    Extrae las tarjetas de una página de resultados desde su HTML (sin navegador)
+    
+    Args:
+        html: HTML de la página de resultados
+        base_url: URL para resolver enlaces relativos
+        
+    Returns:
+        Lista de productos de tarjeta ('detail_level' = 'card'), sin repetidos
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    cards = []
+    seen_urls = set()
+    links = []
+    for selector in RESULT_LINK_SELECTORS:
+        links = soup.select(selector)
+        if links:
+            break
+    for link in links:
+        url = urljoin(base_url, link.get('href', ''))
+        if '/item/' not in url or url in seen_urls:
+            continue
+        seen_urls.add(url)
+        product_data = new_product(url, len(cards) + 1)
+        product_data.update(parse_card_text(link.get_text('\n', strip=True)))
+        product_data["detail_level"] = "card"
+        img = link.find('img')
+        if img is not None:
+            src = img.get('src') or ''
+            if src.startswith('http'):
+                product_data["images"] = [src]
+            if not product_data["title"]:
+                product_data["title"] = clean_text(img.get('alt') or '')
+        cards.append(product_data)
+    return cards
+
+
+class RegionRegistry:
+    """
+    Registro compartido entre sesiones de distintas regiones (ZIPs)
+    
+    Cada publicación se asigna a la primera sesión que la reclama, así su
+    página de detalle se visita una sola vez; además guarda en qué regiones
+    apareció cada publicación.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.owners = {}
+        self.regions = {}
+    
+    def claim(self, listing_id: str, region: str) -> bool:
+        """
+        Registra que la región encontró la publicación
+        
+        Args:
+            listing_id: ID de la publicación
+            region: Código postal de la sesión
+            
+        Returns:
+            True si esta región debe visitar el detalle (primera en reclamarla)
+        """
+        with self._lock:
+            self.regions.setdefault(listing_id, set()).add(region)
+            if listing_id in self.owners:
+                return self.owners[listing_id] == region
+            self.owners[listing_id] = region
+            return True
+    
+    def regions_for(self, listing_id: str) -> list:
+        """Regiones (ZIPs) en las que apareció la publicación"""
+        with self._lock:
+            return sorted(self.regions.get(listing_id, ()))
+
+
 class OfferUpDetailedScraper:
     """Scraper que entra a cada producto de OfferUp"""
     
-    def __init__(self, headless=False):
-        self.scraper = WebScraper(headless=headless, timeout=15)
+    def __init__(self, headless=False, dedupe_index=None, registry=None, region=None, browser=None,
+                 stats=None):
+        # browser: WebScraper ya abierto (persistente) a reutilizar en lugar de uno nuevo
+        self.scraper = browser or WebScraper(headless=headless, timeout=15)
+        # Tiempos por paso de esta sesión; con un dict propio (multi-región) no
+        # se imprime el resumen al terminar: lo imprime quien lo creó
+        self.timing_stats = timing_stats if stats is None else stats
+        self.print_summary = stats is None
         self.base_url = "https://offerup.com/"
         self.all_products = []
+        # Índice de casi duplicados (persistente) y texto de tarjetas por URL
+        self.dedupe_index = dedupe_index or NearDuplicateIndex()
+        # Búsqueda multi-región: registro compartido y ZIP de esta sesión
+        self.registry = registry
+        self.region = region
+        self.skipped_other_region = 0
+        self.card_texts = {}
+        self.skipped_duplicates = 0
+        # Modo superficial: datos de tarjetas y enriquecimiento en segundo plano
+        self.cards = {}
+        self.enrichment_future = None
+        # Estadísticas del planificador con presupuesto de tiempo
+        self.schedule_stats = None
+        # Caché de páginas de detalle por URL normalizada
+        self.detail_cache = DiskCache(Config.CACHE_PATH, table="product_details",
+                                      ttl_seconds=Config.DETAIL_CACHE_TTL_HOURS * 3600,
+                                      max_entries=Config.DETAIL_CACHE_MAX_ENTRIES)
+        self.last_from_cache = False
+        # Caché de páginas de resultados; la búsqueda se abre solo si hace falta
+        self.page_cache = DiskCache(Config.CACHE_PATH, table="result_pages",
+                                    ttl_seconds=Config.PAGE_CACHE_TTL_MINUTES * 60,
+                                    max_entries=Config.PAGE_CACHE_MAX_ENTRIES)
+        self.search_params = None
+        self.search_page = None
     
     def configure_location(self, zip_code: str = "92101"):
         """
@@ -359,12 +629,13 @@ class OfferUpDetailedScraper:
         except Exception as e:
             logger.error(f"Error aplicando filtros: {e}")
     
-    def get_product_links(self, max_items=20):
+    def get_product_links(self, max_items=20, with_cards=False):
         """
         Obtiene los enlaces de productos de la página actual
         
         Args:
             max_items: Máximo de items a obtener
+            with_cards: Si True, también extrae los datos de cada tarjeta en self.cards
             
         Returns:
             Lista de URLs de productos
@@ -379,15 +650,11 @@ class OfferUpDetailedScraper:
             for _ in range(2):
                 self.scraper.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
                 time.sleep(1)  # Reducido de 2s a 1s
+            self.scraper.archive_page('offerup_results')
             
             # Buscar enlaces a productos
-            link_selectors = [
-                "a[href*='/item/']",
-                "a[href*='/detail/']"
-            ]
-            
             links = []
-            for selector in link_selectors:
+            for selector in RESULT_LINK_SELECTORS:
                 links = self.scraper.driver.find_elements(By.CSS_SELECTOR, selector)
                 if links:
                     logger.info(f"Encontrados {len(links)} enlaces con selector: {selector}")
@@ -401,6 +668,10 @@ class OfferUpDetailedScraper:
                     if url and '/item/' in url and url not in seen_urls:
                         product_links.append(url)
                         seen_urls.add(url)
+                        # Texto de la tarjeta para detectar reposts antes de entrar
+                        self.card_texts[url] = link.text or ''
+                        if with_cards:
+                            self.cards[url] = self.extract_card_data(link, url, len(product_links))
                         if len(product_links) >= max_items:
                             break
                 except:
@@ -424,34 +695,36 @@ class OfferUpDetailedScraper:
         Returns:
             Diccionario con datos del producto
         """
+        cache_key = normalize_item_url(product_url)
+        cached = self.detail_cache.get(cache_key)
+        self.last_from_cache = cached is not None
+        if cached is not None:
+            logger.info(f"\n💾 [{index}] Producto en caché: {product_url}")
+            cached["index"] = index
+            cached["url"] = product_url
+            return ProductRecord.from_dict(cached)
+        
         logger.info(f"\n[{index}] Entrando a producto: {product_url}")
         
-        product_data = {
-            "index": index,
-            "url": product_url,
-            "title": "",
-            "price": "",
-            "price_value": None,
-            "description": "",
-            "condition": "",
-            "location": "",
-            "seller_name": "",
-            "posted_date": "",
-            "images": [],
-            "scraped_at": time.strftime("%Y-%m-%d %H:%M:%S")
-        }
+        product_data = new_product(product_url, index)
+        # Las sesiones de todas las regiones comparten el límite adaptativo de detalles
+        slot = get_controller('offerup_detail', Config.FANOUT_MAX_WORKERS).acquire()
         
         try:
             # Navegar al producto
             nav_start = time.perf_counter()
-            self.scraper.driver.get(product_url)
-            time.sleep(2)
-            log_timing(f"      └─ Navegación a producto", nav_start)
+            self.scraper.navigate(product_url)
+            self.log_timing(f"      └─ Navegación a producto", nav_start)
+            self.scraper.archive_page('offerup_detail', product_url)
             
             # Obtener todo el texto de la página para extraer información
             text_start = time.perf_counter()
             page_text = self.scraper.driver.find_element(By.TAG_NAME, "body").text
-            log_timing(f"      └─ Obtención de texto de página", text_start)
+            self.log_timing(f"      └─ Obtención de texto de página", text_start)
+            if is_block_page(self.scraper.driver.title, page_text):
+                logger.warning(f"🚧 [{index}] Página de bloqueo del sitio: {product_url}")
+                slot.mark(THROTTLED)
+                return product_data
             
             # Título - Usar el título de la página como fallback
             title_start = time.perf_counter()
@@ -464,8 +737,7 @@ class OfferUpDetailedScraper:
                 pass
             
             # Buscar título en la página
-            title_selectors = ["h1", "h2", "[data-testid='item-title']"]
-            for selector in title_selectors:
+            for selector in TITLE_SELECTORS:
                 try:
                     title_elem = self.scraper.driver.find_element(By.CSS_SELECTOR, selector)
                     if title_elem and title_elem.text and len(title_elem.text) > 3:
@@ -474,36 +746,22 @@ class OfferUpDetailedScraper:
                         break
                 except:
                     continue
-            log_timing(f"      └─ Extracción de título", title_start)
+            self.log_timing(f"      └─ Extracción de título", title_start)
             
             # Precio - buscar en el texto de la página
             price_start = time.perf_counter()
-            price_pattern = r'\$[\d,]+(?:\.\d{2})?'
-            prices_found = re.findall(price_pattern, page_text)
-            if prices_found:
-                product_data["price"] = prices_found[0]  # Tomar el primer precio encontrado
-                try:
-                    price_match = re.search(r'[\d,]+', product_data["price"].replace('$', ''))
-                    if price_match:
-                        product_data["price_value"] = int(price_match.group().replace(',', ''))
-                    logger.info(f"  Precio: {product_data['price']}")
-                except:
-                    pass
-            log_timing(f"      └─ Extracción de precio", price_start)
+            product_data.update(parse_detail_price(page_text))
+            if product_data["price"]:
+                logger.info(f"  Precio: {product_data['price']}")
+            self.log_timing(f"      └─ Extracción de precio", price_start)
             
             # Descripción - buscar en múltiples lugares con timeout corto
             desc_start = time.perf_counter()
-            desc_selectors = [
-                "[data-testid='item-description']",
-                "div[class*='description']",
-                "p[class*='description']",
-                "pre"
-            ]
             # Reducir temporalmente el implicit wait para descripción
             original_timeout = self.scraper.driver.timeouts.implicit_wait
             self.scraper.driver.implicitly_wait(1)  # Solo 1 segundo para descripción
             
-            for selector in desc_selectors:
+            for selector in DESCRIPTION_SELECTORS:
                 try:
                     desc_elem = self.scraper.driver.find_element(By.CSS_SELECTOR, selector)
                     if desc_elem and desc_elem.text and len(desc_elem.text) > 20:
@@ -515,40 +773,587 @@ class OfferUpDetailedScraper:
             
             # Restaurar timeout original
             self.scraper.driver.implicitly_wait(original_timeout)
-            log_timing(f"      └─ Extracción de descripción", desc_start)
+            self.log_timing(f"      └─ Extracción de descripción", desc_start)
             
             # Extraer ubicación del texto
             location_start = time.perf_counter()
-            if "San Diego" in page_text or "CA" in page_text:
-                # Buscar patrón de ubicación
-                location_match = re.search(r'([A-Z][a-z]+(?:\s[A-Z][a-z]+)*,\s*[A-Z]{2})', page_text)
-                if location_match:
-                    product_data["location"] = location_match.group(1)
-            log_timing(f"      └─ Extracción de ubicación", location_start)
+            product_data["location"] = parse_detail_location(page_text)
+            self.log_timing(f"      └─ Extracción de ubicación", location_start)
             
             # Imágenes - extracción inmediata sin delay
             try:
                 img_start = time.perf_counter()
                 img_elements = self.scraper.driver.find_elements(By.CSS_SELECTOR, "img")
-                for img in img_elements[:5]:
+                images = []
+                for img in img_elements[:MAX_DETAIL_IMAGES]:
                     src = img.get_attribute('src')
-                    if src and ('offerup' in src or 'cloudfront' in src) and src.startswith('http'):
-                        product_data["images"].append(src)
+                    if is_listing_image(src):
+                        images.append(src)
+                product_data["images"] = images
                 if product_data["images"]:
                     logger.info(f"  Imágenes: {len(product_data['images'])} encontradas")
-                log_timing(f"      └─ Extracción de imágenes", img_start)
+                self.log_timing(f"      └─ Extracción de imágenes", img_start)
             except:
                 pass
             
             logger.info(f"✓ Producto {index} extraído exitosamente")
             
+            # Solo se guardan en caché las extracciones con datos útiles
+            if product_data["title"] or product_data["price"]:
+                self.detail_cache.set(cache_key, product_data.to_dict())
+            
+        except CircuitOpenError:
+            # Sitio caído: se corta la ejecución (los datos recolectados se guardan)
+            slot.mark(THROTTLED)
+            raise
         except Exception as e:
             logger.error(f"Error extrayendo producto {index}: {e}")
+            slot.mark(ERROR)
+        finally:
+            slot.release()
+        
+        return product_data
+    
+    def visit_listing(self, product_url: str, global_index: int):
+        """
+        Visita una publicación de resultados (salvo reposts o ya tomadas por otra región)
         
+        Args:
+            product_url: URL del producto
+            global_index: Índice del producto en la ejecución
+            
+        Returns:
+            Datos del producto (agregado a all_products), o None si se omitió
+        """
+        item_start = time.perf_counter()
+        
+        # Omitir reposts cuya tarjeta ya coincide con una publicación conocida
+        card_text = self.card_texts.get(product_url, '')
+        duplicate_of = self.dedupe_index.match_card(card_text, extract_listing_id(product_url))
+        if duplicate_of:
+            logger.info(f"🔁 [{global_index}] Repost de {duplicate_of}, se omite: {product_url}")
+            self.skipped_duplicates += 1
+            return None
+        if not self.claim_listing(product_url):
+            logger.info(f"🌎 [{global_index}] Ya visitado por otra región, se omite: {product_url}")
+            return None
+        
+        product_data = self.extract_product_details(product_url, global_index)
+        self.register_duplicates(product_data, card_text)
+        self.all_products.append(product_data)
+        self.log_timing(f"   Producto {global_index}", item_start)
         return product_data
     
+    def claim_listing(self, product_url: str) -> bool:
+        """
+        Indica si esta sesión debe visitar el detalle del producto
+        
+        Sin registro multi-región siempre es True; con registro, solo la primera
+        región que encuentra la publicación la visita.
+        """
+        if self.registry is None:
+            return True
+        if self.registry.claim(extract_listing_id(product_url), self.region):
+            return True
+        self.skipped_other_region += 1
+        return False
+    
+    def log_cache_stats(self):
+        """Muestra los aciertos y fallos de las cachés, la espera por límite de velocidad y la concurrencia"""
+        for name, cache in (("páginas", self.page_cache), ("detalles", self.detail_cache)):
+            stats = cache.stats()
+            if stats['hits'] or stats['misses']:
+                logger.info(f"💾 Caché de {name}: {stats['hits']} aciertos, {stats['misses']} fallos "
+                            f"({stats['hit_rate']:.0%}), {stats['expired']} expirados, {stats['evicted']} eliminados")
+        get_rate_limiter().log_stats()
+        log_metrics()
+    
+    def log_timing(self, step_name, start_time):
+        """log_timing sobre los tiempos de esta sesión"""
+        return log_timing(step_name, start_time, self.timing_stats)
+    
+    def print_timing_summary(self):
+        """Resumen de tiempos (salvo en sesiones de una búsqueda multi-región)"""
+        if self.print_summary:
+            print_timing_summary(self.timing_stats)
+    
+    def register_duplicates(self, product_data, card_text: str = ''):
+        """
+        Agrega un producto al índice de casi duplicados y le asigna su cluster
+        
+        Args:
+            product_data: Diccionario del producto (se le agrega 'cluster_id')
+            card_text: Texto de la tarjeta de resultados del producto
+        """
+        listing_id = extract_listing_id(product_data.get('url', ''))
+        if not listing_id:
+            return
+        product_data["cluster_id"] = self.dedupe_index.add(
+            listing_id, product_data.get('title', ''), product_data.get('description', ''))
+        if card_text:
+            self.dedupe_index.remember_card(card_text, listing_id)
+    
+    def extract_card_data(self, link, product_url: str, index: int) -> dict:
+        """
+        Extrae los datos visibles en la tarjeta de resultados (sin entrar al producto)
+        
+        Args:
+            link: Elemento <a> de la tarjeta
+            product_url: URL del producto
+            index: Índice del producto
+            
+        Returns:
+            Diccionario del producto con 'detail_level' = 'card'
+        """
+        product_data = new_product(product_url, index)
+        product_data.update(parse_card_text(self.card_texts.get(product_url, '')))
+        product_data["detail_level"] = "card"
+        try:
+            img = link.find_element(By.TAG_NAME, "img")
+            src = img.get_attribute('src')
+            if src and src.startswith('http'):
+                product_data["images"] = [src]
+            if not product_data["title"]:
+                product_data["title"] = clean_text(img.get_attribute('alt') or '')
+        except:
+            pass
+        return product_data
+    
+    @staticmethod
+    def needs_enrichment(product: dict, is_new: bool, price_below=None, rules=None) -> bool:
+        """
+        Decide si vale la pena visitar la página de detalle de un producto
+        
+        Args:
+            product: Producto extraído de la tarjeta
+            is_new: Si la publicación no se había visto antes
+            price_below: Umbral de precio para la regla 'below_price'
+            rules: Reglas activas ('new', 'below_price', 'incomplete', 'all');
+                usa Config.ENRICH_RULES por defecto
+                
+        Returns:
+            True si alguna regla activa se cumple
+        """
+        rules = Config.ENRICH_RULES if rules is None else rules
+        if 'all' in rules:
+            return True
+        if 'new' in rules and is_new:
+            return True
+        if ('below_price' in rules and price_below is not None
+                and product.get('price_value') is not None and product['price_value'] < price_below):
+            return True
+        # La tarjeta nunca trae descripción; lo que sí puede faltar es el título o el precio
+        if 'incomplete' in rules and (not product.get('title') or product.get('price_value') is None):
+            return True
+        return False
+    
+    def scrape_shallow(self, search_term: str, location: str, min_price: int, max_price: int,
+                       max_items: int = 300, price_below=None, rules=None):
+        """
+        Scraping superficial: extrae los productos desde las tarjetas de resultados
+        
+        Al terminar la pasada superficial, los productos que cumplen alguna regla
+        de enriquecimiento se visitan en segundo plano (ver wait_for_enrichment).
+        
+        Args:
+            search_term: Término de búsqueda
+            location: Código postal
+            min_price: Precio mínimo
+            max_price: Precio máximo
+            max_items: Total de tarjetas a extraer (default: 300)
+            price_below: Umbral de precio para enriquecer (regla 'below_price')
+            rules: Reglas de enriquecimiento (usa Config.ENRICH_RULES por defecto)
+            
+        Returns:
+            Lista de productos (se completan en sitio cuando termina el enriquecimiento)
+        """
+        logger.info("\n" + "="*60)
+        logger.info("INICIANDO SCRAPING SUPERFICIAL DE OFFERUP")
+        logger.info("="*60)
+        
+        scraping_start = time.perf_counter()
+        to_enrich = []
+        
+        try:
+            self.scraper.setup_driver()
+            self.start_search(search_term, location, min_price, max_price)
+            
+            self.all_products.extend(self.collect_cards(max_items))
+            
+            # Elegir qué productos enriquecer con su página de detalle
+            seen = SeenListings()
+            new_ids = set(seen.filter_new(extract_listing_id(p['url']) for p in self.all_products))
+            for product in self.all_products:
+                listing_id = extract_listing_id(product['url'])
+                if self.dedupe_index.match_card(self.card_texts.get(product['url'], ''), listing_id):
+                    continue
+                if not self.claim_listing(product['url']):
+                    continue
+                if self.needs_enrichment(product, listing_id in new_ids, price_below, rules):
+                    to_enrich.append(product)
+            seen.close()
+            
+        except Exception as e:
+            logger.error(f"Error durante el scraping superficial: {e}")
+        
+        finally:
+            self.log_timing("TOTAL PASADA SUPERFICIAL", scraping_start)
+        
+        logger.info(f"🔎 Productos a enriquecer con detalle: {len(to_enrich)}/{len(self.all_products)}")
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="enrichment")
+        self.enrichment_future = executor.submit(self._enrich_products, to_enrich)
+        executor.shutdown(wait=False)
+        
+        return self.all_products
+    
+    def collect_cards(self, max_cards: int, keep_going=None):
+        """
+        Recorre las páginas de resultados extrayendo solo las tarjetas
+        
+        Args:
+            max_cards: Máximo de tarjetas a extraer
+            keep_going: Función opcional sin argumentos; si devuelve False se deja de paginar
+            
+        Returns:
+            Lista de productos de tarjeta (sin repetidos, con 'index' consecutivo)
+        """
+        cards = []
+        collected = set()
+        page_num = 1
+        while len(cards) < max_cards and not interrupted:
+            links_start = time.perf_counter()
+            product_links = self.get_results_page(page_num, with_cards=True)
+            self.log_timing(f"5.{page_num}.a Obtención de enlaces y tarjetas", links_start)
+            
+            if not product_links:
+                logger.warning(f"No se encontraron productos en página {page_num}")
+                break
+            
+            for product_url in product_links:
+                if len(cards) >= max_cards:
+                    break
+                if product_url in collected:
+                    continue
+                collected.add(product_url)
+                card = self.cards[product_url]
+                card["index"] = len(cards) + 1
+                cards.append(card)
+            
+            logger.info(f"✓ Tarjetas extraídas: {len(cards)}/{max_cards}")
+            if len(cards) >= max_cards or (keep_going is not None and not keep_going()):
+                break
+            
+            page_num += 1
+        
+        return cards
+    
+    def scrape_with_budget(self, search_term: str, location: str, min_price: int, max_price: int,
+                           max_items: int = 100, budget_seconds=None, priority: str = 'cheapest',
+                           frontier_factor: int = FRONTIER_FACTOR):
+        """
+        Scraping detallado con presupuesto de tiempo y visitas priorizadas
+        
+        Primero recolecta las tarjetas de varias páginas (la frontera) y luego
+        visita las páginas de detalle en orden de prioridad hasta completar
+        max_items o agotar el presupuesto. Lo que no se alcanza a visitar queda
+        en self.schedule_stats['skipped'].
+        
+        Args:
+            search_term: Término de búsqueda
+            location: Código postal
+            min_price: Precio mínimo
+            max_price: Precio máximo
+            max_items: Total de productos a visitar (default: 100)
+            budget_seconds: Tiempo total disponible en segundos (None = sin límite)
+            priority: 'cheapest', 'newest' o 'price_drop'
+            frontier_factor: Tarjetas a recolectar por cada producto a visitar
+            
+        Returns:
+            Lista de productos visitados
+        """
+        logger.info("\n" + "="*60)
+        logger.info("INICIANDO SCRAPING CON PRESUPUESTO DE TIEMPO")
+        logger.info("="*60)
+        logger.info(f"Presupuesto: {f'{budget_seconds / 60:.1f} min' if budget_seconds else 'sin límite'}")
+        logger.info(f"Prioridad: {priority}")
+        logger.info("="*60 + "\n")
+        
+        scraping_start = time.perf_counter()
+        scheduler = DetailScheduler(budget_seconds=budget_seconds, priority=priority)
+        
+        try:
+            self.scraper.setup_driver()
+            self.start_search(search_term, location, min_price, max_price)
+            
+            # 5.a Frontera: tarjetas de varias páginas (se deja de paginar si ya no
+            # alcanzaría el tiempo para visitar al menos un producto)
+            cards = self.collect_cards(max_items * frontier_factor,
+                                      keep_going=lambda: scheduler.has_time(2 * scheduler.item_seconds))
+            
+            seen = SeenListings()
+            scheduler.history = seen.get_many(extract_listing_id(c['url']) for c in cards)
+            seen.close()
+            for card in cards:
+                scheduler.push(card)
+            logger.info(f"📋 Frontera: {len(scheduler)} publicaciones (prioridad: {priority})")
+            
+            # 5.b Visitas en orden de prioridad mientras quede presupuesto
+            while len(self.all_products) < max_items and not interrupted:
+                card = scheduler.next()
+                if card is None:
+                    break
+                
+                item_start = time.perf_counter()
+                product_url = card['url']
+                global_index = len(self.all_products) + 1
+                
+                card_text = self.card_texts.get(product_url, '')
+                duplicate_of = self.dedupe_index.match_card(card_text, extract_listing_id(product_url))
+                if duplicate_of:
+                    logger.info(f"🔁 [{global_index}] Repost de {duplicate_of}, se omite: {product_url}")
+                    self.skipped_duplicates += 1
+                    continue
+                if not self.claim_listing(product_url):
+                    continue
+                
+                product_data = self.extract_product_details(product_url, global_index)
+                # Completar con los datos de la tarjeta lo que no se encontró en el detalle
+                for key in ("title", "price", "price_value", "location"):
+                    if product_data.get(key) in ("", None) and card.get(key) not in ("", None):
+                        product_data[key] = card[key]
+                self.register_duplicates(product_data, card_text)
+                self.all_products.append(product_data)
+                scheduler.record(self.log_timing(f"   Producto {global_index}", item_start))
+            
+        except KeyboardInterrupt:
+            logger.warning("\n⚠️  Interrupción por teclado (Ctrl+C)")
+        
+        except Exception as e:
+            logger.error(f"Error durante el scraping con presupuesto: {e}")
+        
+        finally:
+            self.schedule_stats = scheduler.finish()
+            self.log_timing("TOTAL SCRAPING", scraping_start)
+            self.print_timing_summary()
+            
+            skipped = self.schedule_stats['skipped']
+            logger.info(f"📋 Visitados: {self.schedule_stats['visited']} "
+                        f"(promedio {self.schedule_stats['avg_item_seconds']:.1f}s por producto)")
+            if skipped:
+                reason = "presupuesto agotado" if self.schedule_stats['deadline_hit'] else "límite de productos"
+                logger.info(f"⏭️  Omitidos sin visitar: {len(skipped)} ({reason})")
+                for item in skipped[:5]:
+                    logger.info(f"     - {item['title'] or item['url']} ({item['price_value']})")
+            if self.skipped_duplicates:
+                logger.info(f"🔁 Reposts omitidos sin visitar: {self.skipped_duplicates}")
+            if self.skipped_other_region:
+                logger.info(f"🌎 Omitidos por ya visitarse en otra región: {self.skipped_other_region}")
+            self.log_cache_stats()
+            self.dedupe_index.save()
+            
+            self.scraper.close()
+        
+        return self.all_products
+    
+    def _enrich_products(self, products):
+        """
+        Visita la página de detalle de cada producto y completa sus campos
+        
+        Se ejecuta en segundo plano con el mismo navegador de la pasada superficial.
+        
+        Args:
+            products: Productos (de tarjeta) a completar en sitio
+        """
+        enrich_start = time.perf_counter()
+        try:
+            for product in products:
+                if interrupted:
+                    logger.warning("⚠️  Deteniendo enriquecimiento por interrupción del usuario...")
+                    break
+                
+                item_start = time.perf_counter()
+                details = self.extract_product_details(product['url'], product['index'])
+                for key, value in details.items():
+                    if value not in ("", None) and value != () and value != [] and key != "index":
+                        product[key] = value
+                product["detail_level"] = "detail"
+                self.register_duplicates(product, self.card_texts.get(product['url'], ''))
+                self.log_timing(f"   Producto {product['index']} (enriquecido)", item_start)
+        except Exception as e:
+            logger.error(f"Error durante el enriquecimiento: {e}")
+        finally:
+            self.log_timing("TOTAL ENRIQUECIMIENTO", enrich_start)
+            self.log_cache_stats()
+            self.dedupe_index.save()
+            self.scraper.close()
+    
+    def wait_for_enrichment(self, timeout=None):
+        """
+        Espera a que termine el enriquecimiento en segundo plano
+        
+        Args:
+            timeout: Segundos máximos de espera (None = sin límite)
+            
+        Returns:
+            Lista de productos (con los campos de detalle ya completados)
+        """
+        if self.enrichment_future is not None:
+            self.enrichment_future.result(timeout=timeout)
+            self.print_timing_summary()
+        return self.all_products
+    
+    def open_search(self, search_term: str, location: str, min_price: int, max_price: int):
+        """
+        Abre OfferUp y deja la página de resultados lista (ubicación, búsqueda y filtros)
+        
+        Args:
+            search_term: Término de búsqueda
+            location: Código postal
+            min_price: Precio mínimo
+            max_price: Precio máximo
+        """
+        # 1. Navegar a OfferUp
+        step_start = time.perf_counter()
+        logger.info("Paso 1: Navegando a OfferUp...")
+        self.scraper.get_page(self.base_url)
+        logger.info("⏳ Esperando 20 segundos para que cargue completamente...")
+        time.sleep(20)
+        self.log_timing("1. Navegación inicial + carga", step_start)
+        
+        # 2. Configurar ubicación PRIMERO (antes de buscar)
+        step_start = time.perf_counter()
+        logger.info("Paso 2: Configurando ubicación...")
+        self.configure_location(location)
+        self.log_timing("2. Configuración de ubicación", step_start)
+        
+        # 3. Buscar producto
+        step_start = time.perf_counter()
+        logger.info("Paso 3: Buscando '{search_term}'...")
+        search_box = self.scraper.wait_for_element(By.CSS_SELECTOR, "input[type='search'], input[placeholder*='Search']")
+        if search_box:
+            search_box.clear()
+            search_box.send_keys(search_term)
+            search_box.send_keys(Keys.RETURN)
+            time.sleep(5)
+            logger.info("✓ Búsqueda realizada")
+        self.log_timing("3. Búsqueda de producto", step_start)
+        
+        # 4. Aplicar filtros de precio
+        step_start = time.perf_counter()
+        logger.info("Paso 4: Aplicando filtros de precio...")
+        self.apply_price_filters(min_price, max_price)
+        self.log_timing("4. Aplicación de filtros", step_start)
+    
+    def go_to_next_page(self, page_num: int) -> bool:
+        """
+        Hace clic en el botón de siguiente página de resultados
+        
+        Args:
+            page_num: Número de la página a la que se navega (para logs)
+            
+        Returns:
+            True si se pudo navegar, False si no hay más páginas
+        """
+        logger.info(f"\nIntentando ir a página {page_num}...")
+        try:
+            # Buscar botón de siguiente página
+            next_buttons = [
+                "button[aria-label*='next']",
+                "a[aria-label*='next']",
+                "button:has-text('Next')",
+                "a:has-text('Next')"
+            ]
+            
+            for selector in next_buttons:
+                try:
+                    next_btn = self.scraper.driver.find_element(By.CSS_SELECTOR, selector)
+                    if next_btn and next_btn.is_displayed():
+                        throttle(self.base_url)
+                        next_btn.click()
+                        self.scraper.wait_until_loaded()
+                        logger.info(f"✓ Navegando a página {page_num}")
+                        return True
+                except:
+                    continue
+            
+            logger.info("No hay más páginas disponibles")
+            return False
+                
+        except Exception as e:
+            logger.warning(f"Error al cambiar de página: {e}")
+            return False
+    
+    def start_search(self, search_term: str, location: str, min_price: int, max_price: int):
+        """
+        Registra los parámetros de búsqueda sin abrir el navegador en OfferUp
+        
+        La búsqueda real (open_search) se hace la primera vez que se necesita
+        una página de resultados que no está en caché.
+        """
+        self.search_params = (search_term, location, min_price, max_price)
+        self.search_page = None
+    
+    def goto_results_page(self, page_num: int) -> bool:
+        """
+        Deja el navegador en la página de resultados indicada (abre la búsqueda si hace falta)
+        
+        Args:
+            page_num: Número de página
+            
+        Returns:
+            True si el navegador quedó en esa página
+        """
+        if self.search_page is None:
+            self.open_search(*self.search_params)
+            self.search_page = 1
+        while self.search_page < page_num:
+            if not self.go_to_next_page(self.search_page + 1):
+                return False
+            self.search_page += 1
+        return True
+    
+    def _page_cache_key(self, page_num: int) -> str:
+        """Clave de caché de una página: (término, ZIP, precio mínimo, precio máximo, página)"""
+        search_term, location, min_price, max_price = self.search_params
+        return f"{normalize_text(search_term).strip()}|{location}|{min_price}|{max_price}|{page_num}"
+    
+    def get_results_page(self, page_num: int, with_cards: bool = False):
+        """
+        Obtiene los enlaces de una página de resultados, desde la caché si es posible
+        
+        Args:
+            page_num: Número de página
+            with_cards: Si True, también deja los datos de cada tarjeta en self.cards
+            
+        Returns:
+            Lista de URLs de productos (vacía si la página no existe)
+        """
+        # Las páginas con tarjetas se guardan aparte: llevan más datos
+        key = self._page_cache_key(page_num) + ("|cards" if with_cards else "")
+        cached = self.page_cache.get(key)
+        if cached is not None:
+            logger.info(f"💾 Página {page_num} en caché: {len(cached['links'])} enlaces")
+            self.card_texts.update(cached['card_texts'])
+            if with_cards:
+                self.cards.update({url: ProductRecord.from_dict(card) for url, card in cached['cards'].items()})
+            return cached['links']
+        
+        if not self.goto_results_page(page_num):
+            return []
+        
+        product_links = self.get_product_links(max_items=999, with_cards=with_cards)
+        if product_links:
+            entry = {
+                'links': product_links,
+                'card_texts': {url: self.card_texts.get(url, '') for url in product_links}
+            }
+            if with_cards:
+                entry['cards'] = {url: self.cards[url].to_dict() for url in product_links if url in self.cards}
+            self.page_cache.set(key, entry)
+        return product_links
+    
     def scrape_with_pagination(self, search_term: str, location: str, min_price: int, max_price: int, 
-                                max_items: int = 100):
+                                max_items: int = 100, pipeline=None):
         """
         Scraping completo con paginación dinámica
         
@@ -558,7 +1363,12 @@ class OfferUpDetailedScraper:
             min_price: Precio mínimo
             max_price: Precio máximo
             max_items: Total de items a extraer (default: 100)
+            pipeline: Si True, pagina en una segunda sesión en paralelo
+                (scrape_pipelined; default: Config.PIPELINE_PAGINATION)
         """
+        if Config.PIPELINE_PAGINATION if pipeline is None else pipeline:
+            return self.scrape_pipelined(search_term, location, min_price, max_price, max_items)
+        
         logger.info("\n" + "="*60)
         logger.info("INICIANDO SCRAPING DETALLADO DE OFFERUP")
         logger.info("="*60)
@@ -573,37 +1383,9 @@ class OfferUpDetailedScraper:
         try:
             self.scraper.setup_driver()
             
-            # 1. Navegar a OfferUp
-            step_start = time.perf_counter()
-            logger.info("Paso 1: Navegando a OfferUp...")
-            self.scraper.get_page(self.base_url)
-            logger.info("⏳ Esperando 20 segundos para que cargue completamente...")
-            time.sleep(20)
-            log_timing("1. Navegación inicial + carga", step_start)
-            
-            # 2. Configurar ubicación PRIMERO (antes de buscar)
-            step_start = time.perf_counter()
-            logger.info("Paso 2: Configurando ubicación...")
-            self.configure_location(location)
-            log_timing("2. Configuración de ubicación", step_start)
-            
-            # 3. Buscar producto
-            step_start = time.perf_counter()
-            logger.info("Paso 3: Buscando '{search_term}'...")
-            search_box = self.scraper.wait_for_element(By.CSS_SELECTOR, "input[type='search'], input[placeholder*='Search']")
-            if search_box:
-                search_box.clear()
-                search_box.send_keys(search_term)
-                search_box.send_keys(Keys.RETURN)
-                time.sleep(5)
-                logger.info("✓ Búsqueda realizada")
-            log_timing("3. Búsqueda de producto", step_start)
-            
-            # 4. Aplicar filtros de precio
-            step_start = time.perf_counter()
-            logger.info("Paso 4: Aplicando filtros de precio...")
-            self.apply_price_filters(min_price, max_price)
-            log_timing("4. Aplicación de filtros", step_start)
+            # 1-4. Abrir OfferUp, ubicación, búsqueda y filtros (solo si alguna
+            # página de resultados no está en caché)
+            self.start_search(search_term, location, min_price, max_price)
             
             # 5. Procesar páginas dinámicamente
             page_num = 1
@@ -622,8 +1404,8 @@ class OfferUpDetailedScraper:
                 
                 # Obtener TODOS los enlaces de productos de la página actual
                 links_start = time.perf_counter()
-                product_links = self.get_product_links(max_items=999)
-                log_timing(f"5.{page_num}.a Obtención de enlaces", links_start)
+                product_links = self.get_results_page(page_num)
+                self.log_timing(f"5.{page_num}.a Obtención de enlaces", links_start)
                 
                 if not product_links:
                     logger.warning(f"No se encontraron productos en página {page_num}")
@@ -644,17 +1426,13 @@ class OfferUpDetailedScraper:
                         logger.warning("⚠️  Deteniendo procesamiento de productos...")
                         break
                         
-                    item_start = time.perf_counter()
-                    product_url = product_links[idx]
-                    global_index = total_extracted + idx + 1
-                    product_data = self.extract_product_details(product_url, global_index)
-                    self.all_products.append(product_data)
-                    log_timing(f"   Producto {global_index}", item_start)
+                    product_data = self.visit_listing(product_links[idx], total_extracted + idx + 1)
+                    if product_data is None:
+                        continue
                     
-                    # Volver a la página de resultados
-                    if not interrupted:  # Solo volver si no fue interrumpido
-                        self.scraper.driver.back()
-                        time.sleep(1)
+                    # Volver a la página de resultados (si estaba abierta y se navegó al producto)
+                    if not interrupted and not self.last_from_cache and self.search_page is not None:
+                        self.scraper.back()
                 
                 # Si hubo interrupción durante procesamiento, actualizar contador con lo procesado
                 if interrupted:
@@ -662,11 +1440,11 @@ class OfferUpDetailedScraper:
                     total_extracted += actual_processed
                     break
                 
-                log_timing(f"5.{page_num}.b Procesamiento de {items_to_process} productos", products_start)
+                self.log_timing(f"5.{page_num}.b Procesamiento de {items_to_process} productos", products_start)
                 
                 # Actualizar contador total
                 total_extracted += items_to_process
-                log_timing(f"5.{page_num} Página completa", page_start)
+                self.log_timing(f"5.{page_num} Página completa", page_start)
                 logger.info(f"\n✓ Total extraído hasta ahora: {total_extracted}/{max_items}")
                 
                 # Si ya alcanzamos el máximo, terminar
@@ -674,39 +1452,151 @@ class OfferUpDetailedScraper:
                     logger.info(f"\n✓✓✓ Se alcanzó el límite de {max_items} items")
                     break
                 
-                # Intentar ir a la siguiente página
+                # Siguiente página (desde caché o navegando)
                 page_num += 1
-                logger.info(f"\nIntentando ir a página {page_num}...")
+            
+        except KeyboardInterrupt:
+            logger.warning("\n⚠️  Interrupción por teclado (Ctrl+C)")
+            logger.info("Guardando datos recolectados antes de salir...")
+        
+        except Exception as e:
+            logger.error(f"Error durante el scraping: {e}")
+        
+        finally:
+            total_time = time.perf_counter() - scraping_start
+            self.log_timing("TOTAL SCRAPING", scraping_start)
+            
+            # Mostrar resumen detallado de tiempos por operación
+            self.print_timing_summary()
+            
+            if interrupted:
+                logger.info(f"💾 Datos recolectados antes de la interrupción: {len(self.all_products)} productos")
+            
+            if self.skipped_duplicates:
+                logger.info(f"🔁 Reposts omitidos sin visitar: {self.skipped_duplicates}")
+            if self.skipped_other_region:
+                logger.info(f"🌎 Omitidos por ya visitarse en otra región: {self.skipped_other_region}")
+            self.log_cache_stats()
+            self.dedupe_index.save()
+            
+            self.scraper.close()
+        
+        return self.all_products
+
+    
+    def _prefetch_pages(self, pager, pages: queue.Queue, stop: threading.Event, stats: dict):
+        """
+        Hilo paginador: recorre las páginas de resultados en su propia sesión
+        
+        Deja en la cola (page_num, enlaces, textos de tarjetas) de cada página y
+        al final None. La cola limitada hace que coseche la página N+1 mientras
+        se extraen los detalles de la página N, sin adelantarse más.
+        """
+        def offer(item):
+            while not stop.is_set():
                 try:
-                    # Buscar botón de siguiente página
-                    next_buttons = [
-                        "button[aria-label*='next']",
-                        "a[aria-label*='next']",
-                        "button:has-text('Next')",
-                        "a:has-text('Next')"
-                    ]
-                    
-                    next_clicked = False
-                    for selector in next_buttons:
-                        try:
-                            next_btn = self.scraper.driver.find_element(By.CSS_SELECTOR, selector)
-                            if next_btn and next_btn.is_displayed():
-                                next_btn.click()
-                                time.sleep(2)
-                                next_clicked = True
-                                logger.info(f"✓ Navegando a página {page_num}")
-                                break
-                        except:
-                            continue
-                    
-                    if not next_clicked:
-                        logger.info("No hay más páginas disponibles")
+                    pages.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        page_num = 1
+        try:
+            while not stop.is_set() and not interrupted:
+                harvest_start = time.perf_counter()
+                product_links = pager.get_results_page(page_num)
+                stats['harvest'] += time.perf_counter() - harvest_start
+                texts = {url: pager.card_texts.get(url, '') for url in product_links}
+                if not product_links or not offer((page_num, product_links, texts)):
+                    break
+                stats['pages'] += 1
+                page_num += 1
+        except Exception as e:
+            logger.error(f"Error en el paginador: {e}")
+        finally:
+            offer(None)
+    
+    def scrape_pipelined(self, search_term: str, location: str, min_price: int, max_price: int,
+                         max_items: int = 100):
+        """
+        Scraping con paginación en paralelo (pipeline)
+        
+        Una segunda sesión de navegador (el paginador) se queda en los
+        resultados: abre la búsqueda, cosecha la página N+1 y avanza de página
+        mientras esta sesión extrae los detalles de la página N. La extracción
+        ya no espera las pausas de scroll y de cambio de página ni vuelve atrás
+        a los resultados después de cada producto.
+        
+        Args:
+            search_term: Término de búsqueda
+            location: Ubicación
+            min_price: Precio mínimo
+            max_price: Precio máximo
+            max_items: Total de items a extraer (default: 100)
+        """
+        logger.info("\n" + "="*60)
+        logger.info("INICIANDO SCRAPING DETALLADO DE OFFERUP (PIPELINE)")
+        logger.info("="*60)
+        logger.info(f"Búsqueda: {search_term} | Ubicación: {location} | Precio: ${min_price} - ${max_price}")
+        logger.info(f"Total de items a extraer: {max_items}")
+        logger.info("="*60 + "\n")
+        
+        scraping_start = time.perf_counter()
+        pager = OfferUpDetailedScraper(headless=self.scraper.headless, dedupe_index=self.dedupe_index,
+                                       registry=self.registry, region=self.region, stats=self.timing_stats)
+        pages = queue.Queue(maxsize=max(1, Config.PIPELINE_PREFETCH_PAGES))
+        stop = threading.Event()
+        stats = {'harvest': 0.0, 'wait': 0.0, 'pages': 0}
+        paginator = None
+        total_extracted = 0
+        
+        try:
+            self.scraper.setup_driver()
+            pager.scraper.setup_driver()
+            pager.start_search(search_term, location, min_price, max_price)
+            paginator = threading.Thread(target=self._prefetch_pages, args=(pager, pages, stop, stats),
+                                         name="paginador", daemon=True)
+            paginator.start()
+            
+            while total_extracted < max_items and not interrupted:
+                # Solo se espera si el paginador aún no tiene lista la siguiente página
+                wait_start = time.perf_counter()
+                item = None
+                while paginator.is_alive() or not pages.empty():
+                    try:
+                        item = pages.get(timeout=0.5)
                         break
-                        
-                except Exception as e:
-                    logger.warning(f"Error al cambiar de página: {e}")
+                    except queue.Empty:
+                        if interrupted:
+                            break
+                stats['wait'] += time.perf_counter() - wait_start
+                if item is None:
                     break
+                
+                page_num, product_links, texts = item
+                self.card_texts.update(texts)
+                items_to_process = min(len(product_links), max_items - total_extracted)
+                logger.info(f"\n{'='*60}")
+                logger.info(f"PÁGINA {page_num} - Extraídos: {total_extracted}/{max_items} "
+                            f"({items_to_process} a procesar)")
+                logger.info(f"{'='*60}\n")
+                
+                products_start = time.perf_counter()
+                processed = 0
+                for idx in range(items_to_process):
+                    if interrupted:
+                        logger.warning("⚠️  Deteniendo procesamiento de productos...")
+                        break
+                    self.visit_listing(product_links[idx], total_extracted + idx + 1)
+                    processed += 1
+                self.log_timing(f"5.{page_num}.b Procesamiento de {processed} productos", products_start)
+                total_extracted += processed
+                logger.info(f"\n✓ Total extraído hasta ahora: {total_extracted}/{max_items}")
             
+            if total_extracted >= max_items:
+                logger.info(f"\n✓✓✓ Se alcanzó el límite de {max_items} items")
+        
         except KeyboardInterrupt:
             logger.warning("\n⚠️  Interrupción por teclado (Ctrl+C)")
             logger.info("Guardando datos recolectados antes de salir...")
@@ -715,20 +1605,125 @@ class OfferUpDetailedScraper:
             logger.error(f"Error durante el scraping: {e}")
         
         finally:
-            total_time = time.perf_counter() - scraping_start
-            log_timing("TOTAL SCRAPING", scraping_start)
+            stop.set()
+            if paginator is not None:
+                paginator.join(timeout=30)
             
-            # Mostrar resumen detallado de tiempos por operación
-            print_timing_summary()
+            # Tiempo de paginación que corrió en paralelo con la extracción
+            overlap = max(0.0, stats['harvest'] - stats['wait'])
+            self.timing_stats["5.P Pipeline: paginación en paralelo"] = stats['harvest']
+            self.timing_stats["5.P Pipeline: espera del paginador"] = stats['wait']
+            self.timing_stats["5.P Pipeline: tiempo solapado (ahorrado)"] = overlap
+            logger.info(f"🔀 Pipeline: {stats['pages']} páginas cosechadas en {stats['harvest']:.1f}s, "
+                        f"espera {stats['wait']:.1f}s, solapado {overlap:.1f}s")
+            
+            self.log_timing("TOTAL SCRAPING", scraping_start)
+            self.print_timing_summary()
             
             if interrupted:
                 logger.info(f"💾 Datos recolectados antes de la interrupción: {len(self.all_products)} productos")
+            if self.skipped_duplicates:
+                logger.info(f"🔁 Reposts omitidos sin visitar: {self.skipped_duplicates}")
+            if self.skipped_other_region:
+                logger.info(f"🌎 Omitidos por ya visitarse en otra región: {self.skipped_other_region}")
+            self.log_cache_stats()
+            self.dedupe_index.save()
             
+            pager.scraper.close()
             self.scraper.close()
         
         return self.all_products
 
 
+def scrape_regions(zip_codes, search_term: str, min_price: int, max_price: int, max_items: int = 100,
+                   mode: str = 'detailed', max_workers=None, headless=False, browser=None, **kwargs):
+    """
+    Busca en varios códigos postales en paralelo (una sesión de navegador por ZIP)
+    
+    Las sesiones comparten el índice de duplicados y un RegionRegistry, así
+    cada publicación se visita una sola vez aunque aparezca en varias regiones.
+    Las visitas a detalles comparten el controlador adaptativo 'offerup_detail'
+    (concurrency.py): ante bloqueos, parte de las sesiones espera su turno.
+    Cada producto del resultado lleva 'regions' con los ZIPs donde apareció.
+    
+    Args:
+        zip_codes: Lista de códigos postales
+        search_term: Término de búsqueda
+        min_price: Precio mínimo
+        max_price: Precio máximo
+        max_items: Máximo de productos por región
+        mode: 'detailed', 'shallow' o 'budget'
+        max_workers: Sesiones simultáneas (default: Config.FANOUT_MAX_WORKERS)
+        headless: Navegadores sin ventana
+        browser: WebScraper persistente que reutiliza la sesión del primer ZIP
+            (las demás abren su propio navegador)
+        **kwargs: Parámetros extra del modo (price_below, budget_seconds, priority)
+        
+    Returns:
+        Lista de productos combinada, sin repetidos
+    """
+    registry = RegionRegistry()
+    dedupe_index = NearDuplicateIndex()
+    workers = min(len(zip_codes), max_workers or Config.FANOUT_MAX_WORKERS)
+    
+    logger.info(f"🌎 Búsqueda en {len(zip_codes)} regiones ({', '.join(zip_codes)}) con {workers} sesiones")
+    
+    # Tiempos de cada sesión por separado (los hilos no comparten timing_stats)
+    region_stats = {zip_code: {} for zip_code in zip_codes}
+    
+    def run_region(zip_code):
+        scraper = OfferUpDetailedScraper(headless=headless, dedupe_index=dedupe_index,
+                                         registry=registry, region=zip_code,
+                                         stats=region_stats[zip_code],
+                                         browser=browser if zip_code == zip_codes[0] else None)
+        if mode == 'shallow':
+            scraper.scrape_shallow(search_term, zip_code, min_price, max_price, max_items,
+                                   price_below=kwargs.get('price_below'))
+            return scraper.wait_for_enrichment()
+        if mode == 'budget':
+            return scraper.scrape_with_budget(search_term, zip_code, min_price, max_price, max_items,
+                                              budget_seconds=kwargs.get('budget_seconds'),
+                                              priority=kwargs.get('priority', Config.DETAIL_PRIORITY))
+        return scraper.scrape_with_pagination(search_term, zip_code, min_price, max_price, max_items)
+    
+    fanout_start = time.perf_counter()
+    region_results = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="region") as pool:
+        futures = {zip_code: pool.submit(run_region, zip_code) for zip_code in zip_codes}
+        for zip_code, future in futures.items():
+            try:
+                region_results[zip_code] = future.result()
+            except Exception as e:
+                logger.error(f"Error en región {zip_code}: {e}")
+                region_results[zip_code] = []
+    
+    # Combinar: una entrada por publicación (se prefiere la que tiene detalle)
+    merged = {}
+    for zip_code in zip_codes:
+        for product in region_results[zip_code]:
+            listing_id = extract_listing_id(product.get('url', ''))
+            registry.claim(listing_id, zip_code)
+            current = merged.get(listing_id)
+            if current is None or (current.get('detail_level') == 'card' and product.get('detail_level') != 'card'):
+                merged[listing_id] = product
+    
+    results = []
+    for listing_id, product in merged.items():
+        product["index"] = len(results) + 1
+        product["regions"] = registry.regions_for(listing_id)
+        results.append(product)
+    dedupe_index.resolve_clusters(results)
+    
+    multi_region = sum(1 for p in results if len(p["regions"]) > 1)
+    logger.info(f"🌎 Regiones combinadas: {len(results)} productos únicos, {multi_region} en más de una región")
+    # Un solo resumen con los pasos de cada región
+    merged_stats = {f"[{zip_code}] {step}": elapsed
+                    for zip_code, stats in region_stats.items() for step, elapsed in stats.items()}
+    log_timing("TOTAL BÚSQUEDA MULTI-REGIÓN", fanout_start, merged_stats)
+    print_timing_summary(merged_stats)
+    return results
+
+
 def generate_mobile_html(products, search_term, location, min_price, max_price):
     """Genera HTML optimizado para mobile con todos los productos"""
     
@@ -742,7 +1737,11 @@ def generate_mobile_html(products, search_term, location, min_price, max_price):
             return float(match.group().replace(',', ''))
         return 0
     
-    sorted_products = sorted(products, key=extract_price)
+    # Con puntaje de ofertas, las mejores ofertas primero
+    if any(product.get('deal_score') is not None for product in products):
+        sorted_products = sorted(products, key=deal_sort_key)
+    else:
+        sorted_products = sorted(products, key=extract_price)
     
     html = f"""<!DOCTYPE html>
 <html lang="es">
@@ -993,6 +1992,20 @@ def generate_mobile_html(products, search_term, location, min_price, max_price):
         images = product.get('images', [])
         url = product.get('url', '#')
         
+        # Aviso de reposts (colapsados en esta tarjeta o con fotos repetidas)
+        duplicates_html = ''
+        if product.get('duplicate_count'):
+            duplicates_html = f'                <div class="product-location">🔁 {product["duplicate_count"]} publicaciones similares</div>\n'
+        if product.get('image_repost_of'):
+            duplicates_html += '                <div class="product-location">📷 Fotos ya vistas en otra publicación</div>\n'
+        if product.get('deal_score') is not None and product['deal_score'] >= 1:
+            drop = f" · {product['price_drop_pct']:.0%} menos que antes" if product.get('price_drop_pct') else ''
+            duplicates_html += f'                <div class="product-location">💎 Oferta {product["deal_score"]:+.1f}{drop}</div>\n'
+        if product.get('matched_rules'):
+            duplicates_html += f'                <div class="product-location">🔔 {", ".join(product["matched_rules"])}</div>\n'
+        if len(product.get('regions') or []) > 1:
+            duplicates_html += f'                <div class="product-location">🌎 Regiones: {", ".join(product["regions"])}</div>\n'
+        
         # Primera imagen como principal
         main_image = images[0] if images else 'https://via.placeholder.com/800x600?text=Sin+Imagen'
         
@@ -1006,7 +2019,7 @@ def generate_mobile_html(products, search_term, location, min_price, max_price):
             <div class="product-content">
                 <h2 class="product-title">{title}</h2>
                 <div class="product-location">📍 {location}</div>
-                <div class="product-description">{description[:200]}{'...' if len(description) > 200 else ''}</div>
+{duplicates_html}                <div class="product-description">{description[:200]}{'...' if len(description) > 200 else ''}</div>
 """
         
         # Thumbnails de imágenes adicionales en grid de 2 columnas
@@ -1036,7 +2049,7 @@ def generate_mobile_html(products, search_term, location, min_price, max_price):
 
 
 def create_scheduled_task(task_name, script_path, schedule_time, config):
-    """Crea una tarea programada en Windows"""
+    """Crea una tarea programada (Windows: schtasks; otros sistemas: daemon de tareas)"""
     try:
         import subprocess
         import json
@@ -1046,6 +2059,15 @@ def create_scheduled_task(task_name, script_path, schedule_time, config):
         with open(config_file, 'w', encoding='utf-8') as f:
             json.dump(config, f, ensure_ascii=False, indent=2)
         
+        # Linux/macOS: registrar la búsqueda en el daemon de tareas (scheduler_daemon.py)
+        if os.name != 'nt':
+            from scheduler_daemon import add_job, daily_job
+            jobs_path = add_job(daily_job(config))
+            logger.info(f"✅ Tarea agregada al daemon: {jobs_path}")
+            logger.info(f"⏰ Se ejecutará diariamente a las {schedule_time}")
+            logger.info(f"\n💡 Inicia el daemon con: python offerup_detailed_scraper.py --daemon\n")
+            return True
+        
         # Crear script batch que ejecuta el scraper con la configuración guardada
         batch_file = os.path.join(os.path.dirname(script_path), 'run_scheduled_scraper.bat')
         venv_python = os.path.join(os.path.dirname(script_path), 'venv', 'Scripts', 'python.exe')
@@ -1086,55 +2108,6 @@ def create_scheduled_task(task_name, script_path, schedule_time, config):
         return False
 
 
-def send_email_gmail(recipient_email, subject, html_content, html_file_path=None, sender_email=None, sender_password=None):
-    """Envía email con HTML usando Gmail SMTP"""
-    try:
-        # Usar credenciales de .env si no se proporcionaron
-        if not sender_email:
-            sender_email = Config.GMAIL_USER if Config.GMAIL_USER else input("\n📧 Email de Gmail (remitente): ").strip()
-        
-        if not sender_password:
-            sender_password = Config.GMAIL_APP_PASSWORD if Config.GMAIL_APP_PASSWORD else None
-            if not sender_password:
-                print("\n🔑 Contraseña de aplicación de Gmail")
-                print("   (Crear en: https://myaccount.google.com/apppasswords)")
-                sender_password = getpass.getpass("   Password: ")
-        
-        # Crear mensaje
-        msg = MIMEMultipart('alternative')
-        msg['From'] = sender_email
-        msg['To'] = recipient_email
-        msg['Subject'] = subject
-        
-        # Adjuntar HTML como contenido
-        html_part = MIMEText(html_content, 'html', 'utf-8')
-        msg.attach(html_part)
-        
-        # Adjuntar archivo HTML si se especifica
-        if html_file_path and os.path.exists(html_file_path):
-            with open(html_file_path, 'rb') as f:
-                attachment = MIMEBase('application', 'octet-stream')
-                attachment.set_payload(f.read())
-                encoders.encode_base64(attachment)
-                attachment.add_header('Content-Disposition', f'attachment; filename="{os.path.basename(html_file_path)}"')
-                msg.attach(attachment)
-        
-        # Conectar y enviar
-        print("\n📤 Conectando con Gmail...")
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        server.login(sender_email, sender_password)
-        server.send_message(msg)
-        server.quit()
-        
-        logger.info(f"✅ Email enviado exitosamente a {recipient_email}")
-        return True
-        
-    except Exception as e:
-        logger.error(f"❌ Error al enviar email: {e}")
-        return False
-
-
 def get_user_input():
     """Solicita parámetros de búsqueda al usuario"""
 
@@ -1149,12 +2122,29 @@ def get_user_input():
             break
         print("❌ Por favor ingresa un término de búsqueda válido\n")
     
-    # Código postal
+    # Código(s) postal(es): varios separados por coma buscan en paralelo;
+    # "ZIP@millas" cubre el área alrededor del ZIP con el mínimo de búsquedas
     while True:
-        zip_code = input("\n📍 Código postal / ZIP Code (ej: 92101): ").strip()
-        if zip_code and len(zip_code) == 5 and zip_code.isdigit():
+        zip_input = input("\n📍 Código postal / ZIP Code (ej: 92101, varios: 92101,91910, área: 92101@50): ").strip()
+        area_match = re.fullmatch(r'(\d{5})\s*@\s*(\d+(?:\.\d+)?)', zip_input)
+        if area_match:
+            try:
+                zip_codes = ZipIndex().cover_zip(area_match.group(1), float(area_match.group(2)),
+                                                 Config.SEARCH_RADIUS_MILES)
+            except KeyError:
+                zip_codes = []
+            if zip_codes:
+                print(f"🗺️  ZIPs que cubren el área: {', '.join(zip_codes)}")
+                # Con un solo ZIP se busca ese (el impreso), no necesariamente el central
+                zip_code = zip_codes[0]
+                break
+            print("❌ Código postal desconocido\n")
+            continue
+        zip_codes = list(dict.fromkeys(z.strip() for z in zip_input.split(',') if z.strip()))
+        if zip_codes and all(len(z) == 5 and z.isdigit() for z in zip_codes):
+            zip_code = zip_codes[0]
             break
-        print("❌ Por favor ingresa un código postal válido de 5 dígitos\n")
+        print("❌ Por favor ingresa códigos postales válidos de 5 dígitos\n")
     
     # Precio mínimo
     while True:
@@ -1189,6 +2179,42 @@ def get_user_input():
         except ValueError:
             print("❌ Por favor ingresa un número válido\n")
     
+    # Modo superficial (solo tarjetas de resultados + detalle selectivo)
+    shallow = input("\n⚡ ¿Modo rápido? Solo tarjetas, detalle para nuevos/baratos (s/N): ").strip().lower()
+    shallow = shallow in ['s', 'si', 'yes', 'y']
+    
+    enrich_price_below = None
+    if shallow:
+        while True:
+            try:
+                threshold_input = input("💲 Visitar detalle si el precio es menor a (Enter para solo nuevos): ").strip()
+                enrich_price_below = None if not threshold_input else int(threshold_input)
+                break
+            except ValueError:
+                print("❌ Por favor ingresa un número válido\n")
+    
+    # Presupuesto de tiempo y prioridad de visita (modo detallado)
+    budget_minutes = Config.DETAIL_BUDGET_MINUTES or None
+    priority = Config.DETAIL_PRIORITY
+    if not shallow:
+        while True:
+            try:
+                budget_input = input("\n⏳ Tiempo máximo en minutos (Enter para sin límite): ").strip()
+                budget_minutes = None if not budget_input else float(budget_input)
+                if budget_minutes is None or budget_minutes > 0:
+                    break
+                print("❌ El tiempo debe ser mayor a 0\n")
+            except ValueError:
+                print("❌ Por favor ingresa un número válido\n")
+        
+        if budget_minutes:
+            while True:
+                priority_input = input(f"🏆 Prioridad ({', '.join(PRIORITIES)}; Enter para {Config.DETAIL_PRIORITY}): ").strip().lower()
+                priority = priority_input or Config.DETAIL_PRIORITY
+                if priority in PRIORITIES:
+                    break
+                print(f"❌ Opciones válidas: {', '.join(PRIORITIES)}\n")
+    
     # Configuración de email
     send_email = input("\n📧 ¿Enviar resultados por email al finalizar? (S/n): ").strip().lower()
     send_email = send_email in ['s', 'si', 'yes', 'y', '']
@@ -1224,9 +2250,13 @@ def get_user_input():
     print("📋 RESUMEN DE CONFIGURACIÓN:")
     print("="*60)
     print(f"🔍 Búsqueda: {search_term}")
-    print(f"📍 Ubicación: {zip_code}")
+    print(f"📍 Ubicación: {', '.join(zip_codes)}")
     print(f"💵 Precio: ${min_price} - ${max_price}")
     print(f"🔢 Cantidad: {max_items} productos")
+    if shallow:
+        print(f"⚡ Modo rápido: detalle para nuevos{f' y menores a ${enrich_price_below}' if enrich_price_below is not None else ''}")
+    if budget_minutes and not shallow:
+        print(f"⏳ Presupuesto: {budget_minutes:g} min (prioridad: {priority})")
     if send_email:
         print(f"📧 Email: {recipient_email}")
     if schedule_daily:
@@ -1241,9 +2271,14 @@ def get_user_input():
     return {
         'search_term': search_term,
         'zip_code': zip_code,
+        'zip_codes': zip_codes,
         'min_price': min_price,
         'max_price': max_price,
         'max_items': max_items,
+        'shallow': shallow,
+        'enrich_price_below': enrich_price_below,
+        'budget_minutes': budget_minutes,
+        'priority': priority,
         'send_email': send_email,
         'recipient_email': recipient_email,
         'schedule_daily': schedule_daily,
@@ -1251,35 +2286,19 @@ def get_user_input():
     }
 
 
-def main():
-    """Función principal"""
-    import sys
-    
-    # Registrar manejador de señales para Ctrl+C
-    signal.signal(signal.SIGINT, signal_handler)
-    
-    Config.create_directories()
-    
-    # Verificar si se ejecuta desde tarea programada
-    is_scheduled = '--scheduled' in sys.argv
+def run_search_job(config, is_scheduled=False, browser=None, headless=False):
+    """
+    Ejecuta una búsqueda completa: scraping, guardado, reportes y email
     
-    if is_scheduled:
-        # Cargar configuración guardada
-        config_file = os.path.join(os.path.dirname(__file__), 'scheduled_config.json')
-        if os.path.exists(config_file):
-            import json
-            with open(config_file, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-            logger.info("📋 Ejecutando tarea programada con configuración guardada")
-        else:
-            logger.error("❌ No se encontró archivo de configuración programada")
-            return
-    else:
-        # Solicitar parámetros al usuario
-        config = get_user_input()
-        if not config:
-            return
+    Args:
+        config: Configuración de la búsqueda (mismo formato que scheduled_config.json)
+        is_scheduled: Ejecución sin usuario (no pedir credenciales por consola)
+        browser: WebScraper persistente a reutilizar (workers del daemon)
+        headless: Navegador sin ventana (si no se proporciona browser)
     
+    Returns:
+        Lista de productos extraídos
+    """
     # Crear carpeta con timestamp para esta ejecución
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     output_folder = os.path.join("data", f"scraping_{timestamp}")
@@ -1294,22 +2313,97 @@ def main():
     max_price = config['max_price']
     max_items = config['max_items']
     
-    # Crear scraper
-    scraper = OfferUpDetailedScraper(headless=False)
+    # Las configuraciones programadas anteriores no traen presupuesto: usar el de .env
+    budget_minutes = config.get('budget_minutes', Config.DETAIL_BUDGET_MINUTES or None)
+    
+    zip_codes = config.get('zip_codes') or [zip_code]
     
     # Ejecutar scraping
-    results = scraper.scrape_with_pagination(
-        search_term=search_term,
-        location=zip_code,  # Código postal
-        min_price=min_price,
-        max_price=max_price,
-        max_items=max_items
-    )
+    if len(zip_codes) > 1:
+        mode = 'shallow' if config.get('shallow') else ('budget' if budget_minutes else 'detailed')
+        results = scrape_regions(
+            zip_codes, search_term, min_price, max_price, max_items, mode=mode,
+            price_below=config.get('enrich_price_below'),
+            budget_seconds=budget_minutes * 60 if budget_minutes else None,
+            priority=config.get('priority') or Config.DETAIL_PRIORITY,
+            headless=headless, browser=browser
+        )
+        zip_code = ', '.join(zip_codes)
+    else:
+        # Una sola sesión (con el navegador persistente del worker si se proporciona)
+        scraper = OfferUpDetailedScraper(headless=headless, browser=browser)
+        if config.get('shallow'):
+            results = scraper.scrape_shallow(
+                search_term=search_term,
+                location=zip_code,
+                min_price=min_price,
+                max_price=max_price,
+                max_items=max_items,
+                price_below=config.get('enrich_price_below')
+            )
+            # Guardar la pasada superficial mientras se enriquece en segundo plano:
+            # el JSON superficial queda disponible en segundos, pero el resto del
+            # trabajo (puntajes, reglas, reportes y email) usa la descripción y las
+            # fotos del detalle, así que aquí se espera a que termine el enriquecimiento
+            if results:
+                save_to_json(results, os.path.join(output_folder, f"offerup_{search_term}_shallow.json"))
+            results = scraper.wait_for_enrichment()
+        elif budget_minutes:
+            results = scraper.scrape_with_budget(
+                search_term=search_term,
+                location=zip_code,
+                min_price=min_price,
+                max_price=max_price,
+                max_items=max_items,
+                budget_seconds=budget_minutes * 60,
+                priority=config.get('priority') or Config.DETAIL_PRIORITY
+            )
+            # Publicaciones que no se alcanzaron a visitar
+            if scraper.schedule_stats and scraper.schedule_stats['skipped']:
+                save_to_json(scraper.schedule_stats, os.path.join(output_folder, f"offerup_{search_term}_schedule.json"))
+        else:
+            results = scraper.scrape_with_pagination(
+                search_term=search_term,
+                location=zip_code,  # Código postal
+                min_price=min_price,
+                max_price=max_price,
+                max_items=max_items
+            )
+        # Clusters unidos después de marcar un producto cambian de representante
+        scraper.dedupe_index.resolve_clusters(results or [])
     
     # Guardar resultados en la carpeta con timestamp (siempre, incluso si fue interrumpido)
     if results:
         save_start = time.perf_counter()
         
+        # Marcar productos cuyas fotos ya aparecieron en otra publicación
+        try:
+            image_start = time.perf_counter()
+            image_index = ImageRepostIndex()
+            image_index.flag_products(results)
+            image_index.save()
+            logger.info(f"⏱️  Índice de imágenes: {time.perf_counter() - image_start:.2f}s")
+        except Exception as e:
+            logger.error(f"Error en índice de imágenes: {e}")
+        
+        # Puntaje de ofertas contra comparables del historial (antes de las reglas: pueden exigir un puntaje)
+        try:
+            deal_start = time.perf_counter()
+            score_products(results, search_term)
+            logger.info(f"⏱️  Puntaje de ofertas: {time.perf_counter() - deal_start:.2f}s")
+        except Exception as e:
+            logger.error(f"Error calculando puntaje de ofertas: {e}")
+        
+        # Evaluar las reglas de alerta guardadas (una búsqueda sirve a todas las que se traslapan)
+        try:
+            rule_engine = RuleEngine.load()
+            if rule_engine:
+                rule_counts = rule_engine.apply(results)
+                for rule_id, count in sorted(rule_counts.items(), key=lambda x: x[1], reverse=True):
+                    logger.info(f"🔔 Regla {rule_id}: {count} productos")
+        except Exception as e:
+            logger.error(f"Error evaluando reglas de alerta: {e}")
+        
         filename_json = os.path.join(output_folder, f"offerup_{search_term}_detailed.json")
         filename_csv = os.path.join(output_folder, f"offerup_{search_term}_detailed.csv")
         
@@ -1317,13 +2411,38 @@ def main():
         save_to_json(results, filename_json)
         save_to_csv(results, filename_csv)
         
-        # Generar HTML mobile-optimizado
-        html_content = generate_mobile_html(results, search_term, zip_code, min_price, max_price)
+        # Colapsar casi duplicados (reposts) en una sola tarjeta por cluster
+        report_products = collapse_duplicates(results)
+        
+        # Generar HTML mobile-optimizado (virtualizado si hay muchos productos)
+        use_virtual = Config.REPORT_MODE == 'virtual' or (
+            Config.REPORT_MODE == 'auto' and len(report_products) >= Config.VIRTUAL_REPORT_THRESHOLD)
+        if use_virtual:
+            report_content = generate_virtual_html(report_products, search_term, zip_code, min_price, max_price)
+        else:
+            report_content = generate_mobile_html(report_products, search_term, zip_code, min_price, max_price)
         filename_html = os.path.join(output_folder, f"offerup_{search_term.replace(' ', '_')}_mobile.html")
         with open(filename_html, 'w', encoding='utf-8') as f:
-            f.write(html_content)
-        logger.info(f"📱 HTML móvil guardado: {filename_html}")
+            f.write(report_content)
+        logger.info(f"📱 HTML móvil guardado: {filename_html}{' (virtualizado)' if use_virtual else ''}")
+
+        # Registrar publicaciones vistas (para detectar nuevas en siguientes ejecuciones);
+        # el estado anterior decide qué publicaciones van en el resumen por email
+        previous_seen = None
+        try:
+            seen = SeenListings()
+            previous_seen = seen.get_many(extract_listing_id(p.get('url', '')) for p in results)
+            seen.mark_seen(results)
+            seen.close()
+        except Exception as e:
+            logger.error(f"Error registrando publicaciones vistas: {e}")
         
+        # Agregar la ejecución al historial de precios columnar
+        try:
+            PriceHistoryStore().append_run(results, search_term)
+        except Exception as e:
+            logger.error(f"Error actualizando historial de precios: {e}")
+
         save_time = time.perf_counter() - save_start
         
         logger.info("\n" + "="*60)
@@ -1341,21 +2460,73 @@ def main():
         logger.info(f"Tiempo de guardado: {save_time:.2f}s")
         logger.info("="*60 + "\n")
         
-        # Enviar por email si fue configurado
+        # Enviar por email si fue configurado: resumen con solo lo nuevo o con cambio de precio
         if not interrupted and config.get('send_email') and config.get('recipient_email'):
-            subject = f"OfferUp - {search_term} ({len(results)} productos)"
-            send_email_gmail(
-                recipient_email=config['recipient_email'],
-                subject=subject,
-                html_content=html_content,
-                html_file_path=filename_html
-            )
+            notifier = DigestNotifier(interactive=not is_scheduled)
+            changed = notifier.add_job(config['recipient_email'], search_term, report_products, zip_code,
+                                       min_price, max_price, report_path=filename_html, previous=previous_seen)
+            if changed:
+                notifier.flush()
+            else:
+                logger.info("📭 Sin publicaciones nuevas ni cambios de precio: no se envía email")
     else:
         logger.warning("⚠️  No se extrajeron productos")
+
+    return results
+
+
+def main():
+    """Función principal"""
+    import sys
     
+    # Registrar manejador de señales para Ctrl+C
+    signal.signal(signal.SIGINT, signal_handler)
+    
+    Config.create_directories()
+    
+    # Modo vigilancia: sesión abierta que revisa la primera página cada pocos minutos
+    if '--watch' in sys.argv:
+        from watch_mode import run_watch
+        run_watch()
+        return
+    
+    # Daemon de tareas programadas (cron, límites de concurrencia, workers calientes)
+    if '--daemon' in sys.argv:
+        from scheduler_daemon import run_daemon
+        run_daemon()
+        return
+    
+    # Re-extracción desde el archivo de páginas (sin red, todos los núcleos)
+    if '--reextract' in sys.argv:
+        from reextract import run_reextract
+        run_reextract()
+        return
+    
+    # Verificar si se ejecuta desde tarea programada
+    is_scheduled = '--scheduled' in sys.argv
+    
+    if is_scheduled:
+        # Cargar configuración guardada
+        config_file = os.path.join(os.path.dirname(__file__), 'scheduled_config.json')
+        if os.path.exists(config_file):
+            import json
+            with open(config_file, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+            logger.info("📋 Ejecutando tarea programada con configuración guardada")
+        else:
+            logger.error("❌ No se encontró archivo de configuración programada")
+            return
+    else:
+        # Solicitar parámetros al usuario
+        config = get_user_input()
+        if not config:
+            return
+    
+    run_search_job(config, is_scheduled)
+
     # Crear tarea programada si fue configurado (solo primera vez, no desde tarea programada)
     if not interrupted and not is_scheduled and config.get('schedule_daily') and config.get('schedule_time'):
-        task_name = f"OfferUp_Scraper_{search_term.replace(' ', '_')}"
+        task_name = f"OfferUp_Scraper_{config['search_term'].replace(' ', '_')}"
         script_path = os.path.abspath(__file__)
         create_scheduled_task(task_name, script_path, config['schedule_time'], config)
 
@@ -0,0 +1,421 @@
+"""
+Archivo histórico de páginas HTML (solo agregar, comprimido con zstd)
+
+Cada página descargada (detalle y resultados de OfferUp, sitios de ropa,
+sitios de empresas) se guarda para poder volver a extraer datos cuando se
+corrige un selector, sin volver a descargar nada. Archivos del directorio:
+
+- pages.dat: registros consecutivos (URL + HTML comprimido con zstd)
+- index.bin: entradas de tamaño fijo (hash de URL, posición, tamaños, fecha,
+  tipo de página y diccionario) que se leen mapeadas en memoria con numpy
+- dict_<n>.zdict: diccionarios zstd entrenados con nuestras propias páginas
+- archive.lock: lock entre procesos (daemon, vigilancia y ejecuciones manuales
+  escriben en el mismo archivo); se retiene desde que se toma la posición
+  hasta que se escribe la entrada del índice
+
+Las primeras páginas se comprimen sin diccionario; al juntar suficientes se
+entrena uno y las siguientes lo usan (cada entrada recuerda su diccionario,
+así las anteriores se siguen pudiendo leer). Las páginas de un mismo sitio
+comparten casi todo el marcado, por lo que con diccionario cada página ocupa
+una fracción pequeña del HTML original. La lectura descomprime directamente
+desde el archivo mapeado, sin copiar el registro.
+"""
+import os
+import glob
+import mmap
+import time
+import struct
+import hashlib
+import logging
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import zstandard as zstd
+
+from config import Config
+from file_lock import file_lock
+
+logger = logging.getLogger(__name__)
+
+
+# Tipos de página (campo 'kind' del índice)
+KINDS = {
+    'offerup_detail': 1,
+    'offerup_results': 2,
+    'clothing': 3,
+    'company': 4,
+}
+KIND_NAMES = {code: name for name, code in KINDS.items()}
+
+INDEX_DTYPE = np.dtype([
+    ('url_hash', '<u8'),
+    ('offset', '<u8'),
+    ('comp_size', '<u4'),
+    ('raw_size', '<u4'),
+    ('timestamp', '<f8'),
+    ('dict_id', '<u4'),
+    ('url_size', '<u2'),
+    ('kind', 'u1'),
+    ('_pad', 'u1'),
+])
+
+# Páginas necesarias para entrenar el diccionario y tamaño del diccionario
+TRAIN_SAMPLES = 64
+DICT_SIZE = 112 * 1024
+COMPRESSION_LEVEL = 9
+
+
+def url_hash(url: str) -> int:
+    """Hash de 64 bits de una URL"""
+    return struct.unpack("<Q", hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest())[0]
+
+
+class PageArchive:
+    """Archivo de páginas con índice mapeado en memoria"""
+
+    _instances: Dict[str, 'PageArchive'] = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, directory: Optional[str] = None) -> 'PageArchive':
+        """
+        Instancia compartida por directorio (las sesiones en paralelo del mismo
+        proceso escriben a través de un solo objeto)
+        """
+        directory = os.path.abspath(directory or Config.PAGE_ARCHIVE_DIR)
+        with cls._instances_lock:
+            if directory not in cls._instances:
+                cls._instances[directory] = cls(directory)
+            return cls._instances[directory]
+
+    def __init__(self, directory: Optional[str] = None, level: int = COMPRESSION_LEVEL):
+        """
+        Abre (o crea) el archivo
+
+        Args:
+            directory: Directorio del archivo (usa Config.PAGE_ARCHIVE_DIR por defecto)
+            level: Nivel de compresión zstd
+        """
+        self.directory = directory or Config.PAGE_ARCHIVE_DIR
+        self.level = level
+        os.makedirs(self.directory, exist_ok=True)
+        self.data_path = os.path.join(self.directory, "pages.dat")
+        self.index_path = os.path.join(self.directory, "index.bin")
+        self.lock_path = os.path.join(self.directory, "archive.lock")
+        for path in (self.data_path, self.index_path):
+            if not os.path.exists(path):
+                open(path, 'wb').close()
+
+        self._lock = threading.RLock()
+        self._data_file = open(self.data_path, 'ab')
+        self._index_file = open(self.index_path, 'ab')
+
+        # Diccionarios entrenados (id -> diccionario); 0 = sin diccionario
+        self.dictionaries: Dict[int, zstd.ZstdCompressionDict] = {}
+        self.current_dict = 0
+        self._compressor = self._make_compressor(0)
+        # Bajo el lock: un diccionario recién creado por otro proceso puede estar a medio escribir
+        with file_lock(self.lock_path):
+            self._sync_dictionaries()
+        self._decompressors: Dict[int, zstd.ZstdDecompressor] = {}
+
+        self._data_map = None
+        self._data_map_size = 0
+        self._entries = np.zeros(0, dtype=INDEX_DTYPE)
+        self._by_url: Dict[int, List[int]] = {}
+        # Si el entrenamiento falla se reintenta después de otras TRAIN_SAMPLES páginas
+        self._next_training = TRAIN_SAMPLES
+        self._refresh()
+
+    # ------------------------------------------------------------------
+    # Índice
+    # ------------------------------------------------------------------
+    def _refresh(self):
+        """Vuelve a mapear el índice si creció (ej: otro proceso escribió)"""
+        index_size = os.path.getsize(self.index_path) // INDEX_DTYPE.itemsize
+        start = len(self._entries)
+        if index_size != start:
+            self._entries = np.memmap(self.index_path, dtype=INDEX_DTYPE, mode='r', shape=(index_size,))
+            for position, value in enumerate(self._entries['url_hash'][start:].tolist(), start):
+                self._by_url.setdefault(value, []).append(position)
+
+    def _data(self, end: int) -> mmap.mmap:
+        """Datos mapeados en memoria que cubren hasta la posición end"""
+        if end > self._data_map_size:
+            if self._data_map is not None:
+                try:
+                    self._data_map.close()
+                except BufferError:
+                    # Todavía hay una vista abierta sobre el mapa anterior: se libera solo
+                    pass
+            with open(self.data_path, 'rb') as f:
+                self._data_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._data_map_size = len(self._data_map)
+        return self._data_map
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _dict_path(self, dict_id: int) -> str:
+        return os.path.join(self.directory, f"dict_{dict_id}.zdict")
+
+    def _load_dictionary(self, dict_id: int) -> zstd.ZstdCompressionDict:
+        """Diccionario por id (se lee del disco la primera vez; puede venir de otro proceso)"""
+        if dict_id not in self.dictionaries:
+            with open(self._dict_path(dict_id), 'rb') as f:
+                self.dictionaries[dict_id] = zstd.ZstdCompressionDict(f.read())
+        return self.dictionaries[dict_id]
+
+    def _sync_dictionaries(self):
+        """Adopta el diccionario más reciente (ej: lo entrenó otro proceso)"""
+        ids = [int(os.path.basename(path)[5:-6])
+               for path in glob.glob(os.path.join(self.directory, "dict_*.zdict"))]
+        latest = max(ids, default=0)
+        if latest > self.current_dict:
+            self._load_dictionary(latest)
+            self.current_dict = latest
+            self._compressor = self._make_compressor(latest)
+
+    def _make_compressor(self, dict_id: int) -> zstd.ZstdCompressor:
+        if dict_id:
+            return zstd.ZstdCompressor(level=self.level, dict_data=self._load_dictionary(dict_id))
+        return zstd.ZstdCompressor(level=self.level)
+
+    def _decompressor(self, dict_id: int) -> zstd.ZstdDecompressor:
+        if dict_id not in self._decompressors:
+            if dict_id:
+                self._decompressors[dict_id] = zstd.ZstdDecompressor(dict_data=self._load_dictionary(dict_id))
+            else:
+                self._decompressors[dict_id] = zstd.ZstdDecompressor()
+        return self._decompressors[dict_id]
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+    def append(self, url: str, html: str, kind: str, timestamp: Optional[float] = None) -> int:
+        """
+        Agrega una página al archivo
+
+        Args:
+            url: URL de la página
+            html: HTML completo
+            kind: Tipo de página (ver KINDS)
+            timestamp: Momento de la descarga (ahora por defecto)
+
+        Returns:
+            Posición de la entrada en el índice
+        """
+        if kind not in KINDS:
+            raise ValueError(f"Tipo de página desconocido: {kind}")
+        raw = html.encode('utf-8')
+        url_bytes = url.encode('utf-8')
+
+        with self._lock, file_lock(self.lock_path):
+            self._sync_dictionaries()
+            compressed = self._compressor.compress(raw)
+            self._data_file.seek(0, os.SEEK_END)
+            offset = self._data_file.tell()
+            # Los datos se escriben antes que la entrada del índice: el índice
+            # nunca apunta a un registro incompleto
+            self._data_file.write(url_bytes + compressed)
+            self._data_file.flush()
+
+            entry = np.zeros(1, dtype=INDEX_DTYPE)
+            entry[0] = (url_hash(url), offset, len(compressed), len(raw), timestamp or time.time(),
+                        self.current_dict, len(url_bytes), KINDS[kind], 0)
+            self._index_file.write(entry.tobytes())
+            self._index_file.flush()
+            self._refresh()
+            position = len(self._entries) - 1
+
+            if not self.current_dict and len(self._entries) >= self._next_training:
+                self._next_training = len(self._entries) + TRAIN_SAMPLES
+                self._train_dictionary()
+        return position
+
+    def _train_dictionary(self, samples: int = TRAIN_SAMPLES * 4):
+        """Entrena un diccionario con las páginas más recientes y lo usa para las siguientes"""
+        recent = range(max(0, len(self._entries) - samples), len(self._entries))
+        pages = [self._read(position) for position in recent]
+        try:
+            dictionary = zstd.train_dictionary(DICT_SIZE, pages, level=self.level)
+        except zstd.ZstdError as e:
+            logger.warning(f"No se pudo entrenar el diccionario del archivo de páginas: {e}")
+            return
+        self._sync_dictionaries()
+        dict_id = self.current_dict + 1
+        try:
+            # Creación exclusiva: nunca se pisa el diccionario de otro proceso
+            fd = os.open(self._dict_path(dict_id), os.O_WRONLY | os.O_CREAT | os.O_EXCL
+                         | getattr(os, 'O_BINARY', 0))
+        except FileExistsError:
+            # Otro proceso acaba de entrenar uno: se usa el suyo
+            self._sync_dictionaries()
+            return
+        with os.fdopen(fd, 'wb') as f:
+            f.write(dictionary.as_bytes())
+        self.dictionaries[dict_id] = dictionary
+        self.current_dict = dict_id
+        self._compressor = self._make_compressor(dict_id)
+        logger.info(f"🗜️  Diccionario zstd {dict_id} entrenado con {len(pages)} páginas")
+
+    def retrain(self):
+        """Entrena un diccionario nuevo con las páginas recientes (ej: cambió el marcado del sitio)"""
+        with self._lock, file_lock(self.lock_path):
+            self._refresh()
+            if len(self._entries):
+                self._train_dictionary()
+
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+    def _read(self, position: int) -> bytes:
+        """HTML (bytes) de una entrada; descomprime directo desde el archivo mapeado"""
+        with self._lock:
+            entry = self._entries[position]
+            start = int(entry['offset']) + int(entry['url_size'])
+            end = start + int(entry['comp_size'])
+            view = memoryview(self._data(end))[start:end]
+            try:
+                return self._decompressor(int(entry['dict_id'])).decompress(
+                    view, max_output_size=int(entry['raw_size']))
+            finally:
+                view.release()
+
+    def entry(self, position: int) -> Dict:
+        """Metadatos de una entrada: url, kind, timestamp, tamaños"""
+        with self._lock:
+            entry = self._entries[position]
+            offset = int(entry['offset'])
+            end = offset + int(entry['url_size'])
+            url = self._data(end)[offset:end].decode('utf-8')
+        return {
+            'position': position,
+            'url': url,
+            'kind': KIND_NAMES.get(int(entry['kind']), ''),
+            'timestamp': float(entry['timestamp']),
+            'raw_size': int(entry['raw_size']),
+            'comp_size': int(entry['comp_size']),
+        }
+
+    def find(self, url: str, at: Optional[float] = None) -> Optional[int]:
+        """
+        Posición de la versión más reciente de una URL (O(1) por hash)
+
+        Args:
+            url: URL de la página
+            at: Si se indica, la versión más reciente descargada en o antes de este timestamp
+
+        Returns:
+            Posición en el índice, o None si no está
+        """
+        self._refresh()
+        best = None
+        for position in self._by_url.get(url_hash(url), ()):
+            timestamp = float(self._entries[position]['timestamp'])
+            if at is not None and timestamp > at:
+                continue
+            if self.entry(position)['url'] != url:
+                continue
+            if best is None or timestamp >= float(self._entries[best]['timestamp']):
+                best = position
+        return best
+
+    def get(self, url: str, at: Optional[float] = None) -> Optional[str]:
+        """
+        HTML de una URL (versión más reciente, o la vigente en 'at')
+
+        Returns:
+            HTML, o None si la URL no está archivada
+        """
+        position = self.find(url, at)
+        return None if position is None else self._read(position).decode('utf-8')
+
+    def iter_entries(self, kind: Optional[str] = None, since: Optional[float] = None,
+                     until: Optional[float] = None) -> Iterator[Tuple[int, Dict]]:
+        """
+        Recorre las entradas (filtradas con numpy sobre el índice mapeado)
+
+        Args:
+            kind: Solo un tipo de página
+            since: Timestamp mínimo
+            until: Timestamp máximo
+
+        Yields:
+            Tuplas (posición, metadatos)
+        """
+        for position in self.select(kind, since, until).tolist():
+            yield position, self.entry(position)
+
+    def select(self, kind: Optional[str] = None, since: Optional[float] = None,
+               until: Optional[float] = None, latest_only: bool = False) -> np.ndarray:
+        """
+        Posiciones de las entradas que cumplen los filtros (vectorizado sobre el índice)
+
+        Args:
+            kind: Solo un tipo de página
+            since: Timestamp mínimo
+            until: Timestamp máximo
+            latest_only: Solo la versión más reciente de cada URL dentro del filtro
+
+        Returns:
+            Arreglo de posiciones en orden de archivo
+        """
+        self._refresh()
+        mask = np.ones(len(self._entries), dtype=bool)
+        if kind is not None:
+            mask &= self._entries['kind'] == KINDS[kind]
+        if since is not None:
+            mask &= self._entries['timestamp'] >= since
+        if until is not None:
+            mask &= self._entries['timestamp'] <= until
+        positions = np.flatnonzero(mask)
+        if latest_only and len(positions):
+            # Orden estable por fecha; la última aparición de cada hash es la más reciente
+            order = positions[np.argsort(self._entries['timestamp'][positions], kind='stable')][::-1]
+            _, first = np.unique(self._entries['url_hash'][order], return_index=True)
+            positions = np.sort(order[first])
+        return positions
+
+    def read(self, position: int) -> str:
+        """HTML de una entrada por posición"""
+        return self._read(position).decode('utf-8')
+
+    def stats(self) -> Dict:
+        """Páginas, tamaño original, tamaño comprimido y proporción"""
+        self._refresh()
+        raw = int(self._entries['raw_size'].sum()) if len(self._entries) else 0
+        compressed = int(self._entries['comp_size'].sum()) if len(self._entries) else 0
+        return {
+            'pages': len(self._entries),
+            'raw_bytes': raw,
+            'compressed_bytes': compressed,
+            'ratio': compressed / raw if raw else 0.0,
+            'dictionaries': len(self.dictionaries),
+        }
+
+    def close(self):
+        with self._lock:
+            self._data_file.close()
+            self._index_file.close()
+            if self._data_map is not None:
+                self._data_map.close()
+                self._data_map = None
+
+
+def archive_page(url: str, html: str, kind: str):
+    """
+    Guarda una página en el archivo compartido (no interrumpe el scraping si falla)
+
+    Args:
+        url: URL de la página
+        html: HTML completo
+        kind: Tipo de página (ver KINDS)
+    """
+    if not Config.PAGE_ARCHIVE_ENABLED or not html:
+        return
+    try:
+        PageArchive.shared().append(url, html, kind)
+    except Exception as e:
+        logger.warning(f"No se pudo archivar {url}: {e}")
@@ -0,0 +1,303 @@
+"""
+Historial de precios columnar (Parquet) acumulado entre ejecuciones
+
+Cada ejecución agrega un archivo Parquet particionado por término de búsqueda
+y fecha (estilo Hive: search_term=<slug>/date=YYYY-MM-DD/). Los archivos se
+escriben ordenados por listing_id con grupos de filas pequeños, de modo que las
+consultas por publicación solo leen los grupos cuyas estadísticas coinciden.
+"""
+import os
+import glob
+import uuid
+import logging
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Sequence
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from config import Config
+from file_lock import file_lock
+from utils import extract_listing_id, slugify
+
+logger = logging.getLogger(__name__)
+
+
+HISTORY_SCHEMA = pa.schema([
+    ('listing_id', pa.string()),
+    ('price_value', pa.float64()),
+    ('title', pa.string()),
+    ('location', pa.string()),
+    ('url', pa.string()),
+    ('scraped_at', pa.timestamp('s')),
+    ('run_at', pa.timestamp('s')),
+])
+
+PARTITION_SCHEMA = pa.schema([
+    ('search_term', pa.string()),
+    ('date', pa.string()),
+])
+
+# Filas por grupo: grupos pequeños permiten descartar bloques por estadísticas min/max
+ROW_GROUP_SIZE = 8192
+# Lock de compactación por partición (el prefijo "_" lo oculta de los datasets)
+COMPACT_LOCK = "_compact.lock"
+
+
+def _parse_scraped_at(value, default: datetime) -> datetime:
+    """Convierte el campo scraped_at de un producto a datetime"""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value)
+    if value:
+        try:
+            return datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            pass
+    return default
+
+
+class PriceHistoryStore:
+    """Almacén de historial de precios particionado por búsqueda y fecha"""
+
+    def __init__(self, base_dir: Optional[str] = None):
+        """
+        Inicializa el almacén
+
+        Args:
+            base_dir: Directorio raíz del historial (usa Config.PRICE_HISTORY_DIR por defecto)
+        """
+        self.base_dir = base_dir or Config.PRICE_HISTORY_DIR
+        os.makedirs(self.base_dir, exist_ok=True)
+
+    def _partition_dir(self, search_term: str, date: str) -> str:
+        """Ruta de la partición para un término y una fecha"""
+        return os.path.join(self.base_dir, f"search_term={slugify(search_term)}", f"date={date}")
+
+    def append_run(self, products: List[Dict[str, Any]], search_term: str,
+                   run_at: Optional[datetime] = None) -> Optional[str]:
+        """
+        Agrega los productos de una ejecución al historial
+
+        Args:
+            products: Productos extraídos (deben tener 'url' y 'price_value')
+            search_term: Término de búsqueda de la ejecución
+            run_at: Momento de la ejecución (ahora por defecto)
+
+        Returns:
+            Ruta del archivo Parquet escrito, o None si no había filas válidas
+        """
+        run_at = (run_at or datetime.now()).replace(microsecond=0)
+
+        rows = []
+        for product in products:
+            listing_id = extract_listing_id(product.get('url', ''))
+            if not listing_id:
+                continue
+            price_value = product.get('price_value')
+            rows.append((
+                listing_id,
+                float(price_value) if price_value is not None else None,
+                product.get('title') or '',
+                product.get('location') or '',
+                product.get('url') or '',
+                _parse_scraped_at(product.get('scraped_at'), run_at),
+            ))
+
+        if not rows:
+            logger.warning("No hay productos con ID válido para el historial de precios")
+            return None
+
+        rows.sort(key=lambda r: r[0])
+        columns = list(zip(*rows))
+        table = pa.table({
+            'listing_id': pa.array(columns[0], pa.string()),
+            'price_value': pa.array(columns[1], pa.float64()),
+            'title': pa.array(columns[2], pa.string()),
+            'location': pa.array(columns[3], pa.string()),
+            'url': pa.array(columns[4], pa.string()),
+            'scraped_at': pa.array(columns[5], pa.timestamp('s')),
+            'run_at': pa.array([run_at] * len(rows), pa.timestamp('s')),
+        }, schema=HISTORY_SCHEMA)
+
+        partition_dir = self._partition_dir(search_term, run_at.strftime("%Y-%m-%d"))
+        os.makedirs(partition_dir, exist_ok=True)
+        filepath = os.path.join(partition_dir, f"run_{run_at.strftime('%H%M%S')}_{uuid.uuid4().hex[:8]}.parquet")
+        pq.write_table(table, filepath, row_group_size=ROW_GROUP_SIZE, compression='zstd')
+
+        logger.info(f"📈 Historial de precios: {len(rows)} filas agregadas en {partition_dir}")
+
+        # Muchos archivos pequeños vuelven lentas las consultas: fusionar la partición
+        limit = Config.PRICE_HISTORY_COMPACT_FILES
+        if limit and len(glob.glob(os.path.join(partition_dir, "*.parquet"))) > limit:
+            try:
+                if self._compact_partition(partition_dir):
+                    filepath = os.path.join(partition_dir, "compacted.parquet")
+                    logger.info(f"📈 Partición compactada: {partition_dir}")
+            except Exception as e:
+                logger.error(f"Error compactando el historial de precios: {e}")
+        return filepath
+
+    def _dataset(self) -> Optional[ds.Dataset]:
+        """Abre el dataset completo (None si todavía no hay datos)"""
+        if not glob.glob(os.path.join(self.base_dir, "search_term=*", "date=*", "*.parquet")):
+            return None
+        return ds.dataset(self.base_dir, format='parquet', schema=HISTORY_SCHEMA.append(
+            PARTITION_SCHEMA.field('search_term')).append(PARTITION_SCHEMA.field('date')),
+            partitioning=ds.partitioning(PARTITION_SCHEMA, flavor='hive'))
+
+    def _build_filter(self, search_term: Optional[str] = None, since: Optional[str] = None,
+                      until: Optional[str] = None):
+        """Construye el filtro de particiones (término y rango de fechas YYYY-MM-DD)"""
+        expression = None
+        conditions = []
+        if search_term:
+            conditions.append(ds.field('search_term') == slugify(search_term))
+        if since:
+            conditions.append(ds.field('date') >= since)
+        if until:
+            conditions.append(ds.field('date') <= until)
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        return expression
+
+    def load_table(self, columns: Optional[Sequence[str]] = None, search_term: Optional[str] = None,
+                   since: Optional[str] = None, until: Optional[str] = None) -> pa.Table:
+        """
+        Lee el historial (o parte de él) como tabla Arrow
+
+        Args:
+            columns: Columnas a leer (todas por defecto)
+            search_term: Limitar a un término de búsqueda
+            since: Fecha mínima YYYY-MM-DD (inclusive)
+            until: Fecha máxima YYYY-MM-DD (inclusive)
+
+        Returns:
+            Tabla Arrow (vacía si no hay historial)
+        """
+        dataset = self._dataset()
+        if dataset is None:
+            return HISTORY_SCHEMA.empty_table()
+        return dataset.to_table(columns=list(columns) if columns else None,
+                                filter=self._build_filter(search_term, since, until))
+
+    def get_trajectory(self, listing_id: str, search_term: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Devuelve la trayectoria de precio de una publicación
+
+        Args:
+            listing_id: ID de la publicación (o URL de OfferUp)
+            search_term: Limitar a un término de búsqueda (más rápido)
+
+        Returns:
+            Lista de puntos {'scraped_at', 'price_value', 'search_term'} ordenada por fecha,
+            sin repetir observaciones del mismo momento
+        """
+        dataset = self._dataset()
+        if dataset is None:
+            return []
+
+        listing_id = extract_listing_id(listing_id) if '/' in listing_id else listing_id
+        expression = ds.field('listing_id') == listing_id
+        partition_filter = self._build_filter(search_term)
+        if partition_filter is not None:
+            expression = expression & partition_filter
+
+        table = dataset.to_table(columns=['scraped_at', 'price_value', 'search_term'], filter=expression)
+        if table.num_rows == 0:
+            return []
+
+        table = table.sort_by([('scraped_at', 'ascending')])
+        trajectory = []
+        last_seen = None
+        for point in table.to_pylist():
+            if point['scraped_at'] == last_seen:
+                continue
+            last_seen = point['scraped_at']
+            trajectory.append(point)
+        return trajectory
+
+    def market_percentiles(self, search_term: str, percentiles: Sequence[float] = (10, 25, 50, 75, 90),
+                           since: Optional[str] = None, until: Optional[str] = None,
+                           latest_only: bool = False) -> Dict[str, Any]:
+        """
+        Calcula percentiles de precio del mercado para un término de búsqueda
+
+        Args:
+            search_term: Término de búsqueda
+            percentiles: Percentiles a calcular (0-100)
+            since: Fecha mínima YYYY-MM-DD (inclusive)
+            until: Fecha máxima YYYY-MM-DD (inclusive)
+            latest_only: Si True, usa solo el último precio de cada publicación para que
+                las vistas en muchas ejecuciones no pesen más (lee más columnas, es más lento)
+
+        Returns:
+            Diccionario {'count': n, 'p10': ..., 'p50': ...}
+        """
+        columns = ['listing_id', 'price_value', 'scraped_at'] if latest_only else ['price_value']
+        table = self.load_table(columns=columns, search_term=search_term, since=since, until=until)
+        table = table.filter(pc.is_valid(table['price_value']))
+        if table.num_rows == 0:
+            return {'count': 0}
+
+        if latest_only:
+            latest = table.group_by('listing_id').aggregate([('scraped_at', 'max')])
+            table = table.join(latest, keys=['listing_id', 'scraped_at'],
+                               right_keys=['listing_id', 'scraped_at_max'], join_type='inner')
+
+        values = pc.quantile(table['price_value'], q=[p / 100 for p in percentiles],
+                             interpolation='linear').to_pylist()
+        result = {'count': table.num_rows}
+        for p, value in zip(percentiles, values):
+            result[f"p{p:g}"] = value
+        return result
+
+    def compact(self, search_term: Optional[str] = None) -> int:
+        """
+        Fusiona los archivos de cada partición en uno solo ordenado por listing_id
+
+        Args:
+            search_term: Compactar solo este término (todos por defecto)
+
+        Returns:
+            Número de particiones compactadas
+        """
+        pattern = f"search_term={slugify(search_term)}" if search_term else "search_term=*"
+        compacted = 0
+        for partition_dir in glob.glob(os.path.join(self.base_dir, pattern, "date=*")):
+            if self._compact_partition(partition_dir):
+                compacted += 1
+        logger.info(f"Particiones compactadas: {compacted}")
+        return compacted
+
+    def _compact_partition(self, partition_dir: str) -> bool:
+        """
+        Fusiona los archivos de una partición en compacted.parquet
+
+        El archivo fusionado reemplaza al anterior antes de borrar los de cada
+        ejecución: un corte a la mitad deja filas repetidas (se eliminan en la
+        próxima compactación), nunca una partición vacía.
+
+        Returns:
+            True si había algo que fusionar
+        """
+        with file_lock(os.path.join(partition_dir, COMPACT_LOCK)):
+            files = sorted(glob.glob(os.path.join(partition_dir, "*.parquet")))
+            if len(files) < 2:
+                return False
+            table = pa.concat_tables([pq.read_table(f, schema=HISTORY_SCHEMA) for f in files])
+            # Filas repetidas de una compactación interrumpida
+            table = table.group_by(HISTORY_SCHEMA.names, use_threads=False).aggregate([])
+            table = table.select(HISTORY_SCHEMA.names).cast(HISTORY_SCHEMA)
+            table = table.sort_by([('listing_id', 'ascending'), ('scraped_at', 'ascending')])
+            target = os.path.join(partition_dir, "compacted.parquet")
+            tmp_target = os.path.join(partition_dir, "_compacted.tmp")
+            pq.write_table(table, tmp_target, row_group_size=ROW_GROUP_SIZE, compression='zstd')
+            os.replace(tmp_target, target)
+            for f in files:
+                if f != target:
+                    os.remove(f)
+        return True
@@ -0,0 +1,144 @@
+"""
+Registro compacto de producto con __slots__
+
+Un dict por producto con una docena de claves ocupa ~1 KB; en ejecuciones
+grandes todos viven en all_products hasta el final. ProductRecord guarda los
+campos fijos en slots, comparte (interna) las cadenas que se repiten entre
+productos (ubicación, condición, vendedor, precio), guarda de la URL solo el
+ID de la publicación, las imágenes en una tupla y la fecha como entero. Se
+comporta como un dict (product['title'], product.get(...), dict(product)) y
+admite campos extra (cluster_id, matched_rules...); solo se convierte a dict
+real al exportar.
+"""
+import sys
+import time
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+# Campos fijos en el orden de exportación
+FIELDS = ("index", "url", "title", "price", "price_value", "description", "condition",
+          "location", "seller_name", "posted_date", "images", "scraped_at")
+
+# Campos de texto con pocos valores distintos: se internan para compartir la cadena
+INTERNED_FIELDS = frozenset(("price", "condition", "location", "seller_name", "posted_date"))
+
+SCRAPED_AT_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Las URLs canónicas de OfferUp se guardan solo con el ID de la publicación
+ITEM_URL_PREFIX = "https://offerup.com/item/detail/"
+
+_DEFAULTS = {"index": 0, "url": "", "title": "", "price": "", "price_value": None, "description": "",
+             "condition": "", "location": "", "seller_name": "", "posted_date": "", "images": (),
+             "scraped_at": None}
+
+
+class ProductRecord(MutableMapping):
+    """Producto con campos en __slots__ y acceso tipo dict"""
+
+    __slots__ = FIELDS + ("_extra",)
+
+    def __init__(self, url: str = "", index: int = 0, **fields):
+        """
+        Args:
+            url: URL del producto
+            index: Índice del producto
+            **fields: Otros campos (fijos o extra)
+        """
+        for name, default in _DEFAULTS.items():
+            setattr(self, name, default)
+        self._extra: Optional[Dict[str, Any]] = None
+        self.index = index
+        self["url"] = url
+        self.scraped_at = int(time.time())
+        for key, value in fields.items():
+            self[key] = value
+
+    # ------------------------------------------------------------------
+    # Protocolo de mapeo
+    # ------------------------------------------------------------------
+    def __getitem__(self, key: str) -> Any:
+        if key in _DEFAULTS:
+            value = getattr(self, key)
+            if key == "scraped_at" and isinstance(value, int):
+                return time.strftime(SCRAPED_AT_FORMAT, time.localtime(value))
+            if key == "url" and value and "/" not in value:
+                return ITEM_URL_PREFIX + value
+            return value
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any):
+        if key in _DEFAULTS:
+            if key in INTERNED_FIELDS and isinstance(value, str):
+                value = sys.intern(value)
+            elif key == "url" and isinstance(value, str) and value.startswith(ITEM_URL_PREFIX) \
+                    and "/" not in value[len(ITEM_URL_PREFIX):]:
+                value = value[len(ITEM_URL_PREFIX):]
+            elif key == "images":
+                value = tuple(value or ())
+            elif key == "scraped_at" and isinstance(value, str):
+                try:
+                    value = int(time.mktime(time.strptime(value, SCRAPED_AT_FORMAT)))
+                except ValueError:
+                    pass
+            setattr(self, key, value)
+            return
+        if self._extra is None:
+            self._extra = {}
+        self._extra[key] = value
+
+    def __delitem__(self, key: str):
+        if key in _DEFAULTS:
+            setattr(self, key, _DEFAULTS[key])
+            return
+        if self._extra is None or key not in self._extra:
+            raise KeyError(key)
+        del self._extra[key]
+
+    def __iter__(self) -> Iterator[str]:
+        yield from FIELDS
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return len(FIELDS) + (len(self._extra) if self._extra else 0)
+
+    def __contains__(self, key) -> bool:
+        return key in _DEFAULTS or (self._extra is not None and key in self._extra)
+
+    def __repr__(self):
+        return f"ProductRecord({self.to_dict()!r})"
+
+    # ------------------------------------------------------------------
+    # Exportación
+    # ------------------------------------------------------------------
+    def to_dict(self) -> Dict[str, Any]:
+        """Dict real (con imágenes como lista) para exportar"""
+        data = {key: self[key] for key in FIELDS}
+        data["images"] = list(self.images)
+        if self._extra:
+            data.update(self._extra)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ProductRecord':
+        """Crea un registro desde un dict (ej: leído de la caché)"""
+        record = cls(data.get("url", ""), data.get("index", 0))
+        for key, value in data.items():
+            record[key] = value
+        return record
+
+
+def as_dicts(products: Iterable[Any]) -> Iterator[Dict[str, Any]]:
+    """
+    Recorre productos como dicts, convirtiendo un registro a la vez
+
+    Args:
+        products: Lista de ProductRecord y/o dicts
+
+    Yields:
+        Diccionario de cada producto
+    """
+    for product in products:
+        yield product.to_dict() if isinstance(product, ProductRecord) else product
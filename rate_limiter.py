@@ -0,0 +1,178 @@
+"""
+Límite de velocidad compartido por dominio (token bucket)
+
+Reemplaza las pausas fijas repartidas por el código (2 s entre empresas,
+0.5 s entre imágenes, 1-2 s alrededor de cada navegación). Cada dominio
+tiene un "balde" con capacidad burst que se rellena a rate fichas por
+segundo; cada petición toma una ficha y solo espera si el balde está vacío.
+Varios hilos que comparten un dominio salen exactamente al ritmo permitido
+(cada uno reserva su turno y duerme fuera del lock), en lugar de dormir cada
+uno por su cuenta.
+
+Configuración:
+    RATE_LIMIT_PER_SECOND / RATE_LIMIT_BURST: valores por defecto de cada dominio
+    RATE_LIMITS: "offerup.com=0.5:2,images.offerup.com=8:16" (dominio=ritmo:ráfaga;
+        se aplica también a sus subdominios; 0 = sin límite)
+"""
+import time
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Balde de fichas seguro entre hilos"""
+
+    def __init__(self, rate: float, burst: float = 1.0):
+        """
+        Args:
+            rate: Fichas por segundo (0 = sin límite)
+            burst: Capacidad del balde (peticiones seguidas sin esperar)
+        """
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.waited = 0.0
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """
+        Toma fichas (el balde puede quedar en negativo: turnos reservados)
+
+        Returns:
+            Segundos que hay que esperar antes de hacer la petición
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= tokens
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            self.acquired += 1
+            self.waited += wait
+            return wait
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """
+        Espera su turno
+
+        Returns:
+            Segundos esperados
+        """
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+def domain_of(url: str) -> str:
+    """Dominio de una URL (sin www. ni puerto); acepta también un dominio suelto"""
+    netloc = urlparse(url).netloc if '://' in url else url.split('/')[0]
+    netloc = netloc.split('@')[-1].split(':')[0].lower()
+    return netloc[4:] if netloc.startswith('www.') else netloc
+
+
+def parse_limits(text: str) -> Dict[str, Tuple[float, float]]:
+    """Convierte "dominio=ritmo:ráfaga,..." en {dominio: (ritmo, ráfaga)}"""
+    limits = {}
+    for item in text.split(','):
+        domain, _, value = item.partition('=')
+        if not domain.strip() or not value.strip():
+            continue
+        rate, _, burst = value.partition(':')
+        limits[domain_of(domain.strip())] = (float(rate), float(burst or Config.RATE_LIMIT_BURST))
+    return limits
+
+
+class RateLimiter:
+    """Baldes por dominio (uno por dominio configurado, o por host si no está configurado)"""
+
+    def __init__(self, limits: Optional[Dict[str, Tuple[float, float]]] = None,
+                 default_rate: Optional[float] = None, default_burst: Optional[float] = None,
+                 share: float = 1.0):
+        """
+        Args:
+            limits: {dominio: (ritmo, ráfaga)} (default: Config.RATE_LIMITS)
+            default_rate: Ritmo de los dominios no listados (default: Config.RATE_LIMIT_PER_SECOND)
+            default_burst: Ráfaga de los dominios no listados (default: Config.RATE_LIMIT_BURST)
+            share: Fracción del ritmo para este proceso (ej: 1/4 en cada uno de 4
+                procesos de un pool, así el total respeta el límite)
+        """
+        self.limits = parse_limits(Config.RATE_LIMITS) if limits is None else limits
+        self.default_rate = Config.RATE_LIMIT_PER_SECOND if default_rate is None else default_rate
+        self.default_burst = Config.RATE_LIMIT_BURST if default_burst is None else default_burst
+        self.share = share
+        self.buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def _rule(self, domain: str) -> Tuple[str, float, float]:
+        """Regla más específica que cubre el dominio (el dominio mismo o un dominio padre)"""
+        parts = domain.split('.')
+        for i in range(len(parts) - 1):
+            candidate = '.'.join(parts[i:])
+            if candidate in self.limits:
+                rate, burst = self.limits[candidate]
+                return candidate, rate, burst
+        return domain, self.default_rate, self.default_burst
+
+    def bucket(self, url: str) -> TokenBucket:
+        """Balde que corresponde a una URL o dominio"""
+        key, rate, burst = self._rule(domain_of(url))
+        with self._lock:
+            if key not in self.buckets:
+                self.buckets[key] = TokenBucket(rate * self.share, burst * self.share)
+            return self.buckets[key]
+
+    def wait(self, url: str) -> float:
+        """
+        Espera el turno del dominio de url
+
+        Returns:
+            Segundos esperados
+        """
+        return self.bucket(url).acquire()
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Peticiones y espera total por dominio"""
+        with self._lock:
+            return {key: {'requests': b.acquired, 'waited_seconds': round(b.waited, 2), 'rate': b.rate}
+                    for key, b in self.buckets.items()}
+
+    def log_stats(self):
+        for key, stat in sorted(self.stats().items()):
+            logger.info(f"🚦 {key}: {stat['requests']} peticiones, {stat['waited_seconds']}s de espera "
+                        f"({stat['rate']:g}/s)")
+
+
+_shared: Optional[RateLimiter] = None
+_shared_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Limitador compartido del proceso"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = RateLimiter()
+        return _shared
+
+
+def set_process_share(share: float):
+    """Inicializador de pools de procesos: este proceso usa solo una fracción del ritmo"""
+    global _shared
+    with _shared_lock:
+        _shared = RateLimiter(share=share)
+
+
+def throttle(url: str) -> float:
+    """Atajo: espera el turno del dominio de url en el limitador compartido"""
+    return get_rate_limiter().wait(url)
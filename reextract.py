@@ -0,0 +1,240 @@
+"""
+Re-extracción de datos desde el archivo de páginas (sin red)
+
+Vuelve a correr los extractores actuales (detalle y tarjetas de OfferUp,
+directivos de sitios de empresas) sobre las páginas guardadas en
+page_archive, repartiendo el trabajo entre todos los núcleos con un pool de
+procesos. Sirve para rellenar campos después de corregir un selector sin
+volver a descargar nada.
+
+Uso:
+    python reextract.py [--kind offerup_detail] [--since 2026-01-01] [--until 2026-03-31]
+                        [--workers 8] [--all-versions] [--output data/reextract]
+"""
+import os
+import time
+import logging
+import argparse
+from datetime import datetime
+from multiprocessing import Pool
+from typing import Dict, List, Optional, Sequence
+from urllib.parse import urlparse
+
+from bs4 import BeautifulSoup
+
+from config import Config
+from page_archive import PageArchive
+from utils import save_to_json
+
+logger = logging.getLogger(__name__)
+
+
+# Tipos de página con extractor
+EXTRACTABLE_KINDS = ('offerup_detail', 'offerup_results', 'company')
+# Páginas por tarea del pool (reparto parejo sin mucho costo de comunicación)
+CHUNK_SIZE = 32
+
+# Estado de cada proceso del pool
+_archive: Optional[PageArchive] = None
+_executives_scraper = None
+
+
+def _init_worker(directory: str):
+    """Abre el archivo de páginas en cada proceso del pool"""
+    global _archive
+    _archive = PageArchive(directory)
+
+
+def _archived_at(entry: Dict) -> str:
+    return datetime.fromtimestamp(entry['timestamp']).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _extract_detail(html: str, entry: Dict) -> List[Dict]:
+    from offerup_detailed_scraper import parse_product_html
+    product = parse_product_html(html, entry['url'])
+    product['scraped_at'] = _archived_at(entry)
+    return [product.to_dict()]
+
+
+def _extract_cards(html: str, entry: Dict) -> List[Dict]:
+    from offerup_detailed_scraper import parse_results_html
+    cards = []
+    for card in parse_results_html(html):
+        card['scraped_at'] = _archived_at(entry)
+        card['results_url'] = entry['url']
+        cards.append(card.to_dict())
+    return cards
+
+
+def _company_name(html: str, url: str) -> str:
+    """
+    Nombre de la empresa desde la página guardada
+
+    El archivo solo guarda URL y HTML; en vivo el nombre viene del título del
+    resultado de Google, así que aquí se usa el del propio sitio (og:site_name
+    o <title>) y, si no hay, el dominio. Puede no coincidir con el de la
+    extracción original.
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    site_name = soup.find('meta', attrs={'property': 'og:site_name'})
+    if site_name and site_name.get('content', '').strip():
+        return site_name['content'].strip()
+    if soup.title and soup.title.string and soup.title.string.strip():
+        return soup.title.string.strip()
+    return urlparse(url).netloc.replace('www.', '')
+
+
+def _extract_company(html: str, entry: Dict) -> List[Dict]:
+    global _executives_scraper
+    if _executives_scraper is None:
+        from tijuana_executives_scraper import TijuanaExecutivesScraper
+        _executives_scraper = TijuanaExecutivesScraper(headless=True)
+    executives = _executives_scraper.extract_executives_from_html(
+        html, {'name': _company_name(html, entry['url']), 'url': entry['url']})
+    for executive in executives:
+        executive['extracted_date'] = _archived_at(entry)
+    return executives
+
+
+EXTRACTORS = {
+    'offerup_detail': _extract_detail,
+    'offerup_results': _extract_cards,
+    'company': _extract_company,
+}
+
+
+def _extract_chunk(positions: Sequence[int]) -> Dict:
+    """
+    Tarea del pool: extrae un grupo de páginas
+
+    Returns:
+        Diccionario con 'results' (tipo -> [(posición, registros)]), 'pages',
+        'bytes' y 'errors'
+    """
+    results: Dict[str, list] = {}
+    raw_bytes = 0
+    errors = 0
+    for position in positions:
+        entry = _archive.entry(position)
+        try:
+            html = _archive.read(position)
+            raw_bytes += entry['raw_size']
+            records = EXTRACTORS[entry['kind']](html, entry)
+        except Exception as e:
+            logger.warning(f"Error re-extrayendo {entry['url']}: {e}")
+            errors += 1
+            continue
+        results.setdefault(entry['kind'], []).append((position, records))
+    return {'results': results, 'pages': len(positions), 'bytes': raw_bytes, 'errors': errors}
+
+
+def _parse_date(value: Optional[str], end_of_day: bool = False) -> Optional[float]:
+    if not value:
+        return None
+    date = datetime.strptime(value, "%Y-%m-%d")
+    if end_of_day:
+        date = date.replace(hour=23, minute=59, second=59)
+    return date.timestamp()
+
+
+def run_reextract(kinds: Optional[Sequence[str]] = None, since: Optional[str] = None,
+                  until: Optional[str] = None, workers: Optional[int] = None,
+                  latest_only: bool = True, output_dir: Optional[str] = None,
+                  archive_dir: Optional[str] = None) -> Dict:
+    """
+    Vuelve a extraer las páginas archivadas y guarda los resultados
+
+    Args:
+        kinds: Tipos de página a procesar (default: todos los que tienen extractor)
+        since: Fecha mínima YYYY-MM-DD de descarga
+        until: Fecha máxima YYYY-MM-DD de descarga
+        workers: Procesos del pool (default: todos los núcleos)
+        latest_only: Solo la versión más reciente de cada URL
+        output_dir: Carpeta de salida (default: <OUTPUT_DIR>/reextract_<fecha>)
+        archive_dir: Directorio del archivo de páginas (default: Config.PAGE_ARCHIVE_DIR)
+
+    Returns:
+        Resumen con páginas, registros por tipo, errores, segundos y páginas por segundo
+    """
+    archive_dir = archive_dir or Config.PAGE_ARCHIVE_DIR
+    kinds = list(kinds or EXTRACTABLE_KINDS)
+    for kind in kinds:
+        if kind not in EXTRACTORS:
+            raise ValueError(f"Sin extractor para el tipo de página: {kind}")
+    workers = workers or os.cpu_count() or 1
+
+    archive = PageArchive(archive_dir)
+    positions = []
+    for kind in kinds:
+        positions.extend(archive.select(kind, _parse_date(since), _parse_date(until, True), latest_only).tolist())
+    archive.close()
+    positions.sort()
+    if not positions:
+        logger.warning("No hay páginas archivadas que cumplan los filtros")
+        return {'pages': 0}
+
+    chunks = [positions[i:i + CHUNK_SIZE] for i in range(0, len(positions), CHUNK_SIZE)]
+    logger.info(f"♻️  Re-extrayendo {len(positions)} páginas ({', '.join(kinds)}) con {workers} procesos")
+
+    start = time.perf_counter()
+    collected: Dict[str, list] = {kind: [] for kind in kinds}
+    pages = raw_bytes = errors = 0
+    last_report = start
+    with Pool(processes=workers, initializer=_init_worker, initargs=(archive_dir,)) as pool:
+        for result in pool.imap_unordered(_extract_chunk, chunks):
+            for kind, items in result['results'].items():
+                collected[kind].extend(items)
+            pages += result['pages']
+            raw_bytes += result['bytes']
+            errors += result['errors']
+            now = time.perf_counter()
+            if now - last_report >= 5:
+                logger.info(f"   {pages}/{len(positions)} páginas ({pages / (now - start):.0f} páginas/s)")
+                last_report = now
+    elapsed = time.perf_counter() - start
+
+    output_dir = output_dir or os.path.join(Config.OUTPUT_DIR, f"reextract_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    os.makedirs(output_dir, exist_ok=True)
+    counts = {}
+    for kind, items in collected.items():
+        # Orden de archivo (el pool entrega los grupos en cualquier orden)
+        records = [record for _, batch in sorted(items, key=lambda item: item[0]) for record in batch]
+        counts[kind] = len(records)
+        if records:
+            save_to_json(records, os.path.join(output_dir, f"{kind}.json"))
+
+    summary = {
+        'pages': pages,
+        'records': counts,
+        'errors': errors,
+        'seconds': round(elapsed, 2),
+        'pages_per_second': round(pages / elapsed, 1) if elapsed else 0.0,
+        'mb_per_second': round(raw_bytes / 1e6 / elapsed, 1) if elapsed else 0.0,
+        'output_dir': output_dir,
+    }
+    logger.info(f"♻️  Re-extracción: {pages} páginas en {elapsed:.1f}s "
+                f"({summary['pages_per_second']} páginas/s, {summary['mb_per_second']} MB/s de HTML), "
+                f"{errors} errores")
+    for kind, count in counts.items():
+        logger.info(f"   {kind}: {count} registros")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-extrae datos de las páginas archivadas (sin red)")
+    parser.add_argument('--kind', action='append', choices=EXTRACTABLE_KINDS,
+                        help="Tipo de página (se puede repetir; default: todos)")
+    parser.add_argument('--since', help="Fecha mínima de descarga YYYY-MM-DD")
+    parser.add_argument('--until', help="Fecha máxima de descarga YYYY-MM-DD")
+    parser.add_argument('--workers', type=int, help="Procesos (default: todos los núcleos)")
+    parser.add_argument('--all-versions', action='store_true',
+                        help="Procesar todas las versiones de cada URL (default: solo la más reciente)")
+    parser.add_argument('--output', help="Carpeta de salida")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    run_reextract(args.kind, args.since, args.until, args.workers, not args.all_versions, args.output)
+
+
+if __name__ == "__main__":
+    main()
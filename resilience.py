@@ -0,0 +1,249 @@
+"""
+Reintentos con backoff y circuit breaker por dominio
+
+- Los errores se clasifican: los transitorios (timeouts, conexión cortada,
+  HTTP 429/5xx, errores de red del navegador) se reintentan con espera
+  exponencial con jitter; los definitivos (404, URL inválida...) no.
+- Cada dominio tiene un circuit breaker: tras CIRCUIT_FAILURE_THRESHOLD
+  fallos seguidos del sitio se abre y las siguientes peticiones fallan al
+  instante (CircuitOpenError) en lugar de esperar el timeout completo. Pasado
+  CIRCUIT_RESET_SECONDS deja pasar una sola petición de prueba: si funciona se
+  cierra, si no se vuelve a abrir por el doble de tiempo.
+
+Así una ejecución contra un sitio caído termina en segundos en lugar de
+acumular un timeout por cada elemento.
+"""
+import time
+import random
+import logging
+import threading
+from typing import Callable, Dict, Optional, Tuple, TypeVar
+
+import requests
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from config import Config
+from rate_limiter import domain_of, throttle
+from concurrency import request_sent
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# Estados HTTP que vale la pena reintentar
+RETRYABLE_STATUS = frozenset({408, 425, 429, 500, 502, 503, 504})
+# Errores de red de Chrome que suelen ser transitorios
+TRANSIENT_BROWSER_ERRORS = ('ERR_CONNECTION', 'ERR_TIMED_OUT', 'ERR_NETWORK', 'ERR_EMPTY_RESPONSE',
+                            'ERR_INTERNET_DISCONNECTED', 'ERR_HTTP2', 'ERR_SSL_PROTOCOL_ERROR')
+# Errores del navegador que indican que el sitio no responde (cuentan para el breaker)
+SITE_BROWSER_ERRORS = TRANSIENT_BROWSER_ERRORS + ('ERR_NAME_NOT_RESOLVED', 'ERR_ADDRESS_UNREACHABLE')
+
+
+class CircuitOpenError(Exception):
+    """El dominio tiene el circuito abierto: la petición no se intentó"""
+
+    def __init__(self, domain: str, retry_in: float):
+        super().__init__(f"Circuito abierto para {domain} (reintento en {retry_in:.0f}s)")
+        self.domain = domain
+        self.retry_in = retry_in
+
+
+class RetryableHTTPError(Exception):
+    """Respuesta HTTP transitoria (429/5xx)"""
+
+    def __init__(self, response: requests.Response):
+        super().__init__(f"HTTP {response.status_code} en {response.url}")
+        self.response = response
+
+
+def classify_error(error: BaseException) -> Tuple[bool, bool]:
+    """
+    Clasifica un error
+
+    Returns:
+        (reintentar, es fallo del sitio) — los fallos del sitio cuentan para
+        el circuit breaker
+    """
+    if isinstance(error, CircuitOpenError):
+        return False, False
+    if isinstance(error, RetryableHTTPError):
+        return True, True
+    if isinstance(error, (requests.Timeout, requests.ConnectionError)):
+        return True, True
+    if isinstance(error, TimeoutException):
+        return True, True
+    if isinstance(error, WebDriverException):
+        message = str(error)
+        transient = any(code in message for code in TRANSIENT_BROWSER_ERRORS)
+        return transient, transient or any(code in message for code in SITE_BROWSER_ERRORS)
+    return False, False
+
+
+def backoff_delay(attempt: int, base: Optional[float] = None, cap: Optional[float] = None) -> float:
+    """Espera antes del reintento attempt (1, 2, ...): exponencial con jitter completo"""
+    base = Config.RETRY_BASE_SECONDS if base is None else base
+    cap = Config.RETRY_MAX_SECONDS if cap is None else cap
+    return random.uniform(0, min(cap, base * (2 ** (attempt - 1))))
+
+
+class CircuitBreaker:
+    """Circuit breaker de un dominio (cerrado → abierto → medio abierto)"""
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, domain: str, failure_threshold: Optional[int] = None,
+                 reset_seconds: Optional[float] = None):
+        """
+        Args:
+            domain: Dominio
+            failure_threshold: Fallos seguidos que abren el circuito (default: Config.CIRCUIT_FAILURE_THRESHOLD)
+            reset_seconds: Segundos abierto antes de probar (default: Config.CIRCUIT_RESET_SECONDS)
+        """
+        self.domain = domain
+        self.failure_threshold = failure_threshold or Config.CIRCUIT_FAILURE_THRESHOLD
+        self.base_reset = Config.CIRCUIT_RESET_SECONDS if reset_seconds is None else reset_seconds
+        self.reset_seconds = self.base_reset
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.fast_failures = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Lanza CircuitOpenError si el circuito no deja pasar la petición"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            elapsed = time.monotonic() - self.opened_at
+            if self.state == self.OPEN and elapsed >= self.reset_seconds:
+                self.state = self.HALF_OPEN
+                self.probing = False
+            if self.state == self.HALF_OPEN and not self.probing:
+                # Una sola petición de prueba a la vez
+                self.probing = True
+                logger.info(f"🔌 {self.domain}: probando si el sitio se recuperó...")
+                return
+            self.fast_failures += 1
+            raise CircuitOpenError(self.domain, max(0.0, self.reset_seconds - elapsed))
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"🔌 {self.domain}: sitio recuperado, circuito cerrado")
+            self.state = self.CLOSED
+            self.failures = 0
+            self.probing = False
+            self.reset_seconds = self.base_reset
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN:
+                # La prueba falló: abierto otra vez, el doble de tiempo
+                self.reset_seconds = min(self.reset_seconds * 2, Config.CIRCUIT_MAX_RESET_SECONDS)
+                self._open()
+            elif self.state == self.CLOSED and self.failures >= self.failure_threshold:
+                self._open()
+
+    def _open(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.probing = False
+        logger.warning(f"🔌 {self.domain}: circuito abierto tras {self.failures} fallos "
+                       f"(siguiente prueba en {self.reset_seconds:.0f}s)")
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(url: str) -> CircuitBreaker:
+    """Circuit breaker compartido del dominio de url"""
+    domain = domain_of(url)
+    with _breakers_lock:
+        if domain not in _breakers:
+            _breakers[domain] = CircuitBreaker(domain)
+        return _breakers[domain]
+
+
+def call_with_retry(func: Callable[[], T], url: str, attempts: Optional[int] = None,
+                    description: str = "") -> T:
+    """
+    Ejecuta func con reintentos clasificados y el circuit breaker del dominio de url
+
+    Args:
+        func: Operación (una petición a url); se llama en cada intento
+        url: URL (define el dominio)
+        attempts: Intentos máximos (default: Config.RETRY_ATTEMPTS)
+        description: Texto para los logs
+
+    Returns:
+        Resultado de func
+
+    Raises:
+        CircuitOpenError si el dominio tiene el circuito abierto, o el último
+        error si se agotan los intentos o el error no es reintentable
+    """
+    attempts = attempts or Config.RETRY_ATTEMPTS
+    breaker = get_breaker(url)
+    for attempt in range(1, attempts + 1):
+        breaker.allow()
+        try:
+            result = func()
+        except Exception as e:
+            retry, site_failure = classify_error(e)
+            if site_failure:
+                breaker.record_failure()
+            else:
+                # El sitio respondió (ej: 404): no es un fallo del dominio
+                breaker.record_success()
+            if not retry or attempt == attempts:
+                raise
+            delay = backoff_delay(attempt)
+            if isinstance(e, RetryableHTTPError):
+                retry_after = e.response.headers.get('Retry-After', '')
+                if retry_after.isdigit():
+                    delay = min(float(retry_after), Config.RETRY_MAX_SECONDS)
+            logger.warning(f"🔁 {description or url}: {type(e).__name__} "
+                           f"(intento {attempt}/{attempts}, reintento en {delay:.1f}s)")
+            time.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
+
+
+def fetch(url: str, session: Optional[requests.Session] = None, **kwargs) -> requests.Response:
+    """
+    requests.get con límite de velocidad, reintentos y circuit breaker
+
+    Las respuestas 429/5xx se reintentan; las demás (incluido 404) se
+    devuelven para que el llamador revise status_code.
+
+    Args:
+        url: URL
+        session: Sesión HTTP a usar (conexiones reutilizadas); None = requests.get
+        **kwargs: Argumentos de get (timeout default: Config.REQUEST_TIMEOUT)
+
+    Raises:
+        CircuitOpenError, o el último error de red/HTTP si se agotan los intentos
+    """
+    kwargs.setdefault('timeout', Config.REQUEST_TIMEOUT)
+    client = session or requests
+
+    def attempt():
+        throttle(url)
+        request_sent()
+        response = client.get(url, **kwargs)
+        if response.status_code in RETRYABLE_STATUS:
+            raise RetryableHTTPError(response)
+        return response
+
+    return call_with_retry(attempt, url)
+
+
+def breaker_stats() -> Dict[str, Dict[str, object]]:
+    """Estado de los circuitos por dominio"""
+    with _breakers_lock:
+        return {domain: {'state': b.state, 'failures': b.failures, 'fast_failures': b.fast_failures}
+                for domain, b in _breakers.items()}
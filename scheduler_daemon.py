@@ -0,0 +1,556 @@
+"""
+Daemon de tareas programadas (multiplataforma)
+
+Reemplaza la tarea de Windows (schtasks + run_scheduled_scraper.bat): un solo
+proceso de Python lee las tareas de schedule_jobs.json, calcula cuándo toca
+cada una con expresiones tipo cron y las reparte a workers que se quedan
+"calientes" (intérprete, módulos y navegador ya cargados) entre ejecuciones.
+
+- Límite global de ejecuciones simultáneas (= número de workers) y límite por
+  dominio (ej: una sola búsqueda a la vez contra offerup.com).
+- Variación aleatoria (jitter) de cada disparo para no consultar a la hora exacta.
+- Recuperación de ejecuciones perdidas: al arrancar, si una tarea debió correr
+  mientras el daemon estaba apagado se ejecuta una vez (no una por cada
+  disparo perdido).
+- Una tarea no se traslapa consigo misma: si le toca de nuevo mientras corre,
+  se ejecuta una vez al terminar.
+- Estado persistente (data/scheduler_state.json) entre reinicios.
+
+Formato de schedule_jobs.json:
+    [
+      {"id": "iphone-sd", "cron": "0 8,20 * * *", "config": {"search_term": "iphone",
+       "zip_code": "92101", "min_price": 100, "max_price": 600, "max_items": 50,
+       "send_email": true, "recipient_email": "tu_email@gmail.com"}},
+      {"id": "reextraer", "kind": "reextract", "cron": "@weekly", "config": {"kinds": ["offerup_detail"]}}
+    ]
+
+Uso:
+    python scheduler_daemon.py [--jobs schedule_jobs.json] [--workers 2]
+    python offerup_detailed_scraper.py --daemon
+"""
+import os
+import json
+import queue
+import random
+import signal
+import logging
+import argparse
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, FrozenSet, Callable
+
+import offerup_detailed_scraper as offerup
+from config import Config
+from scraper import WebScraper
+
+logger = logging.getLogger(__name__)
+
+
+CRON_ALIASES = {
+    '@hourly': '0 * * * *',
+    '@daily': '0 0 * * *',
+    '@weekly': '0 0 * * 0',
+    '@monthly': '0 0 1 * *',
+}
+_MONTH_NAMES = {name: i + 1 for i, name in enumerate(
+    ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'])}
+_DAY_NAMES = {name: i for i, name in enumerate(['sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat'])}
+# Años que se revisan buscando el siguiente disparo ("0 0 29 2 *" puede tardar 8 años: 2096 -> 2104)
+_SEARCH_YEARS = 9
+
+STATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Disparos perdidos que se cuentan para el log al arrancar
+MISSED_COUNT_LIMIT = 1000
+
+
+class CronSpec:
+    """Expresión cron de 5 campos: minuto hora día-del-mes mes día-de-la-semana"""
+
+    def __init__(self, expression: str):
+        """
+        Args:
+            expression: Ej: "*/15 * * * *", "0 8,20 * * mon-fri", "@daily"
+        """
+        self.expression = expression
+        fields = CRON_ALIASES.get(expression.strip().lower(), expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Expresión cron inválida (se esperan 5 campos): {expression}")
+        self.minutes = self._parse_field(fields[0], 0, 59)
+        self.hours = self._parse_field(fields[1], 0, 23)
+        self.days = self._parse_field(fields[2], 1, 31)
+        self.months = self._parse_field(fields[3], 1, 12, _MONTH_NAMES)
+        # 7 también es domingo
+        self.weekdays = frozenset(d % 7 for d in self._parse_field(fields[4], 0, 7, _DAY_NAMES))
+        # Como en cron: si se restringen día del mes y de la semana, basta con uno
+        self.days_restricted = fields[2] != '*'
+        self.weekdays_restricted = fields[4] != '*'
+
+    @staticmethod
+    def _parse_field(text: str, low: int, high: int, names: Optional[Dict[str, int]] = None) -> FrozenSet[int]:
+        values = set()
+        for part in text.lower().split(','):
+            step = 1
+            if '/' in part:
+                part, step_text = part.split('/', 1)
+                step = int(step_text)
+            if part == '*':
+                start, end = low, high
+            elif '-' in part:
+                start_text, end_text = part.split('-', 1)
+                start = names.get(start_text) if names and start_text in names else int(start_text)
+                end = names.get(end_text) if names and end_text in names else int(end_text)
+            else:
+                start = names.get(part) if names and part in names else int(part)
+                end = high if step > 1 else start
+            if not low <= start <= end <= high or step < 1:
+                raise ValueError(f"Campo cron fuera de rango ({low}-{high}): {text}")
+            values.update(range(start, end + 1, step))
+        return frozenset(values)
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day_ok = moment.day in self.days
+        weekday_ok = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.days_restricted and self.weekdays_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def matches(self, moment: datetime) -> bool:
+        return (moment.minute in self.minutes and moment.hour in self.hours
+                and moment.month in self.months and self._day_matches(moment))
+
+    def next_after(self, moment: datetime) -> datetime:
+        """
+        Siguiente disparo estrictamente posterior a moment (resolución de minutos)
+
+        Salta meses, días y horas completos que no coinciden en lugar de
+        recorrer minuto por minuto.
+        """
+        current = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = current + timedelta(days=366 * _SEARCH_YEARS)
+        while current < limit:
+            if current.month not in self.months:
+                year, month = (current.year + 1, 1) if current.month == 12 else (current.year, current.month + 1)
+                current = current.replace(year=year, month=month, day=1, hour=0, minute=0)
+            elif not self._day_matches(current):
+                current = (current + timedelta(days=1)).replace(hour=0, minute=0)
+            elif current.hour not in self.hours:
+                current = (current + timedelta(hours=1)).replace(minute=0)
+            elif current.minute not in self.minutes:
+                current += timedelta(minutes=1)
+            else:
+                return current
+        raise ValueError(f"La expresión cron nunca se cumple: {self.expression}")
+
+    def last_between(self, start: datetime, end: datetime) -> Optional[datetime]:
+        """
+        Último disparo en (start, end], o None si no hay
+
+        Recorre hacia atrás desde end saltando meses, días y horas que no
+        coinciden (no depende de cuántos disparos hubo en el intervalo).
+        """
+        current = end.replace(second=0, microsecond=0)
+        while current > start:
+            if current.month not in self.months:
+                current = current.replace(day=1, hour=0, minute=0) - timedelta(minutes=1)
+            elif not self._day_matches(current):
+                current = current.replace(hour=0, minute=0) - timedelta(minutes=1)
+            elif current.hour not in self.hours:
+                current = current.replace(minute=0) - timedelta(minutes=1)
+            elif current.minute not in self.minutes:
+                current -= timedelta(minutes=1)
+            else:
+                return current
+        return None
+
+    def fires_between(self, start: datetime, end: datetime, limit: int = 1000) -> List[datetime]:
+        """Disparos en (start, end] (como máximo limit)"""
+        fires = []
+        current = self.next_after(start)
+        while current <= end and len(fires) < limit:
+            fires.append(current)
+            current = self.next_after(current)
+        return fires
+
+
+# Dominio de cada tipo de tarea (para el límite por dominio); None = sin red
+KIND_DOMAINS = {
+    'offerup': 'offerup.com',
+    'reextract': None,
+}
+
+
+@dataclass(frozen=True)
+class ScheduledJob:
+    """Tarea programada"""
+    job_id: str
+    cron: CronSpec
+    kind: str = 'offerup'
+    config: Dict[str, Any] = field(default_factory=dict, compare=False, hash=False)
+    domain: Optional[str] = None
+    jitter_seconds: float = 0.0
+    catch_up: bool = True
+    enabled: bool = True
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ScheduledJob':
+        """
+        Crea una tarea desde su forma guardada
+
+        Args:
+            data: Diccionario con 'id', 'cron' y opcionalmente 'kind' ('offerup'
+                o 'reextract'), 'config' (parámetros de la tarea), 'domain',
+                'jitter_seconds' (default: Config.SCHEDULER_JITTER_SECONDS),
+                'catch_up' (default: Config.SCHEDULER_CATCH_UP) y 'enabled'
+        """
+        if 'id' not in data or 'cron' not in data:
+            raise ValueError(f"Tarea sin 'id' o 'cron': {data}")
+        kind = data.get('kind', 'offerup')
+        if kind not in JOB_RUNNERS:
+            raise ValueError(f"Tipo de tarea desconocido: {kind}")
+        return cls(str(data['id']), CronSpec(data['cron']), kind, data.get('config', {}),
+                   data.get('domain', KIND_DOMAINS.get(kind)),
+                   float(data.get('jitter_seconds', Config.SCHEDULER_JITTER_SECONDS)),
+                   bool(data.get('catch_up', Config.SCHEDULER_CATCH_UP)),
+                   bool(data.get('enabled', True)))
+
+
+def load_jobs(path: Optional[str] = None) -> List[ScheduledJob]:
+    """
+    Carga las tareas programadas
+
+    Usa Config.SCHEDULE_JOBS_PATH y, si no existe, convierte la búsqueda diaria
+    de scheduled_config.json (schedule_time HH:MM) en una tarea.
+
+    Args:
+        path: Archivo JSON con la lista de tareas
+
+    Returns:
+        Tareas habilitadas
+    """
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    path = path or Config.SCHEDULE_JOBS_PATH
+    if not os.path.isabs(path):
+        path = os.path.join(base_dir, path)
+
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+    else:
+        entries = []
+        scheduled = os.path.join(base_dir, 'scheduled_config.json')
+        if os.path.exists(scheduled):
+            with open(scheduled, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+            if config.get('schedule_time'):
+                entries.append(daily_job(config))
+
+    jobs = [ScheduledJob.from_dict(entry) for entry in entries]
+    return [job for job in jobs if job.enabled]
+
+
+def daily_job(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Tarea diaria (forma guardada) a partir de una configuración con schedule_time HH:MM"""
+    hour, minute = (int(part) for part in config['schedule_time'].split(':'))
+    return {'id': f"offerup_{config['search_term'].replace(' ', '_')}",
+            'cron': f"{minute} {hour} * * *", 'config': config}
+
+
+def add_job(entry: Dict[str, Any], path: Optional[str] = None) -> str:
+    """
+    Agrega (o reemplaza por id) una tarea en el archivo de tareas
+
+    Returns:
+        Ruta del archivo de tareas
+    """
+    ScheduledJob.from_dict(entry)
+    path = path or Config.SCHEDULE_JOBS_PATH
+    if not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+    entries = []
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+    entries = [e for e in entries if str(e.get('id')) != str(entry['id'])] + [entry]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(entries, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def _run_offerup(job: ScheduledJob, worker: 'WarmWorker') -> Dict[str, Any]:
+    results = offerup.run_search_job(job.config, is_scheduled=True, browser=worker.get_browser())
+    return {'products': len(results or [])}
+
+
+def _run_reextract(job: ScheduledJob, worker: 'WarmWorker') -> Dict[str, Any]:
+    from reextract import run_reextract
+    summary = run_reextract(**job.config)
+    return {'pages': summary.get('pages', 0)}
+
+
+JOB_RUNNERS: Dict[str, Callable[[ScheduledJob, 'WarmWorker'], Dict[str, Any]]] = {
+    'offerup': _run_offerup,
+    'reextract': _run_reextract,
+}
+
+
+class WarmWorker(threading.Thread):
+    """Worker que conserva su navegador abierto entre tareas"""
+
+    def __init__(self, name: str, tasks: queue.Queue, on_done: Callable, headless: bool = True):
+        super().__init__(name=name, daemon=True)
+        self.tasks = tasks
+        self.on_done = on_done
+        self.headless = headless
+        self.browser: Optional[WebScraper] = None
+        self.browser_jobs = 0
+
+    def get_browser(self) -> WebScraper:
+        """Navegador persistente (se recicla cada SCHEDULER_BROWSER_MAX_JOBS tareas)"""
+        if self.browser is not None and self.browser_jobs >= Config.SCHEDULER_BROWSER_MAX_JOBS:
+            self.close_browser()
+        if self.browser is None:
+            self.browser = WebScraper(headless=self.headless, timeout=15)
+            self.browser.keep_alive = True
+        self.browser_jobs += 1
+        return self.browser
+
+    def close_browser(self):
+        if self.browser is not None:
+            try:
+                self.browser.close(force=True)
+            except Exception as e:
+                logger.warning(f"Error cerrando navegador de {self.name}: {e}")
+        self.browser = None
+        self.browser_jobs = 0
+
+    def run(self):
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                break
+            job, fire_time = task
+            started = datetime.now()
+            summary: Dict[str, Any] = {}
+            try:
+                logger.info(f"▶️  [{self.name}] {job.job_id} (programada {fire_time:%Y-%m-%d %H:%M})")
+                summary = JOB_RUNNERS[job.kind](job, self) or {}
+                status = 'interrupted' if offerup.interrupted else 'ok'
+            except Exception as e:
+                logger.error(f"❌ [{self.name}] Error en {job.job_id}: {e}")
+                status = 'error'
+                summary = {'error': str(e)}
+                # Sesión posiblemente dañada: la siguiente tarea abre un navegador nuevo
+                self.close_browser()
+            self.on_done(job, fire_time, started, status, summary)
+        self.close_browser()
+
+
+class SchedulerDaemon:
+    """Despacha tareas programadas a workers calientes con límites de concurrencia"""
+
+    def __init__(self, jobs: List[ScheduledJob], workers: Optional[int] = None,
+                 domain_limits: Optional[Dict[str, int]] = None, state_path: Optional[str] = None,
+                 headless: Optional[bool] = None):
+        """
+        Args:
+            jobs: Tareas programadas
+            workers: Ejecuciones simultáneas (default: Config.SCHEDULER_WORKERS)
+            domain_limits: Ejecuciones simultáneas por dominio (default: Config.SCHEDULER_DOMAIN_LIMITS;
+                los dominios no listados usan Config.SCHEDULER_DEFAULT_DOMAIN_LIMIT)
+            state_path: Archivo de estado (default: Config.SCHEDULER_STATE_PATH)
+            headless: Navegadores sin ventana (default: Config.SCHEDULER_HEADLESS)
+        """
+        self.jobs = {job.job_id: job for job in jobs}
+        self.num_workers = workers or Config.SCHEDULER_WORKERS
+        self.domain_limits = Config.SCHEDULER_DOMAIN_LIMITS if domain_limits is None else domain_limits
+        self.state_path = state_path or Config.SCHEDULER_STATE_PATH
+        self.headless = Config.SCHEDULER_HEADLESS if headless is None else headless
+
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._tasks: queue.Queue = queue.Queue()
+        self.workers: List[WarmWorker] = []
+        # job_id -> (hora de ejecución con jitter, hora programada)
+        self.due: Dict[str, tuple] = {}
+        # job_id -> hora programada de la ejecución en curso
+        self.running: Dict[str, datetime] = {}
+        self.domain_running: Dict[str, int] = {}
+        self.completed = 0
+        self.state = self._load_state()
+
+    # ---------------------------------------------------------------- estado
+
+    def _load_state(self) -> Dict[str, Dict[str, Any]]:
+        if os.path.exists(self.state_path):
+            try:
+                with open(self.state_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Estado del daemon ilegible, se empieza de cero: {e}")
+        return {}
+
+    def _save_state(self):
+        """Escritura atómica (archivo temporal + rename)"""
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        for job_id, (due_at, fire_time) in self.due.items():
+            self.state.setdefault(job_id, {})['next_run'] = due_at.strftime(STATE_FORMAT)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    # ----------------------------------------------------------- planificación
+
+    def _with_jitter(self, job: ScheduledJob, fire_time: datetime) -> tuple:
+        return fire_time + timedelta(seconds=random.uniform(0, job.jitter_seconds)), fire_time
+
+    def _initial_due(self, job: ScheduledJob, now: datetime) -> tuple:
+        """Primer disparo al arrancar (con recuperación de ejecuciones perdidas)"""
+        last = self.state.get(job.job_id, {}).get('last_scheduled')
+        if last:
+            last = datetime.strptime(last, STATE_FORMAT)
+            latest = job.cron.last_between(last, now)
+            if latest is not None:
+                # La cuenta es solo para el log (acotada); se recupera el último disparo
+                missed = len(job.cron.fires_between(last, now, limit=MISSED_COUNT_LIMIT))
+                count = f"{missed}{'+' if missed == MISSED_COUNT_LIMIT else ''}"
+                window = timedelta(hours=Config.SCHEDULER_CATCH_UP_HOURS)
+                if job.catch_up and now - latest <= window:
+                    logger.info(f"⏪ {job.job_id}: {count} ejecución(es) perdida(s), se ejecuta una ahora")
+                    return self._with_jitter(job, latest)
+                logger.info(f"⏭️  {job.job_id}: {count} ejecución(es) perdida(s) sin recuperar")
+        return self._with_jitter(job, job.cron.next_after(now))
+
+    def _dispatch_ready(self, now: datetime):
+        """Envía a los workers las tareas vencidas que caben en los límites"""
+        ready = sorted((due_at, job_id) for job_id, (due_at, _) in self.due.items() if due_at <= now)
+        dispatched = False
+        for due_at, job_id in ready:
+            if len(self.running) >= self.num_workers:
+                break
+            if job_id in self.running:
+                continue
+            job = self.jobs[job_id]
+            if job.domain:
+                limit = self.domain_limits.get(job.domain, Config.SCHEDULER_DEFAULT_DOMAIN_LIMIT)
+                if self.domain_running.get(job.domain, 0) >= limit:
+                    continue
+                self.domain_running[job.domain] = self.domain_running.get(job.domain, 0) + 1
+
+            fire_time = self.due[job_id][1]
+            self.running[job_id] = fire_time
+            delay = (now - due_at).total_seconds()
+            if delay > 60:
+                logger.info(f"⏳ {job_id}: inicia con {delay / 60:.1f} min de retraso (límites de concurrencia)")
+            self._tasks.put((job, fire_time))
+            # Siguiente disparo (los que caen mientras corre se juntan en uno)
+            self.due[job_id] = self._with_jitter(job, job.cron.next_after(max(fire_time, now)))
+            self.state.setdefault(job_id, {})['running_since'] = now.strftime(STATE_FORMAT)
+            dispatched = True
+        if dispatched:
+            self._save_state()
+
+    def _on_done(self, job: ScheduledJob, fire_time: datetime, started: datetime, status: str,
+                 summary: Dict[str, Any]):
+        """Callback de los workers al terminar una tarea"""
+        finished = datetime.now()
+        seconds = (finished - started).total_seconds()
+        with self._cond:
+            self.running.pop(job.job_id, None)
+            if job.domain:
+                self.domain_running[job.domain] -= 1
+            entry = self.state.setdefault(job.job_id, {})
+            entry.pop('running_since', None)
+            # Solo las ejecuciones terminadas cuentan como hechas: si el daemon
+            # se cae a media tarea, se recupera al reiniciar
+            if status != 'interrupted':
+                entry['last_scheduled'] = fire_time.strftime(STATE_FORMAT)
+            entry.update({
+                'last_started': started.strftime(STATE_FORMAT),
+                'last_finished': finished.strftime(STATE_FORMAT),
+                'last_status': status,
+                'last_seconds': round(seconds, 1),
+                'last_summary': summary,
+                'runs': entry.get('runs', 0) + 1,
+            })
+            self.completed += 1
+            self._save_state()
+            self._cond.notify_all()
+        logger.info(f"{'✅' if status == 'ok' else '⚠️ '} {job.job_id}: {status} en {seconds:.1f}s {summary}")
+
+    # -------------------------------------------------------------- ejecución
+
+    def stop(self, *_):
+        """Detiene el daemon (las tareas en curso terminan y guardan sus datos)"""
+        logger.warning("🛑 Deteniendo daemon: esperando a que terminen las tareas en curso...")
+        offerup.interrupted = True
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def run(self, max_runs: Optional[int] = None):
+        """
+        Despacha tareas hasta stop() (SIGINT/SIGTERM) o max_runs ejecuciones terminadas
+
+        Args:
+            max_runs: Ejecuciones a completar antes de salir (None = sin límite)
+        """
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGINT, self.stop)
+            signal.signal(signal.SIGTERM, self.stop)
+
+        now = datetime.now()
+        with self._cond:
+            for job in self.jobs.values():
+                self.due[job.job_id] = self._initial_due(job, now)
+            self._save_state()
+        for i in range(self.num_workers):
+            worker = WarmWorker(f"worker-{i + 1}", self._tasks, self._on_done, self.headless)
+            worker.start()
+            self.workers.append(worker)
+
+        logger.info(f"🗓️  Daemon: {len(self.jobs)} tarea(s), {self.num_workers} worker(s)")
+        for job_id, (due_at, _) in sorted(self.due.items(), key=lambda item: item[1]):
+            logger.info(f"   {job_id}: {self.jobs[job_id].cron.expression} → próxima {due_at:%Y-%m-%d %H:%M:%S}")
+
+        try:
+            with self._cond:
+                while not self._stop.is_set() and (max_runs is None or self.completed < max_runs):
+                    now = datetime.now()
+                    self._dispatch_ready(now)
+                    # Las tareas vencidas pero bloqueadas por los límites se
+                    # reintentan cuando un worker avisa que terminó
+                    upcoming = [due_at for due_at, _ in self.due.values() if due_at > now]
+                    timeout = (min(upcoming) - now).total_seconds() if upcoming else 30.0
+                    self._cond.wait(max(0.05, min(timeout, 30.0)))
+        finally:
+            for _ in self.workers:
+                self._tasks.put(None)
+            for worker in self.workers:
+                worker.join()
+            with self._cond:
+                self._save_state()
+            logger.info(f"🗓️  Daemon detenido ({self.completed} ejecuciones)")
+
+
+def run_daemon(path: Optional[str] = None, workers: Optional[int] = None):
+    """Punto de entrada del daemon"""
+    jobs = load_jobs(path)
+    if not jobs:
+        logger.error(f"❌ No hay tareas programadas (crea {Config.SCHEDULE_JOBS_PATH})")
+        return
+    SchedulerDaemon(jobs, workers).run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Daemon de tareas programadas de los scrapers")
+    parser.add_argument('--jobs', help=f"Archivo de tareas (default: {Config.SCHEDULE_JOBS_PATH})")
+    parser.add_argument('--workers', type=int, help="Ejecuciones simultáneas (default: SCHEDULER_WORKERS)")
+    args = parser.parse_args()
+    Config.create_directories()
+    run_daemon(args.jobs, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,11 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from webdriver_manager.chrome import ChromeDriverManager
 from dotenv import load_dotenv
+from page_archive import archive_page
+from rate_limiter import throttle
+from resilience import call_with_retry
+from concurrency import request_sent
+from config import Config
 
 # Configurar logging
 logging.basicConfig(
@@ -39,9 +44,19 @@ class WebScraper:
         self.headless = headless
         self.timeout = timeout
         self.driver = None
+        # Navegador persistente (workers del daemon): setup_driver reutiliza la
+        # sesión abierta y close() no la cierra (solo close(force=True))
+        self.keep_alive = False
         
     def setup_driver(self):
         """Configura y retorna el WebDriver de Chrome"""
+        if self.keep_alive and self.driver is not None:
+            try:
+                self.driver.current_url
+                return self.driver
+            except Exception:
+                logger.warning("Sesión persistente caída, abriendo un navegador nuevo")
+                self.driver = None
         try:
             chrome_options = Options()
             
@@ -70,6 +85,8 @@ class WebScraper:
                 self.driver = webdriver.Chrome(options=chrome_options)
             
             self.driver.implicitly_wait(self.timeout)
+            # Sin esto Chrome espera hasta 300 s a un sitio que no responde
+            self.driver.set_page_load_timeout(Config.PAGE_LOAD_TIMEOUT)
             
             logger.info("WebDriver configurado correctamente")
             return self.driver
@@ -90,13 +107,64 @@ class WebScraper:
         """
         try:
             logger.info(f"Navegando a: {url}")
-            self.driver.get(url)
-            time.sleep(2)  # Espera básica para carga inicial
+            self.navigate(url)
             return True
         except Exception as e:
             logger.error(f"Error al navegar a {url}: {e}")
             return False
     
+    def navigate(self, url: str):
+        """
+        Navega a una URL respetando el límite de velocidad del dominio y espera
+        a que el documento termine de cargar. Los errores transitorios se
+        reintentan con backoff; con el circuito del dominio abierto falla al
+        instante (ver resilience.py)
+        
+        Args:
+            url: URL a visitar
+            
+        Raises:
+            CircuitOpenError o el último error de navegación
+        """
+        def attempt():
+            throttle(url)
+            request_sent()
+            self.driver.get(url)
+            self.wait_until_loaded()
+        
+        call_with_retry(attempt, url, description=f"Navegación a {url}")
+    
+    def back(self):
+        """Regresa a la página anterior (cuenta como petición al dominio actual)"""
+        throttle(self.driver.current_url)
+        self.driver.back()
+        self.wait_until_loaded()
+    
+    def wait_until_loaded(self, timeout: Optional[int] = None):
+        """Espera a que document.readyState sea 'complete' (en lugar de una pausa fija)"""
+        try:
+            WebDriverWait(self.driver, timeout or self.timeout).until(
+                lambda driver: driver.execute_script("return document.readyState") == "complete"
+            )
+        except TimeoutException:
+            logger.warning("La página no terminó de cargar a tiempo")
+    
+    def archive_page(self, kind: str, url: Optional[str] = None):
+        """
+        Guarda el HTML de la página actual en el archivo de páginas
+        
+        Args:
+            kind: Tipo de página (ver page_archive.KINDS)
+            url: URL con la que se archiva (usa la URL actual por defecto)
+        """
+        # page_source serializa todo el DOM: no leerlo si el archivo está desactivado
+        if not Config.PAGE_ARCHIVE_ENABLED:
+            return
+        try:
+            archive_page(url or self.driver.current_url, self.driver.page_source, kind)
+        except Exception as e:
+            logger.warning(f"No se pudo leer la página para archivarla: {e}")
+    
     def wait_for_element(self, by: By, value: str, timeout: Optional[int] = None) -> Optional[object]:
         """
         Espera a que un elemento esté presente
@@ -174,10 +242,18 @@ class WebScraper:
         except Exception as e:
             logger.error(f"Error al tomar screenshot: {e}")
     
-    def close(self):
-        """Cierra el navegador"""
+    def close(self, force: bool = False):
+        """
+        Cierra el navegador
+
+        Args:
+            force: Cerrar aunque sea persistente (keep_alive)
+        """
+        if self.keep_alive and not force:
+            return
         if self.driver:
             self.driver.quit()
+            self.driver = None
             logger.info("WebDriver cerrado")
     
     def __enter__(self):
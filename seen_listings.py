@@ -0,0 +1,169 @@
+"""
+Registro persistente de publicaciones ya vistas
+
+Guarda en SQLite cada listing_id visto con la fecha en que apareció por
+primera vez, la última vez que se vio y su último precio. Permite saber qué
+publicaciones son nuevas entre ejecuciones sin releer los resultados previos.
+
+Delante de la tabla hay un filtro de Bloom en disco (bloom_filter.py): los
+IDs que el filtro no conoce son nuevos con certeza y no llegan a SQLite; solo
+los posibles vistos se confirman con la consulta exacta.
+"""
+import os
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from typing import List, Dict, Any, Iterable, Optional
+
+from bloom_filter import ScalableBloomFilter
+from config import Config
+from utils import extract_listing_id
+
+logger = logging.getLogger(__name__)
+
+
+# SQLite limita el número de parámetros por consulta
+_BATCH_SIZE = 500
+
+
+class SeenListings:
+    """Conjunto persistente de publicaciones vistas (listing_id)"""
+
+    def __init__(self, path: Optional[str] = None, bloom_dir: Optional[str] = None):
+        """
+        Abre (o crea) la base de datos de publicaciones vistas
+
+        Args:
+            path: Archivo SQLite (usa Config.SEEN_LISTINGS_PATH por defecto)
+            bloom_dir: Directorio del filtro de Bloom (usa Config.SEEN_BLOOM_DIR;
+                cadena vacía para desactivarlo)
+        """
+        self.path = path or Config.SEEN_LISTINGS_PATH
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS seen (
+                listing_id TEXT PRIMARY KEY,
+                first_seen TEXT NOT NULL,
+                last_seen TEXT NOT NULL,
+                last_price REAL
+            )
+        """)
+        self.conn.commit()
+
+        bloom_dir = Config.SEEN_BLOOM_DIR if bloom_dir is None else bloom_dir
+        self.bloom = None
+        if bloom_dir:
+            self.bloom = ScalableBloomFilter(bloom_dir, Config.SEEN_BLOOM_CAPACITY, Config.SEEN_BLOOM_ERROR_RATE)
+            if self.bloom.is_new:
+                self._rebuild_bloom()
+        # Consultas exactas evitadas gracias al filtro
+        self.bloom_skipped = 0
+
+    def _rebuild_bloom(self):
+        """Carga en el filtro los IDs ya registrados (primera vez o filtro borrado)"""
+        with self._lock:
+            cursor = self.conn.execute("SELECT listing_id FROM seen")
+            added = self.bloom.update(row[0] for row in cursor)
+        if added:
+            logger.info(f"🌸 Filtro de Bloom reconstruido con {added:,} publicaciones vistas")
+
+    def _maybe_seen(self, ids: List[str]) -> List[str]:
+        """IDs que el filtro de Bloom no descarta (los demás son nuevos con certeza)"""
+        if self.bloom is None:
+            return ids
+        candidates = [listing_id for listing_id in ids if listing_id in self.bloom]
+        self.bloom_skipped += len(ids) - len(candidates)
+        return candidates
+
+    def __contains__(self, listing_id: str) -> bool:
+        if not self._maybe_seen([listing_id]):
+            return False
+        with self._lock:
+            row = self.conn.execute("SELECT 1 FROM seen WHERE listing_id = ?", (listing_id,)).fetchone()
+        return row is not None
+
+    def get_many(self, listing_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Obtiene el registro de varias publicaciones
+
+        Args:
+            listing_ids: IDs a consultar
+
+        Returns:
+            Diccionario listing_id -> {'first_seen', 'last_seen', 'last_price'} (solo las vistas)
+        """
+        ids = self._maybe_seen(list(dict.fromkeys(listing_ids)))
+        found = {}
+        with self._lock:
+            for start in range(0, len(ids), _BATCH_SIZE):
+                batch = ids[start:start + _BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self.conn.execute(
+                    f"SELECT listing_id, first_seen, last_seen, last_price FROM seen "
+                    f"WHERE listing_id IN ({placeholders})", batch).fetchall()
+                for listing_id, first_seen, last_seen, last_price in rows:
+                    found[listing_id] = {
+                        'first_seen': first_seen,
+                        'last_seen': last_seen,
+                        'last_price': last_price
+                    }
+        return found
+
+    def filter_new(self, listing_ids: Iterable[str]) -> List[str]:
+        """
+        Devuelve los IDs que nunca se han visto (conserva el orden)
+
+        Args:
+            listing_ids: IDs a revisar
+
+        Returns:
+            Lista de IDs nuevos
+        """
+        ids = list(dict.fromkeys(listing_ids))
+        known = self.get_many(ids)
+        return [listing_id for listing_id in ids if listing_id not in known]
+
+    def mark_seen(self, products: List[Dict[str, Any]]):
+        """
+        Registra los productos como vistos (actualiza última fecha y precio)
+
+        Args:
+            products: Productos con 'url' y opcionalmente 'price_value'
+        """
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        rows = []
+        for product in products:
+            listing_id = extract_listing_id(product.get('url', ''))
+            if listing_id:
+                rows.append((listing_id, now, now, product.get('price_value')))
+        if not rows:
+            return
+
+        # El filtro se actualiza antes que la tabla: si algo falla en medio
+        # solo quedan falsos positivos (que la consulta exacta resuelve)
+        if self.bloom is not None:
+            self.bloom.update(row[0] for row in rows)
+
+        with self._lock:
+            self.conn.executemany("""
+                INSERT INTO seen (listing_id, first_seen, last_seen, last_price)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(listing_id) DO UPDATE SET
+                    last_seen = excluded.last_seen,
+                    last_price = COALESCE(excluded.last_price, seen.last_price)
+            """, rows)
+            self.conn.commit()
+
+    def close(self):
+        """Cierra la conexión y el filtro de Bloom"""
+        if self.bloom is not None:
+            self.bloom.close()
+        with self._lock:
+            self.conn.close()
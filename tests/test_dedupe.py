@@ -0,0 +1,49 @@
+"""Clusters de casi duplicados (dedupe.py)"""
+import itertools
+
+import pytest
+
+from dedupe import NearDuplicateIndex, collapse_duplicates
+
+# Dos textos sin nada en común y un tercero que contiene a ambos (puente)
+TEXT_A = "bicicleta de montaña rodada veintinueve con frenos de disco hidraulicos"
+TEXT_B = "refrigerador de acero inoxidable con dispensador de agua y hielo incluido"
+TEXT_BRIDGE = f"{TEXT_A} {TEXT_B}"
+
+
+def make_index(tmp_path):
+    # Bandas de 2 filas: a similitud ~0.5 el puente es candidato con certeza práctica
+    return NearDuplicateIndex(path=str(tmp_path / "dedupe_index.json"), bands=64, threshold=0.4)
+
+
+@pytest.mark.parametrize("first, second", list(itertools.permutations(["a", "b"])))
+def test_bridge_merges_clusters_under_oldest(tmp_path, first, second):
+    index = make_index(tmp_path)
+    texts = {"a": TEXT_A, "b": TEXT_B}
+    products = []
+    for listing_id in (first, second):
+        products.append({'url': f"https://offerup.com/item/detail/{listing_id}",
+                         'cluster_id': index.add(listing_id, texts[listing_id])})
+    assert products[0]['cluster_id'] == first
+    assert products[1]['cluster_id'] == second
+
+    bridge = index.add("c", TEXT_BRIDGE)
+    products.append({'url': "https://offerup.com/item/detail/c", 'cluster_id': bridge})
+
+    assert bridge == first
+    assert index.find(second) == first
+    # El producto 'second' quedó marcado con un representante viejo
+    index.resolve_clusters(products)
+    assert {p['cluster_id'] for p in products} == {first}
+    assert len(collapse_duplicates(products)) == 1
+
+
+def test_representative_survives_reload(tmp_path):
+    index = make_index(tmp_path)
+    index.add("a", TEXT_A)
+    index.add("b", TEXT_B)
+    index.save()
+
+    reloaded = make_index(tmp_path)
+    assert reloaded.add("c", TEXT_BRIDGE) == "a"
+    assert reloaded.find("b") == "a"
@@ -0,0 +1,45 @@
+"""Expresiones cron del daemon (scheduler_daemon.py)"""
+from datetime import datetime
+
+import pytest
+
+from scheduler_daemon import CronSpec
+
+
+def test_leap_day_skips_to_next_leap_year():
+    cron = CronSpec("0 0 29 2 *")
+    assert cron.next_after(datetime(2026, 10, 19, 12, 0)) == datetime(2028, 2, 29, 0, 0)
+    # 2100 no es bisiesto
+    assert cron.next_after(datetime(2096, 3, 1)) == datetime(2104, 2, 29, 0, 0)
+
+
+def test_day_of_month_or_day_of_week():
+    # Día 1 del mes o cualquier lunes (basta con uno, como en cron)
+    cron = CronSpec("0 9 1 * mon")
+    assert cron.next_after(datetime(2026, 10, 19, 9, 0)) == datetime(2026, 10, 26, 9, 0)  # lunes
+    assert cron.next_after(datetime(2026, 10, 27, 9, 0)) == datetime(2026, 11, 1, 9, 0)   # día 1 (domingo)
+
+
+def test_only_day_of_week_restricts_to_weekdays():
+    cron = CronSpec("30 8 * * mon-fri")
+    assert cron.next_after(datetime(2026, 10, 23, 9, 0)) == datetime(2026, 10, 26, 8, 30)
+
+
+@pytest.mark.parametrize("expression, start", [
+    ("*/15 * * * *", datetime(2026, 10, 1)),
+    ("0 0 29 2 *", datetime(2024, 1, 1)),
+    ("0 9 1 * mon", datetime(2026, 1, 1)),
+    ("5 */2 * * sat", datetime(2026, 1, 1)),
+])
+def test_last_between_matches_forward_walk(expression, start):
+    cron = CronSpec(expression)
+    end = datetime(2026, 10, 19, 13, 7)
+    fires = cron.fires_between(start, end, limit=10 ** 6)
+    assert cron.last_between(start, end) == fires[-1]
+
+
+def test_last_between_after_long_outage():
+    # Con más de 1000 disparos perdidos el último sigue siendo el más reciente
+    cron = CronSpec("*/5 * * * *")
+    assert cron.last_between(datetime(2026, 1, 1), datetime(2026, 10, 19, 13, 7, 30)) == datetime(2026, 10, 19, 13, 5)
+    assert cron.last_between(datetime(2026, 10, 19, 13, 5), datetime(2026, 10, 19, 13, 9)) is None
@@ -0,0 +1,20 @@
+"""Cobertura de áreas por ZIP (zip_index.py)"""
+import pytest
+
+from zip_index import ZipIndex
+
+
+@pytest.fixture(scope="module")
+def index():
+    return ZipIndex()
+
+
+@pytest.mark.parametrize("zip_code", ["10001", "92101", "60601", "94103"])
+def test_small_area_is_covered_by_its_center(index, zip_code):
+    assert index.cover_zip(zip_code, 5, 30) == [zip_code]
+
+
+def test_large_area_covers_every_zip(index):
+    result = index.covering_set(30, center=index.locate("92101"), radius_miles=60)
+    covered = {z for zips in result['coverage'].values() for z in zips}
+    assert len(covered) == result['area_zips']
@@ -5,10 +5,10 @@ Busca empresas y extrae información de directivos de sus sitios web
 
 import os
 import sys
-import time
 import logging
 import re
 from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from bs4 import BeautifulSoup
 from selenium import webdriver
@@ -19,8 +19,12 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
 from webdriver_manager.chrome import ChromeDriverManager
-import requests
 from utils import save_to_json, save_to_csv
+from page_archive import archive_page
+from rate_limiter import throttle
+from resilience import fetch, call_with_retry, CircuitOpenError
+from concurrency import get_controller, log_metrics, THROTTLE_STATUS, THROTTLED
+from config import Config
 
 # Configurar logging
 logging.basicConfig(
@@ -119,8 +123,10 @@ class TijuanaExecutivesScraper:
         companies = []
         
         try:
-            self.driver.get(search_url)
-            time.sleep(3)
+            def open_results():
+                throttle(search_url)
+                self.driver.get(search_url)
+            call_with_retry(open_results, search_url, description="Búsqueda en Google")
             
             # Esperar a que carguen resultados
             WebDriverWait(self.driver, self.timeout).until(
@@ -214,25 +220,48 @@ class TijuanaExecutivesScraper:
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
             }
             
-            response = requests.get(company['url'], headers=headers, timeout=10)
+            # Límite adaptativo de descargas simultáneas de sitios de empresas
+            with get_controller('company_fetch', Config.COMPANY_FETCH_MAX_WORKERS).slot() as slot:
+                response = fetch(company['url'], headers=headers, timeout=10)
+                if response.status_code in THROTTLE_STATUS:
+                    slot.mark(THROTTLED)
             response.encoding = 'utf-8'
             html_content = response.text
+            archive_page(company['url'], html_content, 'company')
             
-            soup = BeautifulSoup(html_content, 'html.parser')
-            
-            # Buscar secciones de equipo/directivos
-            executives.extend(self._search_team_sections(soup, company))
-            
-            # Búsqueda general por palabras clave
-            executives.extend(self._search_by_keywords(soup, company))
+            executives = self.extract_executives_from_html(html_content, company)
             
             logger.info(f"Ejecutivos encontrados en {company['name']}: {len(executives)}")
             return executives
             
+        except CircuitOpenError as e:
+            logger.warning(f"⏭️  {company['name']}: {e}")
+            return []
         except Exception as e:
             logger.warning(f"Error extrayendo de {company['url']}: {e}")
             return []
     
+    def extract_executives_from_html(self, html_content: str, company: Dict) -> List[Dict]:
+        """
+        Extrae directivos del HTML de un sitio (sin descargar nada)
+        
+        Args:
+            html_content: HTML de la página
+            company: Diccionario con 'name' y 'url' de la empresa
+            
+        Returns:
+            Lista de directivos encontrados
+        """
+        soup = BeautifulSoup(html_content, 'html.parser')
+        executives = []
+        
+        # Buscar secciones de equipo/directivos
+        executives.extend(self._search_team_sections(soup, company))
+        
+        # Búsqueda general por palabras clave
+        executives.extend(self._search_by_keywords(soup, company))
+        return executives
+    
     def _search_team_sections(self, soup: BeautifulSoup, company: Dict) -> List[Dict]:
         """
         Busca en secciones conocidas de equipo/directivos
@@ -357,15 +386,18 @@ class TijuanaExecutivesScraper:
             
             logger.info(f"\nTotal de empresas a procesar: {len(self.companies)}")
             
-            # Extraer ejecutivos de cada empresa
-            for idx, company in enumerate(self.companies, 1):
+            # Extraer ejecutivos de cada empresa (en paralelo; el controlador de
+            # concurrencia decide cuántas descargas corren a la vez)
+            def process(item):
+                idx, company = item
                 logger.info(f"\n[{idx}/{len(self.companies)}] Procesando: {company['name']}")
-                
-                executives = self.extract_executives_from_website(company)
-                self.executives.extend(executives)
-                
-                # Pausa para no sobrecargar
-                time.sleep(2)
+                return self.extract_executives_from_website(company)
+            
+            with ThreadPoolExecutor(max_workers=Config.COMPANY_FETCH_MAX_WORKERS,
+                                    thread_name_prefix="company") as pool:
+                for executives in pool.map(process, enumerate(self.companies, 1)):
+                    self.executives.extend(executives)
+            log_metrics()
             
             # Guardar resultados
             self._save_results()
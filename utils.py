@@ -2,11 +2,14 @@
 Funciones utilitarias para el scraper
 """
 import os
+import re
 import json
+import unicodedata
 import pandas as pd
 import logging
 from datetime import datetime
 from typing import List, Dict, Any
+from product_record import as_dicts
 
 logger = logging.getLogger(__name__)
 
@@ -33,7 +36,16 @@ def save_to_json(data: List[Dict[str, Any]], filename: str = None):
                 os.makedirs(directory, exist_ok=True)
         
         with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+            if isinstance(data, dict):
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            else:
+                # Un producto a la vez: los registros se convierten a dict sin copiar la lista
+                f.write('[')
+                i = -1
+                for i, item in enumerate(as_dicts(data)):
+                    f.write(',\n  ' if i else '\n  ')
+                    f.write(json.dumps(item, ensure_ascii=False, indent=2).replace('\n', '\n  '))
+                f.write('\n]' if i >= 0 else ']')
         
         logger.info(f"Datos guardados en: {filepath}")
         return filepath
@@ -64,7 +76,7 @@ def save_to_csv(data: List[Dict[str, Any]], filename: str = None):
             if directory:
                 os.makedirs(directory, exist_ok=True)
         
-        df = pd.DataFrame(data)
+        df = pd.DataFrame(as_dicts(data))
         df.to_csv(filepath, index=False, encoding='utf-8-sig')
         
         logger.info(f"Datos guardados en: {filepath}")
@@ -92,7 +104,7 @@ def save_to_excel(data: List[Dict[str, Any]], filename: str = None):
         
         filepath = os.path.join("data", filename)
         
-        df = pd.DataFrame(data)
+        df = pd.DataFrame(as_dicts(data))
         df.to_excel(filepath, index=False, engine='openpyxl')
         
         logger.info(f"Datos guardados en: {filepath}")
@@ -125,6 +137,81 @@ def clean_text(text: str) -> str:
     return text.strip()
 
 
+def normalize_text(text: str) -> str:
+    """
+    Normaliza texto para comparar o indexar: minúsculas y sin acentos
+    
+    Args:
+        text: Texto original
+        
+    Returns:
+        Texto normalizado
+    """
+    if not text:
+        return ""
+    
+    text = unicodedata.normalize('NFKD', text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def extract_listing_id(url: str) -> str:
+    """
+    Obtiene el ID de la publicación a partir de una URL de OfferUp
+    
+    Args:
+        url: URL del producto (ej: https://offerup.com/item/detail/123456)
+        
+    Returns:
+        ID de la publicación, o la URL sin parámetros si no se reconoce el formato
+    """
+    if not url:
+        return ""
+    
+    match = re.search(r'/item/(?:detail/)?([A-Za-z0-9-]+)', url)
+    if match:
+        return match.group(1)
+    
+    return url.split('?')[0].split('#')[0].rstrip('/')
+
+
+def normalize_item_url(url: str) -> str:
+    """
+    Normaliza la URL de una publicación de OfferUp para usarla como clave
+    
+    Distintas búsquedas enlazan la misma publicación con parámetros de
+    seguimiento, con otro host o sin "/detail/"; todas se reducen a
+    https://offerup.com/item/detail/<id>.
+    
+    Args:
+        url: URL del producto
+        
+    Returns:
+        URL canónica, o la URL sin parámetros si no se reconoce el formato
+    """
+    if not url:
+        return ""
+    
+    match = re.search(r'/item/(?:detail/)?([A-Za-z0-9-]+)', url)
+    if match:
+        return f"https://offerup.com/item/detail/{match.group(1)}"
+    
+    return url.split('?')[0].split('#')[0].rstrip('/')
+
+
+def slugify(text: str) -> str:
+    """
+    Convierte un texto en un identificador seguro para nombres de archivo
+    
+    Args:
+        text: Texto original (ej: término de búsqueda)
+        
+    Returns:
+        Texto en minúsculas con solo letras, números y guiones bajos
+    """
+    slug = re.sub(r'[^a-z0-9]+', '_', (text or '').lower()).strip('_')
+    return slug or 'sin_nombre'
+
+
 def create_output_dir(dirname: str = "data"):
     """
     Crea el directorio de salida si no existe
@@ -0,0 +1,377 @@
+"""
+Reporte HTML virtualizado para búsquedas con miles de productos
+
+Embebe los productos como un arreglo JSON compacto junto con un índice
+invertido precalculado sobre títulos y descripciones. En el navegador solo
+se renderizan las tarjetas visibles (ventana virtual), por lo que un solo
+archivo offline puede recorrer decenas de miles de publicaciones en el móvil.
+"""
+import re
+import json
+from datetime import datetime
+from typing import List, Dict, Any
+from utils import normalize_text
+
+
+# Orden de las columnas de cada producto dentro del payload JSON
+PAYLOAD_FIELDS = ["title", "price", "price_value", "location", "description", "images", "url"]
+
+# Límites para mantener el payload compacto
+MAX_DESCRIPTION_CHARS = 200
+MAX_IMAGES = 6
+MIN_TOKEN_LENGTH = 2
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Divide texto en tokens alfanuméricos normalizados
+
+    Args:
+        text: Texto a tokenizar
+
+    Returns:
+        Lista de tokens (puede contener repetidos)
+    """
+    return [t for t in re.split(r'[^a-z0-9]+', normalize_text(text)) if len(t) >= MIN_TOKEN_LENGTH]
+
+
+def build_search_index(products: List[Dict[str, Any]]) -> Dict[str, list]:
+    """
+    Construye un índice invertido token -> posiciones de productos
+
+    Los tokens se guardan ordenados (para búsqueda por prefijo con búsqueda
+    binaria en el navegador) y cada lista de posiciones se codifica como
+    diferencias entre posiciones consecutivas para reducir el tamaño.
+
+    Args:
+        products: Productos en el mismo orden que tendrá el payload
+
+    Returns:
+        Diccionario con 'tokens' y 'postings' (listas paralelas)
+    """
+    postings: Dict[str, List[int]] = {}
+    for position, product in enumerate(products):
+        text = f"{product.get('title') or ''} {product.get('description') or ''}"
+        for token in set(tokenize(text)):
+            postings.setdefault(token, []).append(position)
+
+    tokens = sorted(postings)
+    encoded = []
+    for token in tokens:
+        previous = 0
+        gaps = []
+        for position in postings[token]:
+            gaps.append(position - previous)
+            previous = position
+        encoded.append(gaps)
+
+    return {"tokens": tokens, "postings": encoded}
+
+
+def build_compact_payload(products: List[Dict[str, Any]]) -> List[list]:
+    """
+    Convierte los productos a filas compactas siguiendo PAYLOAD_FIELDS
+
+    Args:
+        products: Lista de productos (ya ordenada)
+
+    Returns:
+        Lista de filas (una lista por producto)
+    """
+    rows = []
+    for product in products:
+        description = product.get('description') or ''
+        if len(description) > MAX_DESCRIPTION_CHARS:
+            description = description[:MAX_DESCRIPTION_CHARS] + '...'
+        rows.append([
+            product.get('title') or 'Sin título',
+            product.get('price') or 'N/A',
+            product.get('price_value'),
+            product.get('location') or '',
+            description,
+            list(product.get('images') or [])[:MAX_IMAGES],
+            product.get('url') or '#'
+        ])
+    return rows
+
+
+def _embed_json(data) -> str:
+    """Serializa JSON compacto seguro para incrustar dentro de <script>"""
+    raw = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    return raw.replace('</', '<\\/')
+
+
+def _price_sort_key(product: Dict[str, Any]) -> float:
+    """Clave de orden por precio, con el mismo criterio que generate_mobile_html"""
+    if product.get('price_value') is not None:
+        return float(product['price_value'])
+    match = re.search(r'[\d,]+', product.get('price') or '')
+    if match:
+        return float(match.group().replace(',', ''))
+    return 0
+
+
+_VIRTUAL_SCRIPT = r"""
+(function () {
+    var ROW_HEIGHT = 136;
+    var OVERSCAN = 6;
+    var PLACEHOLDER = 'https://via.placeholder.com/300x300?text=Sin+Imagen';
+    var rows = JSON.parse(document.getElementById('products-data').textContent);
+    var index = JSON.parse(document.getElementById('search-index').textContent);
+    var F = {title: 0, price: 1, priceValue: 2, location: 3, description: 4, images: 5, url: 6};
+
+    // Decodificar listas de posiciones (diferencias -> posiciones absolutas)
+    var postings = index.postings.map(function (gaps) {
+        var out = new Int32Array(gaps.length), acc = 0;
+        for (var i = 0; i < gaps.length; i++) { acc += gaps[i]; out[i] = acc; }
+        return out;
+    });
+
+    var viewport = document.getElementById('viewport');
+    var spacer = document.getElementById('spacer');
+    var counter = document.getElementById('visible-count');
+    var visible = new Int32Array(rows.length);
+    var visibleCount = 0;
+    var pool = [];
+
+    function normalize(text) {
+        return text.toLowerCase().normalize('NFKD').replace(/[\u0300-\u036f]/g, '');
+    }
+
+    function lowerBound(prefix) {
+        var lo = 0, hi = index.tokens.length;
+        while (lo < hi) {
+            var mid = (lo + hi) >> 1;
+            if (index.tokens[mid] < prefix) lo = mid + 1; else hi = mid;
+        }
+        return lo;
+    }
+
+    // Marca los productos que contienen algún token con el prefijo dado
+    function matchPrefix(prefix) {
+        var marks = new Uint8Array(rows.length);
+        for (var t = lowerBound(prefix); t < index.tokens.length && index.tokens[t].lastIndexOf(prefix, 0) === 0; t++) {
+            var list = postings[t];
+            for (var i = 0; i < list.length; i++) marks[list[i]] = 1;
+        }
+        return marks;
+    }
+
+    function applyFilters() {
+        var terms = normalize(document.getElementById('q').value).split(/[^a-z0-9]+/).filter(function (t) { return t.length >= 2; });
+        var minValue = parseFloat(document.getElementById('min-price').value);
+        var maxValue = parseFloat(document.getElementById('max-price').value);
+        var marks = terms.map(matchPrefix);
+        visibleCount = 0;
+        for (var i = 0; i < rows.length; i++) {
+            var ok = true;
+            for (var m = 0; m < marks.length && ok; m++) ok = marks[m][i] === 1;
+            var value = rows[i][F.priceValue];
+            if (ok && !isNaN(minValue)) ok = value !== null && value >= minValue;
+            if (ok && !isNaN(maxValue)) ok = value !== null && value <= maxValue;
+            if (ok) visible[visibleCount++] = i;
+        }
+        counter.textContent = visibleCount;
+        spacer.style.height = (visibleCount * ROW_HEIGHT) + 'px';
+        render(true);
+    }
+
+    function escapeHtml(text) {
+        return String(text).replace(/[&<>"']/g, function (c) {
+            return {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[c];
+        });
+    }
+
+    function fillCard(card, position) {
+        var row = rows[visible[position]];
+        if (card._position === position && !card._dirty) return;
+        card._position = position;
+        card._dirty = false;
+        card.style.transform = 'translateY(' + (position * ROW_HEIGHT) + 'px)';
+        var images = row[F.images];
+        card.innerHTML =
+            '<img class="v-thumb" loading="lazy" src="' + escapeHtml(images[0] || PLACEHOLDER) + '" alt="">' +
+            '<div class="v-body">' +
+            '<div class="v-price">' + escapeHtml(row[F.price]) + '</div>' +
+            '<div class="v-title">' + escapeHtml(row[F.title]) + '</div>' +
+            '<div class="v-location">📍 ' + escapeHtml(row[F.location] || 'Sin ubicación') + '</div>' +
+            '<div class="v-desc">' + escapeHtml(row[F.description]) + '</div>' +
+            '</div>';
+        card.onclick = function () { openDetail(visible[position]); };
+    }
+
+    function render(force) {
+        var top = viewport.getBoundingClientRect().top;
+        var first = Math.max(0, Math.floor(-top / ROW_HEIGHT) - OVERSCAN);
+        var needed = Math.ceil(window.innerHeight / ROW_HEIGHT) + 2 * OVERSCAN;
+        var last = Math.min(visibleCount, first + needed);
+        while (pool.length < needed) {
+            var card = document.createElement('div');
+            card.className = 'v-card';
+            spacer.appendChild(card);
+            pool.push(card);
+        }
+        for (var i = 0; i < pool.length; i++) {
+            var position = first + i;
+            if (force) pool[i]._dirty = true;
+            if (position < last) {
+                pool[i].style.display = '';
+                fillCard(pool[i], position);
+            } else {
+                pool[i].style.display = 'none';
+                pool[i]._position = -1;
+            }
+        }
+    }
+
+    function openDetail(i) {
+        var row = rows[i];
+        var html = '<button class="d-close" onclick="document.getElementById(\'detail\').style.display=\'none\'">✕</button>' +
+            '<div class="d-images">';
+        row[F.images].forEach(function (src) {
+            html += '<img loading="lazy" src="' + escapeHtml(src) + '" alt="">';
+        });
+        html += '</div><div class="d-body"><div class="v-price">' + escapeHtml(row[F.price]) + '</div>' +
+            '<h2>' + escapeHtml(row[F.title]) + '</h2>' +
+            '<div class="v-location">📍 ' + escapeHtml(row[F.location] || 'Sin ubicación') + '</div>' +
+            '<p>' + escapeHtml(row[F.description]) + '</p>' +
+            '<a class="product-link" target="_blank" href="' + escapeHtml(row[F.url]) + '">Ver en OfferUp →</a></div>';
+        var detail = document.getElementById('detail');
+        detail.innerHTML = html;
+        detail.style.display = 'block';
+    }
+
+    var scheduled = false;
+    window.addEventListener('scroll', function () {
+        if (scheduled) return;
+        scheduled = true;
+        window.requestAnimationFrame(function () { scheduled = false; render(false); });
+    }, {passive: true});
+    window.addEventListener('resize', function () { render(true); });
+
+    var debounce = null;
+    ['q', 'min-price', 'max-price'].forEach(function (id) {
+        document.getElementById(id).addEventListener('input', function () {
+            clearTimeout(debounce);
+            debounce = setTimeout(applyFilters, 60);
+        });
+    });
+
+    applyFilters();
+})();
+"""
+
+
+def generate_virtual_html(products, search_term, location, min_price, max_price):
+    """
+    Genera HTML virtualizado con payload JSON compacto e índice de búsqueda
+
+    Args:
+        products: Lista de productos extraídos
+        search_term: Término de búsqueda
+        location: Ubicación / código postal
+        min_price: Precio mínimo de la búsqueda
+        max_price: Precio máximo de la búsqueda
+
+    Returns:
+        String con el documento HTML completo
+    """
+    sorted_products = sorted(products, key=_price_sort_key)
+    payload = _embed_json(build_compact_payload(sorted_products))
+    search_index = _embed_json(build_search_index(sorted_products))
+
+    html = f"""<!DOCTYPE html>
+<html lang="es">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>OfferUp - {search_term}</title>
+    <style>
+        * {{ margin: 0; padding: 0; box-sizing: border-box; }}
+        body {{
+            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Oxygen, Ubuntu, Cantarell, sans-serif;
+            background: #f5f5f5;
+            color: #333;
+        }}
+        .header {{
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            color: white;
+            padding: 12px 15px;
+            position: sticky;
+            top: 0;
+            z-index: 100;
+            box-shadow: 0 2px 10px rgba(0,0,0,0.1);
+        }}
+        .header h1 {{ font-size: 20px; }}
+        .header .meta {{ font-size: 13px; opacity: 0.9; margin-bottom: 8px; }}
+        .filters {{ display: grid; grid-template-columns: 1fr 80px 80px; gap: 6px; }}
+        .filters input {{ padding: 8px; border: none; border-radius: 8px; font-size: 15px; width: 100%; }}
+        .count {{ font-size: 12px; margin-top: 6px; opacity: 0.9; }}
+        #viewport {{ max-width: 600px; margin: 0 auto; padding: 0 10px; }}
+        #spacer {{ position: relative; }}
+        .v-card {{
+            position: absolute;
+            left: 0;
+            right: 0;
+            height: 128px;
+            display: flex;
+            gap: 10px;
+            background: white;
+            border-radius: 12px;
+            margin-top: 8px;
+            box-shadow: 0 2px 6px rgba(0,0,0,0.1);
+            overflow: hidden;
+            will-change: transform;
+        }}
+        .v-thumb {{ width: 128px; height: 128px; object-fit: cover; background: #e9ecef; flex-shrink: 0; }}
+        .v-body {{ padding: 8px 10px 8px 0; overflow: hidden; }}
+        .v-price {{ color: #28a745; font-weight: bold; font-size: 17px; }}
+        .v-title {{ font-weight: bold; font-size: 15px; color: #2c3e50; white-space: nowrap; overflow: hidden; text-overflow: ellipsis; }}
+        .v-location {{ color: #666; font-size: 12px; }}
+        .v-desc {{ color: #555; font-size: 12px; line-height: 1.4; max-height: 34px; overflow: hidden; }}
+        #detail {{
+            display: none;
+            position: fixed;
+            inset: 0;
+            background: white;
+            z-index: 200;
+            overflow-y: auto;
+        }}
+        .d-images {{ display: flex; overflow-x: auto; scroll-snap-type: x mandatory; }}
+        .d-images img {{ width: 100%; flex-shrink: 0; scroll-snap-align: start; max-height: 60vh; object-fit: contain; background: #000; }}
+        .d-body {{ padding: 15px; }}
+        .d-body h2 {{ font-size: 18px; margin: 6px 0; }}
+        .d-body p {{ font-size: 14px; color: #555; margin: 10px 0; }}
+        .d-close {{ position: fixed; top: 10px; right: 10px; z-index: 210; border: none; border-radius: 20px; padding: 6px 12px; background: rgba(0,0,0,0.7); color: white; font-size: 16px; }}
+        .product-link {{
+            display: block;
+            background: #667eea;
+            color: white;
+            text-align: center;
+            padding: 12px;
+            border-radius: 8px;
+            text-decoration: none;
+            font-weight: bold;
+        }}
+    </style>
+</head>
+<body>
+    <div class="header">
+        <h1>🔍 {search_term}</h1>
+        <div class="meta">📍 {location} | 💵 ${min_price:,} - ${max_price:,} | {datetime.now().strftime('%d/%m/%Y %H:%M')}</div>
+        <div class="filters">
+            <input id="q" type="search" placeholder="Filtrar por palabra...">
+            <input id="min-price" type="number" inputmode="numeric" placeholder="Mín $">
+            <input id="max-price" type="number" inputmode="numeric" placeholder="Máx $">
+        </div>
+        <div class="count">Mostrando <span id="visible-count">0</span> de {len(products)} productos</div>
+    </div>
+    <div id="viewport"><div id="spacer"></div></div>
+    <div id="detail"></div>
+    <script type="application/json" id="products-data">{payload}</script>
+    <script type="application/json" id="search-index">{search_index}</script>
+    <script>{_VIRTUAL_SCRIPT}</script>
+</body>
+</html>
+"""
+    return html
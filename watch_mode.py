@@ -0,0 +1,290 @@
+"""
+Modo vigilancia: detecta publicaciones nuevas de OfferUp en minutos
+
+Mantiene abierta una sesión de navegador por código postal y cada pocos
+minutos (con variación aleatoria) recarga solo la primera página de
+resultados de cada búsqueda guardada. Los IDs de las tarjetas se comparan con
+el registro de publicaciones vistas: solo las nuevas se visitan a detalle;
+las nuevas y las que cambiaron de precio se notifican en un resumen por email
+(uno por destinatario cada DIGEST_WINDOW_MINUTES).
+
+Uso:
+    python offerup_detailed_scraper.py --watch
+"""
+import os
+import json
+import time
+import signal
+import random
+import logging
+import threading
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+import offerup_detailed_scraper as offerup
+from offerup_detailed_scraper import OfferUpDetailedScraper
+from seen_listings import SeenListings
+from digest_notifier import DigestNotifier, classify_changes
+from alert_rules import RuleEngine
+from deal_scoring import DealScorer
+from config import Config
+from utils import extract_listing_id
+
+logger = logging.getLogger(__name__)
+
+
+def load_watch_searches(path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Carga las búsquedas a vigilar
+
+    Usa Config.WATCH_SEARCHES_PATH (lista de configuraciones) y, si no existe,
+    la búsqueda programada de scheduled_config.json.
+
+    Args:
+        path: Archivo JSON con una lista de búsquedas (search_term, zip_code,
+            min_price, max_price y opcionalmente recipient_email)
+
+    Returns:
+        Lista de búsquedas
+    """
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    path = path or Config.WATCH_SEARCHES_PATH
+    if not os.path.isabs(path):
+        path = os.path.join(base_dir, path)
+
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            searches = json.load(f)
+        return searches if isinstance(searches, list) else [searches]
+
+    scheduled = os.path.join(base_dir, 'scheduled_config.json')
+    if os.path.exists(scheduled):
+        with open(scheduled, 'r', encoding='utf-8') as f:
+            return [json.load(f)]
+    return []
+
+
+class ListingWatcher:
+    """Vigila la primera página de varias búsquedas con sesiones abiertas"""
+
+    def __init__(self, searches: List[Dict[str, Any]], interval_minutes: Optional[float] = None,
+                 jitter: Optional[float] = None, headless: bool = True):
+        """
+        Args:
+            searches: Búsquedas a vigilar (ver load_watch_searches)
+            interval_minutes: Minutos entre rondas (default: Config.WATCH_INTERVAL_MINUTES)
+            jitter: Variación aleatoria relativa del intervalo (default: Config.WATCH_JITTER)
+            headless: Navegadores sin ventana
+        """
+        self.searches = searches
+        self.interval = (Config.WATCH_INTERVAL_MINUTES if interval_minutes is None else interval_minutes) * 60
+        self.jitter = Config.WATCH_JITTER if jitter is None else jitter
+        self.headless = headless
+        self.seen = SeenListings()
+        # Una sesión por ZIP: la ubicación de OfferUp es global a la sesión
+        self.sessions: Dict[str, OfferUpDetailedScraper] = {}
+        # URL de resultados (búsqueda + filtros) ya abierta en cada sesión
+        self.result_urls: Dict[str, str] = {}
+        self.baselined = set()
+        self.rule_engine = RuleEngine.load()
+        # Historial de precios por término (se carga una vez por sesión de vigilancia)
+        self.deal_scorers: Dict[str, DealScorer] = {}
+        # Alertas acumuladas hasta el siguiente resumen por email
+        self.notifier = DigestNotifier()
+        self.digest_window = Config.DIGEST_WINDOW_MINUTES * 60
+        self.last_digest = time.monotonic()
+        # Propio: con `python offerup_detailed_scraper.py --watch` el manejador de
+        # Ctrl+C del script cambia la bandera de __main__, no la del módulo importado
+        self._stop = threading.Event()
+
+    @staticmethod
+    def _search_key(search: Dict[str, Any]) -> str:
+        return f"{search['search_term']}|{search['zip_code']}|{search.get('min_price', 0)}|{search.get('max_price', 999999)}"
+
+    def _session(self, zip_code: str) -> OfferUpDetailedScraper:
+        """Sesión abierta (caliente) para un ZIP"""
+        if zip_code not in self.sessions:
+            scraper = OfferUpDetailedScraper(headless=self.headless)
+            scraper.scraper.setup_driver()
+            self.sessions[zip_code] = scraper
+        return self.sessions[zip_code]
+
+    def _load_first_page(self, scraper: OfferUpDetailedScraper, search: Dict[str, Any]):
+        """Deja la sesión en la primera página de resultados de la búsqueda"""
+        key = self._search_key(search)
+        if key in self.result_urls:
+            scraper.scraper.navigate(self.result_urls[key])
+            return
+        # Primera vez: ubicación, búsqueda y filtros completos; después basta con la URL
+        scraper.open_search(search['search_term'], search['zip_code'],
+                            search.get('min_price', 0), search.get('max_price', 999999))
+        self.result_urls[key] = scraper.scraper.driver.current_url
+
+    def poll(self, search: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Revisa la primera página de una búsqueda
+
+        La primera ronda de cada búsqueda solo registra lo que ya existe.
+
+        Args:
+            search: Búsqueda a revisar
+
+        Returns:
+            Productos nuevos (con detalle) seguidos de las tarjetas ya vistas
+            cuyo precio cambió ('change' = 'price_drop' o 'price_up')
+        """
+        scraper = self._session(search['zip_code'])
+        # Solo interesan las tarjetas de esta página (si no, crecen en cada ronda)
+        scraper.cards.clear()
+        scraper.card_texts.clear()
+        self._load_first_page(scraper, search)
+
+        links = scraper.get_product_links(max_items=999, with_cards=True)
+        cards = [scraper.cards[url] for url in links if url in scraper.cards]
+        new_ids = set(self.seen.filter_new(extract_listing_id(url) for url in links))
+
+        key = self._search_key(search)
+        first_round = key not in self.baselined
+        self.baselined.add(key)
+
+        new_products = []
+        price_changes = []
+        failed_ids = set()
+        if not first_round:
+            known = [card for card in cards if extract_listing_id(card.get('url', '')) not in new_ids]
+            previous = self.seen.get_many(extract_listing_id(card.get('url', '')) for card in known)
+            price_changes = classify_changes(known, previous)
+            for url in links:
+                listing_id = extract_listing_id(url)
+                if listing_id not in new_ids:
+                    continue
+                if scraper.dedupe_index.match_card(scraper.card_texts.get(url, ''), listing_id):
+                    continue
+                product = scraper.extract_product_details(url, len(new_products) + 1)
+                if not (product.get('title') or product.get('price')):
+                    # Extracción fallida: no se marca como vista, se reintenta en la siguiente ronda
+                    failed_ids.add(listing_id)
+                    continue
+                product["detected_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                scraper.register_duplicates(product, scraper.card_texts.get(url, ''))
+                new_products.append(product)
+
+        if new_products:
+            self._scorer(search['search_term']).score(new_products, search['search_term'])
+            if self.rule_engine:
+                for product in new_products:
+                    product["matched_rules"] = self.rule_engine.match(product)
+
+        # Las tarjetas de la página quedan registradas como vistas (con su precio)
+        self.seen.mark_seen([card for card in cards
+                             if extract_listing_id(card.get('url', '')) not in failed_ids])
+        if new_products:
+            self.seen.mark_seen(new_products)
+            scraper.dedupe_index.save()
+
+        label = "registradas" if first_round else "nuevas"
+        logger.info(f"👀 {search['search_term']} ({search['zip_code']}): {len(links)} tarjetas, "
+                    f"{len(new_products) if not first_round else len(new_ids)} {label}"
+                    + (f", {len(price_changes)} cambios de precio" if price_changes else ""))
+        return new_products + price_changes
+
+    def _scorer(self, search_term: str) -> DealScorer:
+        """Puntaje de ofertas con el historial del término (cargado la primera vez)"""
+        if search_term not in self.deal_scorers:
+            try:
+                self.deal_scorers[search_term] = DealScorer.from_store(search_term)
+            except Exception as e:
+                logger.error(f"Error cargando historial de precios: {e}")
+                self.deal_scorers[search_term] = DealScorer()
+        return self.deal_scorers[search_term]
+
+    def notify(self, search: Dict[str, Any], products: List[Dict[str, Any]]):
+        """Agrega al resumen por email las publicaciones nuevas o con cambio de precio de una búsqueda"""
+        for product in products:
+            logger.info(f"{'🆕' if product.get('change', 'new') == 'new' else '💲'} "
+                        f"{product.get('price', '')} {product.get('title', '')} - {product.get('url')}")
+
+        recipient = search.get('recipient_email')
+        if not recipient:
+            return
+        self.notifier.add_job(recipient, search['search_term'], products, search['zip_code'],
+                              search.get('min_price', 0), search.get('max_price', 999999))
+
+    def send_digest(self, force: bool = False):
+        """Envía el resumen acumulado si ya pasó la ventana (o si force)"""
+        if not self.notifier.pending:
+            return
+        if force or time.monotonic() - self.last_digest >= self.digest_window:
+            self.notifier.flush()
+            self.last_digest = time.monotonic()
+
+    def stop(self, *_):
+        """Detiene la vigilancia (termina la búsqueda en curso y cierra las sesiones)"""
+        logger.warning("🛑 Deteniendo vigilancia...")
+        offerup.interrupted = True
+        self._stop.set()
+
+    def run(self, max_rounds: Optional[int] = None):
+        """
+        Ejecuta rondas de vigilancia hasta stop() (Ctrl+C/SIGTERM) o max_rounds
+
+        Args:
+            max_rounds: Número máximo de rondas (None = sin límite)
+        """
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGINT, self.stop)
+            signal.signal(signal.SIGTERM, self.stop)
+
+        logger.info(f"👀 Vigilando {len(self.searches)} búsqueda(s) cada ~{self.interval / 60:g} min "
+                    f"(±{self.jitter:.0%})")
+        rounds = 0
+        try:
+            while not self._stop.is_set() and (max_rounds is None or rounds < max_rounds):
+                round_start = time.perf_counter()
+                for search in self.searches:
+                    if self._stop.is_set():
+                        break
+                    try:
+                        poll_start = time.perf_counter()
+                        new_products = self.poll(search)
+                        if new_products:
+                            self.notify(search, new_products)
+                            logger.info(f"⏱️  Detección + alerta: {time.perf_counter() - poll_start:.1f}s")
+                    except Exception as e:
+                        logger.error(f"Error vigilando '{search.get('search_term')}': {e}")
+                        # Sesión posiblemente dañada: se abre de nuevo en la siguiente ronda
+                        self._reset_session(search['zip_code'])
+                rounds += 1
+                self.send_digest()
+
+                # Intervalo con variación aleatoria para no consultar a ritmo fijo
+                wait = self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+                wait -= time.perf_counter() - round_start
+                if wait > 0 and (max_rounds is None or rounds < max_rounds):
+                    self._stop.wait(wait)
+        finally:
+            self.close()
+
+    def _reset_session(self, zip_code: str):
+        """Cierra la sesión de un ZIP y olvida sus URLs de resultados"""
+        scraper = self.sessions.pop(zip_code, None)
+        if scraper is not None:
+            scraper.scraper.close()
+        for key in [k for k in self.result_urls if k.split('|')[1] == zip_code]:
+            del self.result_urls[key]
+
+    def close(self):
+        """Envía el resumen pendiente y cierra todas las sesiones"""
+        self.send_digest(force=True)
+        for zip_code in list(self.sessions):
+            self._reset_session(zip_code)
+        self.seen.close()
+
+
+def run_watch(path: Optional[str] = None):
+    """Punto de entrada del modo vigilancia"""
+    searches = load_watch_searches(path)
+    if not searches:
+        logger.error(f"❌ No hay búsquedas para vigilar (crea {Config.WATCH_SEARCHES_PATH} o programa una búsqueda)")
+        return
+    ListingWatcher(searches).run()
@@ -0,0 +1,241 @@
+"""
+Índice geográfico de códigos postales (ZIP) y cálculo de cobertura
+
+Usa el dataset incluido en geodata/zip_centroids.csv.gz (centroides de los
+ZIPs estándar de EE.UU., sin conexión a internet) indexado en una rejilla de
+celdas de latitud/longitud. Dada un área (centro + radio o polígono) y el
+radio de búsqueda de OfferUp, calcula un conjunto casi mínimo de ZIPs cuyos
+círculos de búsqueda cubren todos los ZIPs del área (cobertura voraz), para
+no repetir búsquedas que devuelven casi las mismas publicaciones.
+"""
+import os
+import csv
+import gzip
+import math
+import logging
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+DATASET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "geodata", "zip_centroids.csv.gz")
+EARTH_RADIUS_MILES = 3958.8
+# Tamaño de celda de la rejilla en grados (~17 millas de latitud)
+CELL_DEGREES = 0.25
+
+
+def haversine_miles(lat1, lon1, lat2, lon2):
+    """
+    Distancia en millas entre puntos (acepta escalares o arreglos numpy)
+
+    Args:
+        lat1, lon1: Primer punto (grados)
+        lat2, lon2: Segundo punto (grados)
+
+    Returns:
+        Distancia en millas
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def point_in_polygon(lats: np.ndarray, lons: np.ndarray, polygon: Sequence[Tuple[float, float]]) -> np.ndarray:
+    """
+    Indica qué puntos caen dentro de un polígono (ray casting vectorizado)
+
+    Args:
+        lats: Latitudes de los puntos
+        lons: Longitudes de los puntos
+        polygon: Vértices (lat, lon) del polígono
+
+    Returns:
+        Arreglo booleano
+    """
+    inside = np.zeros(len(lats), dtype=bool)
+    count = len(polygon)
+    for i in range(count):
+        lat_a, lon_a = polygon[i]
+        lat_b, lon_b = polygon[(i + 1) % count]
+        crosses = (lats < lat_a) != (lats < lat_b)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            lon_at = lon_a + (lats - lat_a) * (lon_b - lon_a) / (lat_b - lat_a)
+        inside ^= crosses & (lons < lon_at)
+    return inside
+
+
+class ZipIndex:
+    """Centroides de ZIPs con índice de rejilla para búsquedas por radio"""
+
+    def __init__(self, path: Optional[str] = None, cell_degrees: float = CELL_DEGREES):
+        """
+        Carga el dataset y construye la rejilla
+
+        Args:
+            path: Archivo CSV (gzip) con columnas zip, lat, lon, city, state
+            cell_degrees: Tamaño de celda de la rejilla
+        """
+        self.path = path or DATASET_PATH
+        self.cell_degrees = cell_degrees
+
+        zips, lats, lons, places = [], [], [], []
+        with gzip.open(self.path, 'rt', encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                zips.append(row['zip'])
+                lats.append(float(row['lat']))
+                lons.append(float(row['lon']))
+                places.append(f"{row['city']}, {row['state']}")
+
+        self.zips = np.array(zips)
+        self.lats = np.array(lats)
+        self.lons = np.array(lons)
+        self.places = places
+        self.position = {z: i for i, z in enumerate(zips)}
+
+        self.grid: Dict[Tuple[int, int], List[int]] = {}
+        for i, cell in enumerate(zip(*self._cells(self.lats, self.lons))):
+            self.grid.setdefault(cell, []).append(i)
+        self._grid_arrays = {cell: np.array(ids) for cell, ids in self.grid.items()}
+
+        logger.info(f"🗺️  Índice de ZIPs: {len(self.zips)} códigos en {len(self.grid)} celdas")
+
+    def __len__(self):
+        return len(self.zips)
+
+    def _cells(self, lats, lons):
+        """Celda de la rejilla de cada punto"""
+        return (np.floor(np.asarray(lats) / self.cell_degrees).astype(int).tolist(),
+                np.floor(np.asarray(lons) / self.cell_degrees).astype(int).tolist())
+
+    def locate(self, zip_code: str) -> Tuple[float, float]:
+        """
+        Centroide de un ZIP
+
+        Args:
+            zip_code: Código postal
+
+        Returns:
+            Tupla (lat, lon)
+        """
+        if zip_code not in self.position:
+            raise KeyError(f"ZIP desconocido: {zip_code}")
+        i = self.position[zip_code]
+        return float(self.lats[i]), float(self.lons[i])
+
+    def _bbox_ids(self, min_lat: float, max_lat: float, min_lon: float, max_lon: float) -> np.ndarray:
+        """Índices de los ZIPs en las celdas que tocan el rectángulo"""
+        (lat_lo, lat_hi), (lon_lo, lon_hi) = self._cells([min_lat, max_lat], [min_lon, max_lon])
+        chunks = [self._grid_arrays[(la, lo)]
+                  for la in range(lat_lo, lat_hi + 1)
+                  for lo in range(lon_lo, lon_hi + 1)
+                  if (la, lo) in self._grid_arrays]
+        return np.concatenate(chunks) if chunks else np.array([], dtype=int)
+
+    def within_radius(self, lat: float, lon: float, radius_miles: float) -> np.ndarray:
+        """
+        Índices de los ZIPs cuyo centroide está a <= radius_miles del punto
+
+        Solo se revisan las celdas de la rejilla que tocan el círculo.
+        """
+        dlat = radius_miles / 69.0
+        dlon = radius_miles / max(69.0 * math.cos(math.radians(lat)), 1e-6)
+        ids = self._bbox_ids(lat - dlat, lat + dlat, lon - dlon, lon + dlon)
+        if not len(ids):
+            return ids
+        distances = haversine_miles(lat, lon, self.lats[ids], self.lons[ids])
+        return ids[distances <= radius_miles]
+
+    def within_polygon(self, polygon: Sequence[Tuple[float, float]]) -> np.ndarray:
+        """Índices de los ZIPs cuyo centroide cae dentro del polígono (lat, lon)"""
+        lats = [p[0] for p in polygon]
+        lons = [p[1] for p in polygon]
+        ids = self._bbox_ids(min(lats), max(lats), min(lons), max(lons))
+        if not len(ids):
+            return ids
+        return ids[point_in_polygon(self.lats[ids], self.lons[ids], polygon)]
+
+    def covering_set(self, search_radius_miles: float, center: Optional[Tuple[float, float]] = None,
+                     radius_miles: Optional[float] = None,
+                     polygon: Optional[Sequence[Tuple[float, float]]] = None) -> Dict[str, Any]:
+        """
+        Calcula un conjunto casi mínimo de ZIPs que cubre un área
+
+        El área se define con center + radius_miles o con polygon. Cada ZIP
+        elegido "cubre" los ZIPs del área a <= search_radius_miles de su
+        centroide; se elige en cada paso el que cubre más ZIPs pendientes
+        (cobertura voraz, a lo más ln(n) veces el óptimo). Los empates se
+        rompen por cercanía al centro del área, así un área que el ZIP
+        central cubre solo se busca desde ese ZIP.
+
+        Args:
+            search_radius_miles: Radio de búsqueda de cada ZIP en OfferUp
+            center: Centro (lat, lon) del área
+            radius_miles: Radio del área
+            polygon: Vértices (lat, lon) del área
+
+        Returns:
+            Diccionario con 'zips' (en orden de elección), 'area_zips'
+            (cantidad de ZIPs del área) y 'coverage' (ZIP elegido -> ZIPs que cubre)
+        """
+        if polygon is not None:
+            targets = self.within_polygon(polygon)
+        elif center is not None and radius_miles is not None:
+            targets = self.within_radius(center[0], center[1], radius_miles)
+        else:
+            raise ValueError("Se requiere center + radius_miles o polygon")
+
+        if not len(targets):
+            return {'zips': [], 'area_zips': 0, 'coverage': {}}
+
+        # Candidatos: cualquier ZIP que alcance al menos un ZIP del área
+        t_lats, t_lons = self.lats[targets], self.lons[targets]
+        margin = search_radius_miles / 69.0
+        margin_lon = search_radius_miles / max(69.0 * math.cos(math.radians(float(np.abs(t_lats).max()))), 1e-6)
+        candidates = self._bbox_ids(t_lats.min() - margin, t_lats.max() + margin,
+                                    t_lons.min() - margin_lon, t_lons.max() + margin_lon)
+
+        covers = haversine_miles(self.lats[candidates][:, None], self.lons[candidates][:, None],
+                                 t_lats[None, :], t_lons[None, :]) <= search_radius_miles
+
+        # Centro del área (para el polígono, el promedio de sus ZIPs)
+        if center is None:
+            center = (float(t_lats.mean()), float(t_lons.mean()))
+        center_distance = haversine_miles(center[0], center[1], self.lats[candidates], self.lons[candidates])
+
+        uncovered = np.ones(len(targets), dtype=bool)
+        chosen, coverage = [], {}
+        while uncovered.any():
+            gains = covers[:, uncovered].sum(axis=1)
+            top = gains.max()
+            if top == 0:
+                break
+            # Entre los de mayor ganancia, el más cercano al centro
+            tied = np.flatnonzero(gains == top)
+            best = int(tied[center_distance[tied].argmin()])
+            newly = covers[best] & uncovered
+            uncovered &= ~covers[best]
+            zip_code = str(self.zips[candidates[best]])
+            chosen.append(zip_code)
+            coverage[zip_code] = [str(z) for z in self.zips[targets[newly]]]
+
+        return {'zips': chosen, 'area_zips': int(len(targets)), 'coverage': coverage}
+
+    def cover_zip(self, zip_code: str, radius_miles: float, search_radius_miles: float) -> List[str]:
+        """
+        Atajo: ZIPs que cubren el área de radius_miles alrededor de un ZIP
+
+        Args:
+            zip_code: ZIP central
+            radius_miles: Radio del área a cubrir
+            search_radius_miles: Radio de búsqueda de cada ZIP en OfferUp
+
+        Returns:
+            Lista de ZIPs a buscar
+        """
+        result = self.covering_set(search_radius_miles, center=self.locate(zip_code), radius_miles=radius_miles)
+        logger.info(f"🗺️  Cobertura de {radius_miles:g} millas alrededor de {zip_code}: "
+                    f"{len(result['zips'])} búsquedas en lugar de {result['area_zips']} ZIPs")
+        return result['zips']